@@ -16,7 +16,7 @@ async def check_email_tool():
     from src.llm import LLMClient
     
     # This will be called with proper context in the actual implementation
-    msgs = list_unread(max_results=10)
+    msgs = await asyncio.to_thread(list_unread, max_results=10)
     
     if not msgs:
         return "📭 Нет непрочитанных писем"
@@ -24,7 +24,7 @@ async def check_email_tool():
     result = f"📧 Найдено {len(msgs)} непрочитанных писем:\n\n"
     
     for i, m in enumerate(msgs[:5], 1):  # Show first 5
-        headers, snippet, label_ids = get_message(m["id"])
+        headers, snippet, label_ids = await asyncio.to_thread(get_message, m["id"])
         subj = headers.get("Subject", "(без темы)")
         frm = headers.get("From", "")
         
@@ -48,33 +48,22 @@ async def check_email_tool():
 )
 async def get_news_digest_tool(digest_type: str = "brief"):
     """Get news digest."""
-    from src.tools import aggregate_news, create_digest
-    from src.tools.news_aggregator import format_messages_for_llm
+    from src.tools import build_news_digest
     from src.llm import LLMClient
     from src.bot.prompts import SYSTEM_PROMPT
     
-    # Aggregate news
-    news_data = await aggregate_news(hours_back=24)
-    
-    if news_data['total_messages'] == 0:
-        return "📭 Нет новых сообщений за последние 24 часа"
-    
-    # Format for LLM
-    news_content = format_messages_for_llm(news_data, max_messages=30, max_chars_per_message=200)
-    
     # Create LLM client
     llm_client = LLMClient(system_prompt=SYSTEM_PROMPT)
     
-    # Create digest
-    digest = create_digest(
-        news_content=news_content,
-        digest_type=digest_type,
-        llm_client=llm_client,
-        is_scheduled=False
-    )
+    # Digest of the last 24 hours (shared with identical requests in flight)
+    result = await build_news_digest(digest_type, llm_client, hours_back=24)
+    
+    if result is None:
+        return "📭 Нет новых сообщений за последние 24 часа"
+    digest, total_messages = result
     
     header = f"📰 {'Подробная' if digest_type == 'full' else 'Краткая'} сводка новостей\n"
-    header += f"📊 Обработано сообщений: {news_data['total_messages']}\n\n"
+    header += f"📊 Обработано сообщений: {total_messages}\n\n"
     
     return header + digest
 
@@ -87,14 +76,22 @@ async def get_news_digest_tool(digest_type: str = "brief"):
             "name": "query",
             "description": "Поисковой запрос",
             "required": True
+        },
+        {
+            "name": "deep",
+            "description": "'да', чтобы прочитать сами страницы из выдачи (медленнее, подробнее)",
+            "required": False
         }
     ]
 )
-async def web_search_tool(query: str):
+async def web_search_tool(query: str, deep: str = ""):
     """Search the web."""
-    from src.tools.web_search import search_web
+    from src.tools.web_search import asearch_web, asearch_web_deep
     
-    results = search_web(query, max_results=5, region="ru-ru")
+    if str(deep).lower() in ("да", "yes", "true", "1"):
+        results = await asearch_web_deep(query, max_results=5, region="ru-ru")
+    else:
+        results = await asearch_web(query, max_results=5, region="ru-ru")
     
     if not results:
         return f"🤷 Ничего не найдено по запросу: {query}"
@@ -107,6 +104,8 @@ async def web_search_tool(query: str):
         
         output += f"{i}. {title}\n"
         output += f"   {body}...\n"
+        if result.get('content'):
+            output += f"   📄 {result['content'][:1500]}\n"
         output += f"   🔗 {result['url']}\n\n"
     
     return output
@@ -125,9 +124,9 @@ async def web_search_tool(query: str):
 )
 async def search_news_tool(topic: str):
     """Search news by topic."""
-    from src.tools.web_search import search_news
+    from src.tools.web_search import asearch_news
     
-    results = search_news(topic, max_results=5, region="ru-ru")
+    results = await asearch_news(topic, max_results=5, region="ru-ru")
     
     if not results:
         return f"🤷 Новостей не найдено по теме: {topic}"
@@ -157,7 +156,7 @@ async def list_channels_tool():
     """List monitored channels."""
     from src.telegram_client.channels import get_monitored_channels
     
-    channels = get_monitored_channels()
+    channels = await get_monitored_channels()
     
     if not channels:
         return "📋 Нет отслеживаемых каналов"
@@ -218,7 +217,7 @@ async def remove_channel_tool(channel_username: str):
     if channel_username.startswith('@'):
         channel_username = channel_username[1:]
     
-    success = remove_channel(channel_username)
+    success = await remove_channel(channel_username)
     
     if success:
         return f"✅ Канал @{channel_username} удален из отслеживаемых"
@@ -233,24 +232,14 @@ async def remove_channel_tool(channel_username: str):
 )
 async def clear_all_channels_tool():
     """Clear all monitored channels."""
-    from src.telegram_client.channels import get_monitored_channels
-    from src.database import SessionLocal, MonitoredChannel
+    from src.telegram_client.channels import deactivate_all_channels
     
-    channels = get_monitored_channels()
+    # Deactivate all channels
+    count = await deactivate_all_channels()
     
-    if not channels:
+    if not count:
         return "📋 Список каналов уже пуст"
     
-    count = len(channels)
-    
-    # Deactivate all channels
-    db = SessionLocal()
-    try:
-        db.query(MonitoredChannel).update({"is_active": False})
-        db.commit()
-    finally:
-        db.close()
-    
     return f"🗑️ Очищен список каналов. Удалено: {count} каналов"
 
 
@@ -138,7 +138,7 @@ async def detect_intent_and_execute(
     
     # Get LLM decision
     try:
-        llm_response = llm_client.call_without_history(prompt, temperature=0.2)
+        llm_response = await llm_client.acall_without_history(prompt, temperature=0.2)
         
         # Extract JSON from response
         json_match = re.search(r'```json\s*(\{.*?\})\s*```', llm_response, re.DOTALL)
@@ -180,7 +180,7 @@ async def detect_intent_and_execute(
 Ответь пользователю естественным образом, используя этот результат.
 Будь кратким и полезным."""
         
-        final_response = llm_client.call_without_history(response_prompt, temperature=0.4)
+        final_response = await llm_client.acall_without_history(response_prompt, temperature=0.4)
         
         return tool_result, final_response
         
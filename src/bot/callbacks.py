@@ -1,9 +1,13 @@
 """Callback handlers for inline keyboard buttons."""
+import asyncio
+
 from telegram import Update
 from telegram.ext import ContextTypes
 
 from src.config import ALLOWED_USER_IDS
-from src.database import SessionLocal, PendingEmailDraft
+from sqlalchemy import select
+
+from src.database import get_session, PendingEmailDraft
 from src.gmail import (
     get_message,
     mark_as_read,
@@ -14,9 +18,11 @@ from src.gmail import (
 )
 from src.llm import LLMClient
 from .prompts import EMAIL_DRAFT_PROMPT_TEMPLATE
+from .pending import PendingStore
 
-# Temporary storage for pending spam confirmations
-PENDING_SPAM = {}  # telegram_user_id -> [message_id, ...]
+# Spam sweeps waiting for confirmation: telegram_user_id -> [message_id, ...]
+# (persisted: a sweep is expensive to redo after a restart)
+PENDING_SPAM = PendingStore("spam", persist=True)
 
 
 async def on_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -53,6 +59,11 @@ async def on_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await handle_draft_action(query, action, item_id)
         return
     
+    # Expand a section of a brief news digest
+    if action == "section":
+        await handle_digest_section(query, item_id, context)
+        return
+    
     await query.message.reply_text("Unknown action.")
 
 
@@ -61,17 +72,17 @@ async def handle_spam_confirmation(query, item_id: str):
     user_id = query.from_user.id
     
     if item_id == "no":
-        PENDING_SPAM.pop(user_id, None)
+        await PENDING_SPAM.pop(user_id)
         await query.edit_message_text("Canceled.")
         return
     
-    ids = PENDING_SPAM.pop(user_id, [])
+    ids = await PENDING_SPAM.pop(user_id)
     if not ids:
-        await query.edit_message_text("Nothing pending.")
+        await query.edit_message_text("Nothing pending (the sweep may have expired, run /spam_sweep again).")
         return
     
     try:
-        batch_mark_as_spam(ids)
+        await asyncio.to_thread(batch_mark_as_spam, ids)
         await query.edit_message_text(f"Moved {len(ids)} messages to Spam.")
     except Exception as e:
         await query.edit_message_text(f"Failed to move to Spam: {e}")
@@ -80,7 +91,7 @@ async def handle_spam_confirmation(query, item_id: str):
 async def handle_mark_read(query, message_id: str):
     """Handle marking message as read."""
     try:
-        mark_as_read(message_id)
+        await asyncio.to_thread(mark_as_read, message_id)
         await query.edit_message_reply_markup(reply_markup=None)
         await query.message.reply_text("Marked as read.")
     except Exception as e:
@@ -92,31 +103,28 @@ async def handle_draft_reply(query, message_id: str, context: ContextTypes.DEFAU
     user_id = query.from_user.id
     
     # Get email details
-    headers, snippet, label_ids = get_message(message_id)
+    headers, snippet, label_ids = await asyncio.to_thread(get_message, message_id)
     subj = headers.get("Subject", "(no subject)")
     frm = headers.get("From", "(unknown)")
     
     # Generate reply using LLM
     llm_client: LLMClient = context.bot_data.get("llm_client")
     prompt = EMAIL_DRAFT_PROMPT_TEMPLATE.format(subj=subj, frm=frm, snippet=snippet)
-    reply_text = llm_client.call(user_id, prompt)
+    reply_text = await llm_client.acall(user_id, prompt)
     
     # Create Gmail draft
-    draft = create_reply_draft(message_id, reply_text)
+    draft = await asyncio.to_thread(create_reply_draft, message_id, reply_text)
     draft_id = draft["id"]
     
     # Store pending approval in database
-    db = SessionLocal()
-    try:
+    async with get_session() as db:
         db.add(PendingEmailDraft(
             telegram_user_id=str(user_id),
             message_id=message_id,
             draft_id=draft_id,
             draft_text=reply_text
         ))
-        db.commit()
-    finally:
-        db.close()
+        await db.commit()
     
     from telegram import InlineKeyboardButton, InlineKeyboardMarkup
     kb = InlineKeyboardMarkup([[
@@ -134,9 +142,8 @@ async def handle_draft_action(query, action: str, draft_id: str):
     """Handle sending or discarding a draft."""
     user_id = query.from_user.id
     
-    db = SessionLocal()
-    try:
-        row = db.query(PendingEmailDraft).filter(PendingEmailDraft.draft_id == draft_id).first()
+    async with get_session() as db:
+        row = await db.scalar(select(PendingEmailDraft).where(PendingEmailDraft.draft_id == draft_id))
         if not row:
             await query.edit_message_text("This draft is no longer pending.")
             return
@@ -146,28 +153,47 @@ async def handle_draft_action(query, action: str, draft_id: str):
             return
         
         if action == "send":
-            send_draft(draft_id)
+            await asyncio.to_thread(send_draft, draft_id)
             # After sending, mark the original email as read
             try:
-                mark_as_read(row.message_id)
+                await asyncio.to_thread(mark_as_read, row.message_id)
             except Exception:
                 pass
             
-            db.delete(row)
-            db.commit()
+            await db.delete(row)
+            await db.commit()
             await query.edit_message_text("Sent.")
             return
         
         if action == "discard":
             # Delete the actual Gmail draft
             try:
-                delete_draft(draft_id)
+                await asyncio.to_thread(delete_draft, draft_id)
             except Exception:
                 pass  # Even if deletion fails, clear local state
             
-            db.delete(row)
-            db.commit()
+            await db.delete(row)
+            await db.commit()
             await query.edit_message_text("Discarded and deleted from Gmail drafts.")
             return
-    finally:
-        db.close()
+
+
+async def handle_digest_section(query, section_id: str, context: ContextTypes.DEFAULT_TYPE):
+    """Send the detailed version of a digest section (generated on first request)."""
+    from src.tools import expand_section
+    from .delivery import get_delivery
+    
+    llm_client: LLMClient = context.bot_data.get("llm_client")
+    
+    try:
+        result = await expand_section(int(section_id), llm_client)
+    except Exception as e:
+        await query.message.reply_text(f"❌ Не удалось подготовить подробности: {str(e)[:200]}")
+        return
+    
+    if result is None:
+        await query.message.reply_text("Этот раздел сводки больше недоступен.")
+        return
+    
+    label, detail = result
+    await get_delivery().deliver([query.message.chat_id], f"🔎 {label}\n\n{detail}")
@@ -0,0 +1,106 @@
+"""Concurrent update processing that keeps each chat's updates in order."""
+import asyncio
+import time
+from contextlib import nullcontext
+from typing import Any, Awaitable, Dict, Optional
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+
+class ChatOrderedUpdateProcessor(BaseUpdateProcessor):
+    """
+    Processes updates of different chats concurrently, one chat at a time in order.
+    
+    python-telegram-bot's own semaphore (``max_pending``) bounds how many
+    updates are accepted at once, queued ones included. Handlers running at
+    the same time are capped separately by ``max_handlers``, and a chat's
+    update takes a handler slot only when it is that chat's turn, so a chat
+    with a backlog does not hold slots other chats could use.
+    """
+    
+    def __init__(self, max_handlers: int, max_pending: int):
+        super().__init__(max_concurrent_updates=max_pending)
+        self._handler_slots = asyncio.BoundedSemaphore(max_handlers)
+        self._max_handlers = max_handlers
+        # chat_id -> [lock, updates of the chat waiting or running]
+        self._chats: Dict[int, list] = {}
+        self._queued = 0
+        self._running = 0
+        self._peak_queued = 0
+        self._processed = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+    
+    @staticmethod
+    def _chat_id(update: object) -> Optional[int]:
+        if isinstance(update, Update) and update.effective_chat is not None:
+            return update.effective_chat.id
+        return None
+    
+    def _enter_chat(self, chat_id: Optional[int]):
+        if chat_id is None:
+            return nullcontext()
+        entry = self._chats.setdefault(chat_id, [asyncio.Lock(), 0])
+        entry[1] += 1
+        return entry[0]
+    
+    def _leave_chat(self, chat_id: Optional[int]):
+        if chat_id is None:
+            return
+        entry = self._chats[chat_id]
+        entry[1] -= 1
+        if not entry[1]:
+            # Last update of the chat: drop the lock so idle chats cost nothing
+            del self._chats[chat_id]
+    
+    async def do_process_update(self, update: object, coroutine: "Awaitable[Any]") -> None:
+        chat_id = self._chat_id(update)
+        queued_at = time.monotonic()
+        self._queued += 1
+        self._peak_queued = max(self._peak_queued, self._queued)
+        started = False
+        try:
+            async with self._enter_chat(chat_id):
+                async with self._handler_slots:
+                    waited = time.monotonic() - queued_at
+                    self._queued -= 1
+                    started = True
+                    self._running += 1
+                    self._wait_total += waited
+                    self._wait_max = max(self._wait_max, waited)
+                    try:
+                        await coroutine
+                    finally:
+                        self._running -= 1
+                        self._processed += 1
+        finally:
+            if not started:
+                # Cancelled while waiting for its turn
+                self._queued -= 1
+            self._leave_chat(chat_id)
+    
+    async def initialize(self) -> None:
+        """Nothing to allocate."""
+    
+    async def shutdown(self) -> None:
+        """Nothing to free."""
+    
+    def stats(self) -> dict:
+        """
+        Snapshot of update processing.
+        
+        Returns:
+            Dict with running and queued handlers, peak queue depth, chats
+            with pending updates, processed count and wait times (seconds)
+        """
+        return {
+            'running': self._running,
+            'max_handlers': self._max_handlers,
+            'queued': self._queued,
+            'peak_queued': self._peak_queued,
+            'busy_chats': len(self._chats),
+            'processed': self._processed,
+            'avg_wait': self._wait_total / self._processed if self._processed else 0.0,
+            'max_wait': self._wait_max,
+        }
@@ -0,0 +1,287 @@
+"""Outgoing message delivery: chunking, rate limits, retries and a durable outbox."""
+import asyncio
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import delete, select, update
+from telegram import Bot
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter, TelegramError
+
+from src.config import DELIVERY_GLOBAL_RATE, DELIVERY_CHAT_INTERVAL, DELIVERY_MAX_ATTEMPTS
+from src.database import get_session, OutboxMessage
+
+# Telegram message length limit
+MAX_MESSAGE_CHARS = 4096
+# Split points, from the most to the least preferred
+SPLIT_SEPARATORS = ("\n\n", "\n", ". ", " ")
+# Exponential backoff between attempts: BASE * 2^attempt, capped
+RETRY_BASE_SECONDS = 2.0
+RETRY_MAX_SECONDS = 300.0
+# Sent rows older than this are deleted from the outbox
+SENT_RETENTION = timedelta(days=1)
+
+
+def split_message(text: str, limit: int = MAX_MESSAGE_CHARS) -> List[str]:
+    """
+    Split a text into Telegram-sized chunks on paragraph, line, sentence or word boundaries.
+    
+    Args:
+        text: Message text
+        limit: Maximum characters per chunk
+    
+    Returns:
+        Chunks in order (a single chunk if the text fits)
+    """
+    chunks = []
+    rest = text.strip()
+    while len(rest) > limit:
+        window = rest[:limit]
+        cut = -1
+        for separator in SPLIT_SEPARATORS:
+            cut = window.rfind(separator)
+            # Do not produce tiny chunks just to honour a separator
+            if cut >= limit // 2:
+                cut += len(separator)
+                break
+        if cut < limit // 2:
+            cut = limit
+        chunks.append(rest[:cut].rstrip())
+        rest = rest[cut:].lstrip()
+    if rest:
+        chunks.append(rest)
+    return chunks
+
+
+class _RateLimiter:
+    """Spaces out calls: at most one per ``interval`` seconds."""
+    
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+    
+    async def wait(self):
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+def _backoff(attempts: int) -> float:
+    return min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2 ** attempts)
+
+
+def _retry_after_seconds(error: RetryAfter) -> float:
+    retry_after = error.retry_after
+    if isinstance(retry_after, timedelta):
+        return retry_after.total_seconds()
+    return float(retry_after)
+
+
+class DeliveryService:
+    """
+    Sends bot messages through a durable outbox.
+    
+    Messages are split into chunks and stored before sending, so a crash
+    or a network outage does not lose them; pending chunks are picked up
+    by the next flush(). Chats are served concurrently, each chat in
+    order, within the global and per-chat rate limits: a chat's queue is
+    sent under its own lock, so deliver() to one chat never waits for
+    another chat's sends, flood-control pauses or backoff.
+    """
+    
+    def __init__(self, bot: Bot):
+        self.bot = bot
+        self._global = _RateLimiter(1.0 / DELIVERY_GLOBAL_RATE)
+        self._chats: Dict[str, _RateLimiter] = defaultdict(lambda: _RateLimiter(DELIVERY_CHAT_INTERVAL))
+        self._chat_locks: Dict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+        # Only keeps retry sweeps from overlapping; deliver() does not take it
+        self._flush_lock = asyncio.Lock()
+    
+    @staticmethod
+    async def _enqueue(chat_ids: List[str], chunks: List[str]):
+        async with get_session() as db:
+            db.add_all(
+                OutboxMessage(chat_id=chat_id, text=chunk)
+                for chat_id in chat_ids
+                for chunk in chunks
+            )
+            await db.commit()
+    
+    @staticmethod
+    async def _pending_chats() -> List[str]:
+        async with get_session() as db:
+            return list(await db.scalars(
+                select(OutboxMessage.chat_id).where(OutboxMessage.status == "pending").distinct()
+            ))
+    
+    @staticmethod
+    async def _load_pending(chat_id: str) -> List[OutboxMessage]:
+        async with get_session() as db:
+            return list(await db.scalars(
+                select(OutboxMessage)
+                .where(OutboxMessage.status == "pending", OutboxMessage.chat_id == chat_id)
+                .order_by(OutboxMessage.id)
+            ))
+    
+    @staticmethod
+    async def _save_result(row_id: int, status: str, attempts: int, error: Optional[str] = None,
+                           next_attempt_at: Optional[datetime] = None):
+        values = {'status': status, 'attempts': attempts, 'last_error': error}
+        if next_attempt_at is not None:
+            values['next_attempt_at'] = next_attempt_at
+        if status == "sent":
+            values['sent_at'] = datetime.now(timezone.utc)
+        async with get_session() as db:
+            await db.execute(update(OutboxMessage).where(OutboxMessage.id == row_id).values(**values))
+            await db.commit()
+    
+    @staticmethod
+    async def _purge_sent():
+        async with get_session() as db:
+            await db.execute(
+                delete(OutboxMessage).where(
+                    OutboxMessage.status == "sent",
+                    OutboxMessage.sent_at < datetime.now(timezone.utc) - SENT_RETENTION
+                )
+            )
+            await db.commit()
+    
+    async def _send(self, chat_id: str, text: str):
+        await self._chats[chat_id].wait()
+        await self._global.wait()
+        await self.bot.send_message(chat_id=chat_id, text=text, parse_mode=None)
+    
+    async def _deliver_chat(self, chat_id: str, rows: List[OutboxMessage]) -> int:
+        """Send a chat's pending chunks in order; stop at the first one that must wait."""
+        sent = 0
+        for row in rows:
+            next_attempt_at = row.next_attempt_at
+            if next_attempt_at is not None:
+                if next_attempt_at.tzinfo is None:
+                    next_attempt_at = next_attempt_at.replace(tzinfo=timezone.utc)
+                if next_attempt_at > datetime.now(timezone.utc):
+                    break
+            
+            attempts = row.attempts or 0
+            while True:
+                try:
+                    await self._send(chat_id, row.text)
+                    await self._save_result(row.id, "sent", attempts + 1)
+                    sent += 1
+                    break
+                except RetryAfter as e:
+                    # Flood control is not the message's fault: wait and retry without counting
+                    await asyncio.sleep(_retry_after_seconds(e))
+                except Forbidden as e:
+                    # Bot blocked or chat gone: drop the rest of the chat's queue too
+                    print(f"Delivery to {chat_id} failed permanently: {e}")
+                    for failed in rows[rows.index(row):]:
+                        await self._save_result(failed.id, "failed", attempts + 1, str(e))
+                    return sent
+                except BadRequest as e:
+                    # Malformed message: retrying will not help
+                    print(f"Delivery to {chat_id} failed permanently: {e}")
+                    await self._save_result(row.id, "failed", attempts + 1, str(e))
+                    break
+                except NetworkError as e:
+                    attempts += 1
+                    if attempts >= DELIVERY_MAX_ATTEMPTS:
+                        print(f"Delivery to {chat_id} failed after {attempts} attempts: {e}")
+                        await self._save_result(row.id, "failed", attempts, str(e))
+                        break
+                    delay = _backoff(attempts)
+                    if delay > RETRY_MAX_SECONDS / 10:
+                        # Long outage: leave it to a later flush instead of holding the chat
+                        await self._save_result(
+                            row.id, "pending", attempts, str(e),
+                            datetime.now(timezone.utc) + timedelta(seconds=delay)
+                        )
+                        return sent
+                    await asyncio.sleep(delay)
+                except TelegramError as e:
+                    # Anything else (ChatMigrated, Conflict, ...): count it and back off,
+                    # so the row cannot be retried on every flush forever
+                    attempts += 1
+                    if attempts >= DELIVERY_MAX_ATTEMPTS:
+                        print(f"Delivery to {chat_id} failed after {attempts} attempts: {e}")
+                        await self._save_result(row.id, "failed", attempts, str(e))
+                        break
+                    await self._save_result(
+                        row.id, "pending", attempts, str(e),
+                        datetime.now(timezone.utc) + timedelta(seconds=_backoff(attempts))
+                    )
+                    return sent
+        return sent
+    
+    async def _flush_chat(self, chat_id: str) -> int:
+        """Send a chat's pending chunks under the chat's lock (rows are reloaded inside it)."""
+        async with self._chat_locks[chat_id]:
+            rows = await self._load_pending(chat_id)
+            if not rows:
+                return 0
+            return await self._deliver_chat(chat_id, rows)
+    
+    async def _flush_chats(self, chat_ids: List[str]) -> int:
+        results = await asyncio.gather(*(self._flush_chat(chat_id) for chat_id in chat_ids), return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                print(f"Delivery error: {result}")
+        return sum(r for r in results if isinstance(r, int))
+    
+    async def flush(self) -> int:
+        """
+        Send everything pending in the outbox (retry sweep over all chats).
+        
+        Returns:
+            Number of chunks sent
+        """
+        async with self._flush_lock:
+            chat_ids = await self._pending_chats()
+            if not chat_ids:
+                return 0
+            sent = await self._flush_chats(chat_ids)
+            await self._purge_sent()
+            return sent
+    
+    async def deliver(self, chat_ids: Iterable, text: str) -> int:
+        """
+        Queue a message for several chats and send it.
+        
+        Only the recipients' queues are sent (in order, after chunks still
+        pending for the same chat); other chats are left to flush().
+        
+        Args:
+            chat_ids: Recipient chat ids
+            text: Message text (split automatically if too long)
+        
+        Returns:
+            Number of chunks sent now (the rest stays in the outbox)
+        """
+        chunks = split_message(text)
+        chat_ids = [str(chat_id) for chat_id in chat_ids]
+        if not chunks or not chat_ids:
+            return 0
+        await self._enqueue(chat_ids, chunks)
+        return await self._flush_chats(list(dict.fromkeys(chat_ids)))
+
+
+_delivery: Optional[DeliveryService] = None
+
+
+def init_delivery(bot: Bot) -> DeliveryService:
+    """Create the delivery service for a bot."""
+    global _delivery
+    _delivery = DeliveryService(bot)
+    return _delivery
+
+
+def get_delivery() -> DeliveryService:
+    """Get the delivery service (init_delivery() must be called first)."""
+    if _delivery is None:
+        raise RuntimeError("Delivery service is not initialized")
+    return _delivery
@@ -1,4 +1,6 @@
 """Command and message handlers for the Telegram bot."""
+import asyncio
+
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import (
     Application,
@@ -13,8 +15,11 @@ from src.config import ALLOWED_USER_IDS, GROUP_MODE
 from src.gmail import list_unread, get_message
 from src.gmail.triage import triage_email
 from src.llm import LLMClient
+from src.singleflight import single_flight, single_flight_stats
 from .callbacks import on_callback, PENDING_SPAM
-from .news_handlers import news_cmd, channels_cmd, search_cmd, news_search_cmd
+from .concurrency import ChatOrderedUpdateProcessor
+from .pending import pending_stats
+from .news_handlers import news_cmd, digest_cmd, channels_cmd, feeds_cmd, search_cmd, news_search_cmd
 
 
 def allowed(update: Update) -> bool:
@@ -47,6 +52,32 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text("Jarvis online. Message me or mention me in a group.")
 
 
+async def _triage_unread(llm_client: LLMClient, user_id: int, max_results: int) -> list:
+    """
+    Triage unread Inbox messages with the LLM.
+    
+    The inbox is shared, so concurrent sweeps of the same size share one run.
+    
+    Returns:
+        List of (message_id, subject, from, snippet, triage) tuples
+    """
+    async def run() -> list:
+        msgs = await asyncio.to_thread(list_unread, max_results=max_results)
+        items = []
+        for m in msgs:
+            message_id = m["id"]
+            headers, snippet, label_ids = await asyncio.to_thread(get_message, message_id)
+            subj = headers.get("Subject", "(no subject)")
+            frm = headers.get("From", "(unknown)")
+            
+            # Triage using LLM
+            t = await asyncio.to_thread(triage_email, lambda p: llm_client.call(user_id, p), frm, subj, snippet)
+            items.append((message_id, subj, frm, snippet, t))
+        return items
+    
+    return await single_flight(('inbox_triage', max_results), run)
+
+
 async def spam_sweep_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /spam_sweep command - scan inbox for spam."""
     if not allowed(update):
@@ -55,19 +86,10 @@ async def spam_sweep_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_user.id
     llm_client: LLMClient = context.bot_data.get("llm_client")
     
-    msgs = list_unread(max_results=50)
     spam_ids = []
     examples = []
     
-    for m in msgs:
-        message_id = m["id"]
-        headers, snippet, label_ids = get_message(message_id)
-        subj = headers.get("Subject", "(no subject)")
-        frm = headers.get("From", "(unknown)")
-        
-        # Triage using LLM
-        t = triage_email(lambda p: llm_client.call(user_id, p), frm, subj, snippet)
-        
+    for message_id, subj, frm, snippet, t in await _triage_unread(llm_client, user_id, max_results=50):
         # Be conservative: only auto-spam when confident
         if t["label"] == "spam" and float(t.get("confidence", 0)) >= 0.85:
             spam_ids.append(message_id)
@@ -78,7 +100,7 @@ async def spam_sweep_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("No high-confidence spam found in unread Inbox.")
         return
     
-    PENDING_SPAM[user_id] = spam_ids
+    await PENDING_SPAM.put(user_id, spam_ids)
     
     kb = InlineKeyboardMarkup([[
         InlineKeyboardButton(f"Confirm: move {len(spam_ids)} to Spam", callback_data="spamconfirm:yes"),
@@ -100,8 +122,8 @@ async def unread_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_user.id
     llm_client: LLMClient = context.bot_data.get("llm_client")
     
-    msgs = list_unread(max_results=20)
-    if not msgs:
+    items = await _triage_unread(llm_client, user_id, max_results=20)
+    if not items:
         await update.message.reply_text("No unread emails in Inbox.")
         return
     
@@ -109,17 +131,8 @@ async def unread_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
     uncertain = []
     spam_count = 0
     
-    for m in msgs:
-        message_id = m["id"]
-        headers, snippet, label_ids = get_message(message_id)
-        subj = headers.get("Subject", "(no subject)")
-        frm = headers.get("From", "(unknown)")
-        
-        # Triage using LLM
-        t = triage_email(lambda p: llm_client.call(user_id, p), frm, subj, snippet)
-        label = t["label"]
-        
-        item = (message_id, subj, frm, snippet, t)
+    for item in items:
+        label = item[4]["label"]
         if label == "meaningful":
             meaningful.append(item)
         elif label == "uncertain":
@@ -156,16 +169,74 @@ async def unread_all_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not allowed(update):
         return
     
-    msgs = list_unread(max_results=10)
+    msgs = await asyncio.to_thread(list_unread, max_results=10)
     await update.message.reply_text(f"Unread (raw) in Inbox: {len(msgs)}")
     
     for m in msgs:
-        headers, snippet, label_ids = get_message(m["id"])
+        headers, snippet, label_ids = await asyncio.to_thread(get_message, m["id"])
         await update.message.reply_text(
             f"Subject: {headers.get('Subject')}\nFrom: {headers.get('From')}\n\n{snippet}"
         )
 
 
+async def stats_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle /stats command - update processing and cache metrics."""
+    if not allowed(update):
+        return
+    
+    from src.telegram_client.channels import channel_cache_stats
+    
+    lines = ["📊 Статистика"]
+    processor = context.application.update_processor
+    if isinstance(processor, ChatOrderedUpdateProcessor):
+        s = processor.stats()
+        lines += [
+            "",
+            "Обработка сообщений:",
+            f"• выполняется: {s['running']}/{s['max_handlers']}",
+            f"• в очереди: {s['queued']} (пик {s['peak_queued']}), чатов с очередью: {s['busy_chats']}",
+            f"• обработано: {s['processed']}",
+            f"• ожидание: в среднем {s['avg_wait']:.2f} с, максимум {s['max_wait']:.2f} с",
+        ]
+    
+    c = channel_cache_stats()
+    lines += [
+        "",
+        "Кэш каналов:",
+        f"• попаданий: {c['hits']}, промахов: {c['misses']} ({c['hit_rate']:.0%})",
+        f"• сбросов: {c['invalidations']}",
+    ]
+    
+    from src.tools.web_search import get_search_client
+    from src.tools.page_fetch import get_page_fetcher
+    
+    s = get_search_client().stats
+    p = get_page_fetcher().stats
+    lines += [
+        "",
+        "Кэш поиска:",
+        f"• из памяти: {s['memory_hits']}, из БД: {s['disk_hits']}, запросов к DuckDuckGo: {s['misses']}",
+        f"• страницы: из кэша {p['fresh_hits']}, не изменились (304) {p['revalidated']}, "
+        f"загружено {p['fetched']}, ошибок {p['failed']}",
+    ]
+    
+    for kind, p in pending_stats().items():
+        lines += [
+            "",
+            f"Ожидают подтверждения ({kind}):",
+            f"• сейчас: {p['size']}, сохранено: {p['stored']}, подтверждено/отменено: {p['taken']}",
+            f"• истекло: {p['expired']}, вытеснено: {p['evicted']}",
+        ]
+    
+    f = single_flight_stats()
+    lines += [
+        "",
+        "Одинаковые запросы (дайджест, поиск, почта):",
+        f"• всего: {f['calls']}, присоединились к уже идущему: {f['shared']}, сейчас в работе: {f['in_flight']}",
+    ]
+    await update.message.reply_text("\n".join(lines))
+
+
 async def jarvis_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /jarvis command - chat with LLM."""
     if not allowed(update):
@@ -179,7 +250,7 @@ async def jarvis_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
     
     llm_client: LLMClient = context.bot_data.get("llm_client")
-    reply = llm_client.call(user_id, text)
+    reply = await llm_client.acall(user_id, text)
     await update.message.reply_text(reply)
 
 
@@ -230,7 +301,7 @@ async def on_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
         # Continue with normal chat if intent detection fails
     
     # Fallback to normal chat
-    reply = llm_client.call(update.effective_user.id, text)
+    reply = await llm_client.acall(update.effective_user.id, text)
     await update.message.reply_text(reply)
 
 
@@ -242,6 +313,7 @@ def register_handlers(app: Application, llm_client: LLMClient):
     # Command handlers - General
     app.add_handler(CommandHandler("start", start))
     app.add_handler(CommandHandler("jarvis", jarvis_cmd))
+    app.add_handler(CommandHandler("stats", stats_cmd))
     
     # Command handlers - Email
     app.add_handler(CommandHandler("spam_sweep", spam_sweep_cmd))
@@ -250,7 +322,9 @@ def register_handlers(app: Application, llm_client: LLMClient):
     
     # Command handlers - News & Channels
     app.add_handler(CommandHandler("news", news_cmd))
+    app.add_handler(CommandHandler("digest", digest_cmd))
     app.add_handler(CommandHandler("channels", channels_cmd))
+    app.add_handler(CommandHandler("feeds", feeds_cmd))
     app.add_handler(CommandHandler("search", search_cmd))
     app.add_handler(CommandHandler("news_search", news_search_cmd))
     
@@ -6,13 +6,26 @@ from telegram.ext import ContextTypes
 from src.config import ALLOWED_USER_IDS
 from src.telegram_client.channels import (
     get_monitored_channels,
-    add_channel,
+    add_channels,
     remove_channel,
 )
-from src.tools import aggregate_news, search_web, search_news
-from src.tools.news_aggregator import format_messages_for_llm
-from src.tools.summarizer import create_digest
+from src.feeds import add_feeds, remove_feed, get_monitored_feeds, feed_title
+from src.tools import build_news_digest, build_brief_digest, asearch_web, asearch_web_deep, asearch_news
 from src.llm import LLMClient
+from src.scheduler import sync_schedule
+from .delivery import get_delivery
+from src.scheduler.subscriptions import (
+    get_subscription,
+    update_subscription,
+    parse_times,
+    parse_channels,
+    MAX_HOURS_BACK,
+)
+
+# First /search argument that turns on deep mode
+DEEP_SEARCH_WORDS = ("глубоко", "deep")
+# Page text per result in the deep search summary prompt
+DEEP_PAGE_CHARS = 1500
 
 
 def allowed(update: Update) -> bool:
@@ -50,34 +63,24 @@ async def news_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
             await update.message.reply_text("❌ LLM клиент не инициализирован")
             return
         
-        # Aggregate news from last 24 hours
-        news_data = await aggregate_news(hours_back=24)
-        
-        if news_data['total_messages'] == 0:
-            await update.message.reply_text("📭 Нет новых сообщений за последние 24 часа.")
+        if digest_type == 'brief':
+            await _send_brief_digest(update, llm_client)
             return
         
-        # Format for LLM (limit to 50 messages to avoid token limits)
-        news_content = format_messages_for_llm(news_data, max_messages=50, max_chars_per_message=300)
-        
-        # Check content length
-        if len(news_content) > 15000:
-            await update.message.reply_text("⚠️ Слишком много новостей, уменьшаю выборку...")
-            news_content = format_messages_for_llm(news_data, max_messages=30, max_chars_per_message=200)
+        # Digest of the last 24 hours (shared with identical requests in flight)
+        result = await build_news_digest(digest_type, llm_client, hours_back=24)
         
-        # Create digest
-        digest = create_digest(
-            news_content=news_content,
-            digest_type=digest_type,
-            llm_client=llm_client,
-            is_scheduled=False
-        )
+        if result is None:
+            await update.message.reply_text("📭 Нет новых сообщений за последние 24 часа.")
+            return
+        digest, total_messages = result
         
         # Send digest
-        header = f"📰 {'Подробная' if digest_type == 'full' else 'Краткая'} сводка новостей\n"
-        header += f"📊 Обработано сообщений: {news_data['total_messages']}\n\n"
+        header = "📰 Подробная сводка новостей\n"
+        header += f"📊 Обработано сообщений: {total_messages}\n\n"
         
-        await update.message.reply_text(header + digest)
+        # Full digests often exceed Telegram's message limit
+        await get_delivery().deliver([update.effective_chat.id], header + digest)
     
     except Exception as e:
         error_msg = f"❌ Ошибка при создании дайджеста: {str(e)[:200]}"
@@ -89,10 +92,110 @@ async def news_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text(error_msg)
 
 
+async def _send_brief_digest(update: Update, llm_client: LLMClient):
+    """Send a brief digest with a button per section that expands it on demand."""
+    result = await build_brief_digest(llm_client, hours_back=24)
+    
+    if result is None:
+        await update.message.reply_text("📭 Нет новых сообщений за последние 24 часа.")
+        return
+    
+    header = "📰 Краткая сводка новостей\n"
+    header += f"📊 Обработано сообщений: {result['total_messages']}\n\n"
+    await get_delivery().deliver([update.effective_chat.id], header + result['digest'])
+    
+    if result['sections']:
+        kb = InlineKeyboardMarkup([
+            [InlineKeyboardButton(f"🔎 {label[:60]}", callback_data=f"section:{section_id}")]
+            for section_id, label in result['sections']
+        ])
+        await update.message.reply_text("Подробнее по темам:", reply_markup=kb)
+
+
+def _format_subscription(subscription) -> str:
+    if subscription is None:
+        return "📭 Подписка на сводки не настроена."
+    channels = subscription.channels.replace(',', ', ') if subscription.channels else "все отслеживаемые"
+    times = [at for at in (subscription.schedule_times or "").split(',') if at]
+    text = "📬 Ваша подписка на сводки:\n\n"
+    text += f"• Статус: {'включена' if subscription.is_active else 'выключена'}\n"
+    text += f"• Время: {', '.join(times) or '—'}\n"
+    text += f"• Тип: {'подробная' if subscription.digest_type == 'full' else 'краткая'}\n"
+    text += f"• Каналы: {channels}\n"
+    text += f"• Период: {subscription.hours_back} ч\n"
+    return text
+
+
+async def digest_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Handle /digest command - manage scheduled digest subscription.
+    Usage: /digest [время 09:00 21:00|тип краткая|каналы @a @b|часы 12|вкл|выкл]
+    """
+    if not allowed(update):
+        return
+    
+    user_id = update.effective_user.id
+    args = context.args
+    
+    # No arguments - show settings
+    if not args:
+        await update.message.reply_text(_format_subscription(await get_subscription(user_id)))
+        return
+    
+    action = args[0].lower()
+    value = " ".join(args[1:])
+    fields = {}
+    
+    try:
+        if action in ('время', 'time'):
+            times = parse_times(value)
+            if not times:
+                # An empty schedule would silently unsubscribe, that is what "выкл" is for
+                raise ValueError("no times given")
+            fields['schedule_times'] = ",".join(times)
+        elif action in ('тип', 'type'):
+            if 'полн' in value.lower() or 'full' in value.lower():
+                fields['digest_type'] = 'full'
+            elif 'крат' in value.lower() or 'brief' in value.lower():
+                fields['digest_type'] = 'brief'
+        elif action in ('каналы', 'channels'):
+            if value.lower() in ('все', 'all'):
+                fields['channels'] = ""
+            else:
+                fields['channels'] = ",".join(parse_channels(value))
+        elif action in ('часы', 'hours'):
+            hours = int(value)
+            if not 1 <= hours <= MAX_HOURS_BACK:
+                raise ValueError(f"hours out of range: {hours}")
+            fields['hours_back'] = hours
+        elif action in ('вкл', 'on'):
+            fields['is_active'] = True
+        elif action in ('выкл', 'off'):
+            fields['is_active'] = False
+    except ValueError:
+        fields = {}
+    
+    if not fields:
+        await update.message.reply_text(
+            "Использование:\n"
+            "/digest - текущие настройки\n"
+            "/digest время 09:00 21:00 - время сводок\n"
+            "/digest тип краткая|полная - тип сводки\n"
+            "/digest каналы @a @b|все - каналы для сводки\n"
+            f"/digest часы 12 - период сводки (1-{MAX_HOURS_BACK} ч)\n"
+            "/digest вкл|выкл - включить или выключить сводки"
+        )
+        return
+    
+    subscription = await update_subscription(user_id, **fields)
+    await sync_schedule()
+    await update.message.reply_text("✅ Настройки сохранены.\n\n" + _format_subscription(subscription))
+
+
 async def channels_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     Handle /channels command - manage monitored channels.
-    Usage: /channels [list|add @channel|remove @channel]
+    Usage: /channels [list|add @channel [@channel ...]|remove @channel]
     """
     if not allowed(update):
         return
@@ -101,7 +204,7 @@ async def channels_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     # No arguments - show list
     if not args:
-        channels = get_monitored_channels()
+        channels = await get_monitored_channels()
         if not channels:
             await update.message.reply_text(
                 "📋 Нет отслеживаемых каналов.\n\n"
@@ -124,12 +227,16 @@ async def channels_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
             await update.message.reply_text("Использование: /channels add @channelname")
             return
         
-        channel_username = args[1].strip()
+        channel_usernames = [a.strip().rstrip(',') for a in args[1:] if a.strip().rstrip(',')]
         try:
-            channel = await add_channel(channel_username)
-            await update.message.reply_text(
-                f"✅ Канал добавлен: {channel.channel_title or channel.channel_username}"
-            )
+            channels = await add_channels(channel_usernames)
+            if len(channels) == 1:
+                await update.message.reply_text(
+                    f"✅ Канал добавлен: {channels[0].channel_title or channels[0].channel_username}"
+                )
+            else:
+                titles = "\n".join(f"• {ch.channel_title or ch.channel_username}" for ch in channels)
+                await update.message.reply_text(f"✅ Добавлено каналов: {len(channels)}\n\n{titles}")
         except Exception as e:
             await update.message.reply_text(f"❌ Ошибка при добавлении канала: {e}")
         return
@@ -141,7 +248,7 @@ async def channels_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
             return
         
         channel_username = args[1].strip()
-        success = remove_channel(channel_username)
+        success = await remove_channel(channel_username)
         if success:
             await update.message.reply_text(f"✅ Канал удален: {channel_username}")
         else:
@@ -151,30 +258,106 @@ async def channels_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text(
         "Использование:\n"
         "/channels - список каналов\n"
-        "/channels add @channel - добавить канал\n"
+        "/channels add @channel [@channel ...] - добавить каналы\n"
         "/channels remove @channel - удалить канал"
     )
 
 
+async def feeds_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Handle /feeds command - manage monitored RSS/Atom feeds.
+    Usage: /feeds [add <url> [<url> ...]|remove <url>]
+    """
+    if not allowed(update):
+        return
+    
+    args = context.args
+    
+    # No arguments - show list
+    if not args:
+        feeds = await get_monitored_feeds()
+        if not feeds:
+            await update.message.reply_text(
+                "📋 Нет отслеживаемых RSS-лент.\n\n"
+                "Используйте: /feeds add https://example.com/rss"
+            )
+            return
+        
+        text = "📋 Отслеживаемые RSS-ленты:\n\n"
+        for feed in feeds:
+            text += f"• {feed_title(feed)}\n  {feed.url}\n"
+            if feed.poll_interval_minutes:
+                text += f"  проверка раз в {feed.poll_interval_minutes:.0f} мин"
+                if feed.error_count:
+                    text += f", ошибок подряд: {feed.error_count}"
+                text += "\n"
+        
+        text += f"\n📊 Всего: {len(feeds)} лент"
+        await update.message.reply_text(text)
+        return
+    
+    # Add feeds
+    if args[0].lower() in ('add', 'добавить'):
+        urls = [a.strip().rstrip(',') for a in args[1:] if a.strip().rstrip(',')]
+        if not urls or not all(url.startswith(('http://', 'https://')) for url in urls):
+            await update.message.reply_text("Использование: /feeds add https://example.com/rss")
+            return
+        
+        try:
+            feeds = await add_feeds(urls)
+            lines = []
+            for feed in feeds:
+                status = "⚠️ не удалось прочитать" if feed.error_count else "✅"
+                lines.append(f"{status} {feed_title(feed)}")
+            await update.message.reply_text(f"Добавлено лент: {len(feeds)}\n\n" + "\n".join(lines))
+        except Exception as e:
+            await update.message.reply_text(f"❌ Ошибка при добавлении ленты: {e}")
+        return
+    
+    # Remove feed
+    if args[0].lower() in ('remove', 'delete', 'удалить') and len(args) > 1:
+        if await remove_feed(args[1]):
+            await update.message.reply_text(f"✅ Лента удалена: {args[1]}")
+        else:
+            await update.message.reply_text(f"❌ Лента не найдена: {args[1]}")
+        return
+    
+    await update.message.reply_text(
+        "Использование:\n"
+        "/feeds - список лент\n"
+        "/feeds add <url> [<url> ...] - добавить RSS/Atom ленты\n"
+        "/feeds remove <url> - удалить ленту"
+    )
+
+
 async def search_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     Handle /search command - web search.
-    Usage: /search <query>
+    Usage: /search [глубоко] <query>
+    
+    Deep mode reads the top result pages and summarizes their text
+    instead of the search snippets.
     """
     if not allowed(update):
         return
     
     args = context.args
+    deep = bool(args) and args[0].lower() in DEEP_SEARCH_WORDS
+    if deep:
+        args = args[1:]
     if not args:
-        await update.message.reply_text("Использование: /search <запрос>")
+        await update.message.reply_text("Использование: /search [глубоко] <запрос>")
         return
     
     query = " ".join(args)
-    await update.message.reply_text(f"🔍 Ищу: {query}...")
+    await update.message.reply_text(f"🔍 Ищу{' и читаю страницы' if deep else ''}: {query}...")
     
     try:
         # Try search with Russian region first
-        results = search_web(query, max_results=5, region="ru-ru")
+        if deep:
+            results = await asearch_web_deep(query, max_results=5, region="ru-ru")
+        else:
+            results = await asearch_web(query, max_results=5, region="ru-ru")
         
         if not results:
             await update.message.reply_text("🤷 Ничего не найдено. Попробуйте другой запрос.")
@@ -205,16 +388,24 @@ async def search_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 # Create a cleaner prompt for LLM
                 results_text = ""
                 for i, result in enumerate(results, 1):
-                    results_text += f"{i}. {result['title']}\n{result['body'][:300]}\n\n"
+                    # Page text when deep mode fetched it, the snippet otherwise
+                    if result.get('content'):
+                        results_text += f"{i}. {result['title']}\n{result['content'][:DEEP_PAGE_CHARS]}\n\n"
+                    else:
+                        results_text += f"{i}. {result['title']}\n{result['body'][:300]}\n\n"
                 
+                if deep:
+                    instruction = "Ответь на вопрос пользователя на основе текста этих страниц (до 5 предложений):"
+                else:
+                    instruction = "Кратко ответь на вопрос пользователя на основе этих результатов (2-3 предложения):"
                 summary_prompt = (
                     f"Пользователь искал: '{query}'\n\n"
                     f"Результаты поиска:\n{results_text}\n\n"
-                    f"Кратко ответь на вопрос пользователя на основе этих результатов (2-3 предложения):"
+                    f"{instruction}"
                 )
                 
                 await update.message.reply_text("💭 Создаю краткое резюме...")
-                summary = llm_client.call_without_history(summary_prompt, temperature=0.3)
+                summary = await llm_client.acall_without_history(summary_prompt, temperature=0.3)
                 await update.message.reply_text(f"📝 Краткое резюме:\n\n{summary}")
             except Exception as llm_error:
                 print(f"LLM summary error: {llm_error}")
@@ -242,7 +433,7 @@ async def news_search_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text(f"📰 Ищу новости: {query}...")
     
     try:
-        results = search_news(query, max_results=10, region="ru-ru")
+        results = await asearch_news(query, max_results=10, region="ru-ru")
         
         if not results:
             await update.message.reply_text("🤷 Новостей не найдено. Попробуйте другую тему.")
@@ -285,7 +476,7 @@ async def news_search_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 )
                 
                 await update.message.reply_text("💭 Создаю сводку...")
-                summary = llm_client.call_without_history(summary_prompt, temperature=0.3)
+                summary = await llm_client.acall_without_history(summary_prompt, temperature=0.3)
                 await update.message.reply_text(f"📝 Краткая сводка:\n\n{summary}")
             except Exception as llm_error:
                 print(f"LLM summary error: {llm_error}")
@@ -0,0 +1,119 @@
+"""Pending state of multi-step bot flows, with expiry and a size bound."""
+import json
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, select
+
+from src.config import PENDING_ACTION_TTL_MINUTES, PENDING_ACTION_MAX_ENTRIES
+from src.database import get_session, PendingAction
+
+# Every store, for /stats
+_stores: List["PendingStore"] = []
+
+
+class PendingStore:
+    """
+    Bounded key-value store for state that waits for the user's next step.
+    
+    Entries expire ``ttl_minutes`` after they are put and the oldest ones are
+    evicted beyond ``max_entries``, so abandoned flows (a confirmation
+    nobody taps) do not pile up. With ``persist`` entries are also written
+    to pending_actions and survive a restart; values must then be
+    JSON-serializable. Expired rows are removed by the retention job.
+    """
+    
+    def __init__(
+        self,
+        kind: str,
+        ttl_minutes: int = PENDING_ACTION_TTL_MINUTES,
+        max_entries: int = PENDING_ACTION_MAX_ENTRIES,
+        persist: bool = False
+    ):
+        self.kind = kind
+        self.ttl = timedelta(minutes=ttl_minutes)
+        self.max_entries = max_entries
+        self.persist = persist
+        # key -> (expires_at, value); same TTL for all, so oldest first is soonest to expire
+        self._entries: "OrderedDict[str, Tuple[datetime, Any]]" = OrderedDict()
+        self.stats = {'stored': 0, 'taken': 0, 'expired': 0, 'evicted': 0}
+        _stores.append(self)
+    
+    def __len__(self) -> int:
+        self._purge(datetime.now(timezone.utc))
+        return len(self._entries)
+    
+    def _purge(self, now: datetime):
+        while self._entries:
+            key, (expires_at, _) = next(iter(self._entries.items()))
+            if expires_at > now:
+                break
+            del self._entries[key]
+            self.stats['expired'] += 1
+    
+    async def put(self, key: Any, value: Any):
+        """Store the state of a flow, replacing the previous one under the key."""
+        key = str(key)
+        now = datetime.now(timezone.utc)
+        self._purge(now)
+        expires_at = now + self.ttl
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        self.stats['stored'] += 1
+        
+        evicted = []
+        while len(self._entries) > self.max_entries:
+            evicted.append(self._entries.popitem(last=False)[0])
+            self.stats['evicted'] += 1
+        
+        if self.persist:
+            async with get_session() as db:
+                if evicted:
+                    await db.execute(
+                        delete(PendingAction).where(PendingAction.kind == self.kind, PendingAction.key.in_(evicted))
+                    )
+                row = await db.scalar(
+                    select(PendingAction).where(PendingAction.kind == self.kind, PendingAction.key == key)
+                )
+                if row is None:
+                    row = PendingAction(kind=self.kind, key=key)
+                    db.add(row)
+                row.payload = json.dumps(value, ensure_ascii=False)
+                row.expires_at = expires_at
+                await db.commit()
+    
+    async def pop(self, key: Any) -> Optional[Any]:
+        """
+        Take the state of a flow out of the store.
+        
+        Returns:
+            Stored value, or None if there is none or it expired
+        """
+        key = str(key)
+        now = datetime.now(timezone.utc)
+        self._purge(now)
+        entry = self._entries.pop(key, None)
+        
+        if self.persist:
+            async with get_session() as db:
+                row = await db.scalar(
+                    select(PendingAction).where(PendingAction.kind == self.kind, PendingAction.key == key)
+                )
+                if row is not None:
+                    await db.delete(row)
+                    await db.commit()
+                    expires_at = row.expires_at.replace(tzinfo=timezone.utc) if row.expires_at.tzinfo is None else row.expires_at
+                    if entry is None and expires_at > now:
+                        # Put before a restart
+                        entry = (expires_at, json.loads(row.payload))
+        
+        if entry is None:
+            return None
+        self.stats['taken'] += 1
+        return entry[1]
+
+
+def pending_stats() -> Dict[str, dict]:
+    """Size and counters of every pending store, by kind."""
+    return {store.kind: {'size': len(store), **store.stats} for store in _stores}
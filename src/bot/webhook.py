@@ -0,0 +1,95 @@
+"""Webhook mode: an embedded aiohttp server that receives updates from Telegram."""
+import asyncio
+import hmac
+import json
+import signal
+
+from aiohttp import web
+from telegram import Update
+from telegram.ext import Application
+
+from src.config import WEBHOOK_URL, WEBHOOK_LISTEN, WEBHOOK_PORT, WEBHOOK_PATH, WEBHOOK_SECRET
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+def build_webhook_app(app: Application, secret: str = WEBHOOK_SECRET, path: str = WEBHOOK_PATH) -> web.Application:
+    """
+    Create the aiohttp app that feeds posted updates into the bot.
+    
+    Requests must carry the secret token Telegram sends back in
+    X-Telegram-Bot-Api-Secret-Token. Updates are put on the application's
+    update queue, so they go through the same handlers and update
+    processor as in polling mode; Telegram gets its 200 right away.
+    
+    Args:
+        app: Initialized bot application
+        secret: Expected secret token
+        path: URL path updates are posted to
+    """
+    async def receive(request: web.Request) -> web.Response:
+        token = request.headers.get(SECRET_HEADER, "")
+        if not hmac.compare_digest(token.encode(), secret.encode()):
+            return web.Response(status=403)
+        try:
+            data = await request.json()
+            update = Update.de_json(data, app.bot)
+        except (json.JSONDecodeError, TypeError, ValueError, KeyError, AttributeError) as e:
+            print(f"Webhook: bad update: {e}")
+            return web.Response(status=400)
+        await app.update_queue.put(update)
+        return web.Response()
+    
+    async def health(request: web.Request) -> web.Response:
+        return web.json_response({'ok': True, 'pending': app.update_queue.qsize()})
+    
+    server = web.Application()
+    server.router.add_post(path, receive)
+    server.router.add_get("/healthz", health)
+    return server
+
+
+async def run_webhook(app: Application):
+    """
+    Run the bot in webhook mode until SIGINT/SIGTERM.
+    
+    Mirrors Application.run_polling(): initializes the application, runs
+    post_init, serves updates, then stops and runs post_shutdown. The
+    webhook is registered with Telegram only when WEBHOOK_URL is set;
+    without it the server only accepts updates posted locally.
+    """
+    if not WEBHOOK_SECRET:
+        raise RuntimeError("WEBHOOK_SECRET must be set in webhook mode")
+    
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    
+    async with app:
+        if app.post_init:
+            await app.post_init(app)
+        if WEBHOOK_URL:
+            await app.bot.set_webhook(
+                url=WEBHOOK_URL.rstrip("/") + WEBHOOK_PATH,
+                secret_token=WEBHOOK_SECRET,
+                allowed_updates=Update.ALL_TYPES,
+            )
+            print(f"✅ Webhook registered: {WEBHOOK_URL.rstrip('/')}{WEBHOOK_PATH}")
+        
+        runner = web.AppRunner(build_webhook_app(app))
+        await runner.setup()
+        site = web.TCPSite(runner, WEBHOOK_LISTEN, WEBHOOK_PORT)
+        await site.start()
+        print(f"✅ Listening for updates on http://{WEBHOOK_LISTEN}:{WEBHOOK_PORT}{WEBHOOK_PATH}")
+        
+        await app.start()
+        try:
+            await stop.wait()
+        finally:
+            # Stop taking updates first, then let queued ones finish
+            await runner.cleanup()
+            await app.stop()
+    
+    if app.post_shutdown:
+        await app.post_shutdown(app)
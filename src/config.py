@@ -8,6 +8,18 @@ load_dotenv()
 BOT_TOKEN = os.environ["TELEGRAM_BOT_TOKEN"]
 ALLOWED_USER_IDS = {int(x.strip()) for x in os.getenv("ALLOWED_USER_IDS", "").split(",") if x.strip()}
 GROUP_MODE = os.getenv("GROUP_MODE", "mentions").lower()  # off/mentions/commands
+BOT_MAX_CONCURRENT_HANDLERS = int(os.getenv("BOT_MAX_CONCURRENT_HANDLERS", "8"))  # Разные чаты обрабатываются параллельно
+BOT_MAX_PENDING_UPDATES = int(os.getenv("BOT_MAX_PENDING_UPDATES", "256"))  # Включая ждущие своей очереди в чате
+PENDING_ACTION_TTL_MINUTES = int(os.getenv("PENDING_ACTION_TTL_MINUTES", "30"))  # Сколько ждать нажатия кнопки подтверждения
+PENDING_ACTION_MAX_ENTRIES = int(os.getenv("PENDING_ACTION_MAX_ENTRIES", "1000"))
+
+# Receiving updates: polling или webhook (встроенный HTTP-сервер, Telegram сам присылает обновления)
+BOT_MODE = os.getenv("BOT_MODE", "polling").lower()
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")  # Публичный адрес без пути; пусто = не регистрировать в Telegram (локальная проверка)
+WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "127.0.0.1")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")  # 1-256 символов A-Z a-z 0-9 _ -
 
 # Telegram Client (для чтения каналов)
 TELEGRAM_API_ID = os.getenv("TELEGRAM_API_ID")  # Получить на my.telegram.org
@@ -17,6 +29,8 @@ TELEGRAM_SESSION_NAME = os.getenv("TELEGRAM_SESSION_NAME", "jarvis_client")
 # LM Studio
 LM_BASE = os.getenv("LM_BASE", "http://127.0.0.1:1234/v1")
 LM_MODEL = os.getenv("LM_MODEL", "llama-3.1-8b-instruct")
+LLM_CONTEXT_TOKENS = int(os.getenv("LLM_CONTEXT_TOKENS", "8192"))  # Context Length модели в LM Studio
+LLM_TOKENIZER = os.getenv("LLM_TOKENIZER", "")  # tiktoken:<encoding> / hf:<model>, пусто - оценка по символам
 
 # Gmail
 GMAIL_TOKEN_FILE = os.getenv("GMAIL_TOKEN_FILE", "gmail_token.json")
@@ -29,12 +43,72 @@ GMAIL_SCOPES = [
 ]
 
 # Database
-DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///jarvis.db")
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///jarvis.db")  # Для Postgres: postgresql://... (нужен asyncpg)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
 
 # News Settings
 NEWS_SCHEDULE_MORNING = os.getenv("NEWS_SCHEDULE_MORNING", "10:00")  # Время утренней сводки
 NEWS_SCHEDULE_EVENING = os.getenv("NEWS_SCHEDULE_EVENING", "21:00")  # Время вечерней сводки
 NEWS_TIMEZONE = os.getenv("NEWS_TIMEZONE", "Europe/Moscow")
+# Сводка по расписанию готовится заранее; запас по времени считается по прошлым генерациям
+DIGEST_WARMUP_MIN_MINUTES = int(os.getenv("DIGEST_WARMUP_MIN_MINUTES", "5"))
+DIGEST_WARMUP_MAX_MINUTES = int(os.getenv("DIGEST_WARMUP_MAX_MINUTES", "60"))
+
+# Digest generation
+DIGEST_MODE = os.getenv("DIGEST_MODE", "auto").lower()  # auto/single/map_reduce
+DIGEST_OUTPUT_TOKENS = int(os.getenv("DIGEST_OUTPUT_TOKENS", "1500"))  # Резерв контекста под ответ модели
+DIGEST_MAX_MESSAGES = int(os.getenv("DIGEST_MAX_MESSAGES", "300"))  # Лимит сообщений для map-reduce режима
+DIGEST_MAP_CONCURRENCY = int(os.getenv("DIGEST_MAP_CONCURRENCY", "2"))  # Параллельные запросы к LLM
+DIGEST_GROUP_BY = os.getenv("DIGEST_GROUP_BY", "topic").lower()  # topic/channel - группировка новостей в промпте
+DIGEST_BUCKET_HOURS = int(os.getenv("DIGEST_BUCKET_HOURS", "1"))  # Размер интервала для кэша частичных сводок
+DIGEST_CACHE_TTL_HOURS = int(os.getenv("DIGEST_CACHE_TTL_HOURS", "72"))  # Сколько хранить частичные сводки
+DIGEST_SECTIONS = int(os.getenv("DIGEST_SECTIONS", "8"))  # Кнопок "подробнее" под краткой сводкой
+DIGEST_SECTION_RETENTION_DAYS = int(os.getenv("DIGEST_SECTION_RETENTION_DAYS", "7"))  # Сколько кнопки остаются рабочими
+
+# Web search cache (одинаковые запросы из /search и от агента не уходят в DuckDuckGo повторно)
+SEARCH_WEB_CACHE_TTL_MINUTES = int(os.getenv("SEARCH_WEB_CACHE_TTL_MINUTES", "60"))
+SEARCH_NEWS_CACHE_TTL_MINUTES = int(os.getenv("SEARCH_NEWS_CACHE_TTL_MINUTES", "10"))
+SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "256"))  # Записей в памяти, остальные в БД
+SEARCH_CONCURRENCY = int(os.getenv("SEARCH_CONCURRENCY", "3"))  # Одновременных запросов к DuckDuckGo (у каждого своя сессия)
+
+# Deep search (/search глубоко: страницы из выдачи скачиваются и читаются целиком)
+SEARCH_DEEP_PAGES = int(os.getenv("SEARCH_DEEP_PAGES", "3"))  # Сколько страниц из выдачи читать
+PAGE_FETCH_CONCURRENCY = int(os.getenv("PAGE_FETCH_CONCURRENCY", "4"))  # Одновременных загрузок страниц
+PAGE_FETCH_TIMEOUT = float(os.getenv("PAGE_FETCH_TIMEOUT", "10"))  # Секунд на страницу
+PAGE_MAX_BYTES = int(os.getenv("PAGE_MAX_BYTES", "2000000"))  # Больше не скачивается
+PAGE_TEXT_MAX_CHARS = int(os.getenv("PAGE_TEXT_MAX_CHARS", "20000"))  # Сколько текста страницы сохранять
+PAGE_EXTRACT_WORKERS = int(os.getenv("PAGE_EXTRACT_WORKERS", "2"))  # Потоков для разбора HTML
+PAGE_CACHE_FRESH_MINUTES = int(os.getenv("PAGE_CACHE_FRESH_MINUTES", "60"))  # Без перепроверки на сервере
+PAGE_CACHE_RETENTION_DAYS = int(os.getenv("PAGE_CACHE_RETENTION_DAYS", "7"))
+
+# Bot message delivery (лимиты Telegram: ~30 сообщений/с всего, ~1/с в один чат)
+DELIVERY_GLOBAL_RATE = float(os.getenv("DELIVERY_GLOBAL_RATE", "25"))  # Сообщений в секунду на бота
+DELIVERY_CHAT_INTERVAL = float(os.getenv("DELIVERY_CHAT_INTERVAL", "1.0"))  # Секунд между сообщениями в один чат
+DELIVERY_MAX_ATTEMPTS = int(os.getenv("DELIVERY_MAX_ATTEMPTS", "5"))
+
+# Adaptive channel fetching (лимиты подстраиваются под частоту постов канала)
+CHANNEL_FETCH_MIN_LIMIT = int(os.getenv("CHANNEL_FETCH_MIN_LIMIT", "20"))
+CHANNEL_FETCH_MAX_LIMIT = int(os.getenv("CHANNEL_FETCH_MAX_LIMIT", "2000"))
+CHANNEL_FETCH_HEADROOM = float(os.getenv("CHANNEL_FETCH_HEADROOM", "2.0"))  # Запас относительно ожидаемого числа постов
+
+# Background channel ingestion (посты каналов копятся в локальной БД, сводки читают её)
+CHANNEL_INGEST_INTERVAL_MINUTES = int(os.getenv("CHANNEL_INGEST_INTERVAL_MINUTES", "5"))  # Как часто запускается сбор
+CHANNEL_INGEST_SWEEP_MINUTES = int(os.getenv("CHANNEL_INGEST_SWEEP_MINUTES", "30"))  # За сколько обходятся все каналы
+CHANNEL_POST_RETENTION_HOURS = int(os.getenv("CHANNEL_POST_RETENTION_HOURS", "72"))  # Сколько хранить посты
+
+# RSS/Atom feeds (второй вид источников, без обращений к Telegram API)
+FEED_POLL_MIN_MINUTES = int(os.getenv("FEED_POLL_MIN_MINUTES", "5"))
+FEED_POLL_MAX_MINUTES = int(os.getenv("FEED_POLL_MAX_MINUTES", "240"))  # Для лент, которые почти не обновляются
+FEED_FETCH_CONCURRENCY = int(os.getenv("FEED_FETCH_CONCURRENCY", "4"))  # Одновременных загрузок лент
+FEED_FETCH_TIMEOUT = float(os.getenv("FEED_FETCH_TIMEOUT", "15"))  # Секунд на ленту
+FEED_MAX_BYTES = int(os.getenv("FEED_MAX_BYTES", "5000000"))
+
+# History retention (старые сводки и посты сжимаются, истекшие удаляются фоновой задачей)
+RETENTION_INTERVAL_HOURS = int(os.getenv("RETENTION_INTERVAL_HOURS", "6"))
+POST_COMPRESS_AFTER_HOURS = int(os.getenv("POST_COMPRESS_AFTER_HOURS", "24"))
+DIGEST_COMPRESS_AFTER_DAYS = int(os.getenv("DIGEST_COMPRESS_AFTER_DAYS", "7"))
+DIGEST_RETENTION_DAYS = int(os.getenv("DIGEST_RETENTION_DAYS", "365"))  # 0 = хранить вечно
 
 # Channels to monitor (можно задать в .env через запятую или в БД)
 DEFAULT_NEWS_CHANNELS = os.getenv("DEFAULT_NEWS_CHANNELS", "").split(",") if os.getenv("DEFAULT_NEWS_CHANNELS") else []
@@ -1,16 +1,43 @@
 """Database initialization and session management."""
+from .session import SessionLocal, AsyncSessionLocal, get_session, dispose_engines
 from .models import (
     init_db,
-    SessionLocal,
     PendingEmailDraft,
+    PendingAction,
     MonitoredChannel,
     NewsDigest,
+    ChannelStats,
+    PartialSummary,
+    DigestSubscription,
+    OutboxMessage,
+    ChannelPost,
+    ChannelIngestState,
+    MonitoredFeed,
+    FeedEntry,
+    DigestSection,
+    SearchCache,
+    PageCache,
 )
 
 __all__ = [
     "init_db",
     "SessionLocal",
+    "AsyncSessionLocal",
+    "get_session",
+    "dispose_engines",
     "PendingEmailDraft",
+    "PendingAction",
     "MonitoredChannel",
     "NewsDigest",
+    "ChannelStats",
+    "PartialSummary",
+    "DigestSubscription",
+    "OutboxMessage",
+    "ChannelPost",
+    "ChannelIngestState",
+    "MonitoredFeed",
+    "FeedEntry",
+    "DigestSection",
+    "SearchCache",
+    "PageCache",
 ]
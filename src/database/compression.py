@@ -0,0 +1,40 @@
+"""Compression of archived text bodies (digests, channel posts)."""
+import zlib
+from typing import Optional
+
+# Shared preset dictionary: phrases and words that recur in digests and posts.
+# Short texts compress poorly on their own; a dictionary gives zlib matches
+# from the first byte. Never edit a published dictionary, add a new version.
+_DICTIONARY_V1 = (
+    "📰 Дайджест новостей\n\n🔥 Главное\n\n📌 Источники: \n• \n\n"
+    "Подробнее: https://t.me/ "
+    "сообщает что это как так его она они для при или уже еще был была было были будет "
+    "все там где когда который которая которые также только после более если чтобы "
+    "этот эта эти того этого между года году лет сегодня вчера завтра время "
+    "Россия России российских Украины США Китая Европы министр правительство президент "
+    "компания компании рынок рынка рублей долларов млрд млн процентов заявил заявила "
+    "the and for with that this from are was were has have will not but about after "
+).encode("utf-8")
+
+DICTIONARIES = {1: _DICTIONARY_V1}
+CURRENT_VERSION = 1
+COMPRESSION_LEVEL = 9
+
+
+def compress_text(text: str) -> bytes:
+    """
+    Compress a text with the current shared dictionary.
+    
+    Returns:
+        Version byte followed by the zlib stream
+    """
+    compressor = zlib.compressobj(COMPRESSION_LEVEL, zdict=DICTIONARIES[CURRENT_VERSION])
+    return bytes([CURRENT_VERSION]) + compressor.compress(text.encode("utf-8")) + compressor.flush()
+
+
+def decompress_text(data: Optional[bytes]) -> Optional[str]:
+    """Restore a text compressed by compress_text() (None stays None)."""
+    if data is None:
+        return None
+    decompressor = zlib.decompressobj(zdict=DICTIONARIES[data[0]])
+    return (decompressor.decompress(data[1:]) + decompressor.flush()).decode("utf-8")
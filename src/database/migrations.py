@@ -0,0 +1,138 @@
+"""Versioned schema migrations for existing databases."""
+from datetime import datetime, timezone
+from typing import Callable, List, Tuple, Union
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, inspect, select, text
+from sqlalchemy.engine import Connection, Engine
+
+from .models import (
+    PendingEmailDraft,
+    MonitoredChannel,
+    NewsDigest,
+    PartialSummary,
+    OutboxMessage,
+    ChannelPost,
+    ChannelIngestState,
+)
+
+# Applied versions, one row per migration
+schema_migrations = Table(
+    "schema_migrations",
+    MetaData(),
+    Column("version", Integer, primary_key=True),
+    Column("name", String, nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+# A step is raw SQL or a function of the connection
+Step = Union[str, Callable[[Connection], None]]
+
+
+def _create_index(model, name: str) -> Callable[[Connection], None]:
+    """Create an index declared on a model (no-op if it exists, e.g. made by create_all)."""
+    def step(conn: Connection):
+        index = next(i for i in model.__table__.indexes if i.name == name)
+        index.create(conn, checkfirst=True)
+    return step
+
+
+def _add_column(model, name: str) -> Callable[[Connection], None]:
+    """Add a column declared on a model to an existing table (no-op if present)."""
+    def step(conn: Connection):
+        table = model.__table__
+        existing = {c['name'] for c in inspect(conn).get_columns(table.name)}
+        if name in existing:
+            return
+        column = table.c[name]
+        column_type = column.type.compile(dialect=conn.dialect)
+        conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {name} {column_type}'))
+    return step
+
+
+# (version, name, steps) in order; never edit an applied migration, add a new one
+MIGRATIONS: List[Tuple[int, str, List[Step]]] = [
+    (1, "indexes for hot queries", [
+        _create_index(NewsDigest, "ix_news_digests_created_at"),
+        _create_index(NewsDigest, "ix_news_digests_type_created"),
+        _create_index(MonitoredChannel, "ix_monitored_channels_active"),
+        _create_index(PartialSummary, "ix_partial_summaries_bucket_start"),
+        _create_index(ChannelPost, "ix_channel_posts_channel_date"),
+        # Pending outbox rows are read in id order, sent ones purged by sent_at
+        _create_index(OutboxMessage, "ix_outbox_messages_status_id"),
+        _create_index(OutboxMessage, "ix_outbox_messages_status_sent_at"),
+        "DROP INDEX IF EXISTS ix_outbox_messages_status",
+    ]),
+    (2, "pending draft age", [
+        _add_column(PendingEmailDraft, "created_at"),
+        _create_index(PendingEmailDraft, "ix_pending_email_drafts_user_created"),
+    ]),
+    (3, "compressed archive bodies", [
+        _add_column(NewsDigest, "content_compressed"),
+        _add_column(ChannelPost, "text_compressed"),
+    ]),
+    (4, "channel ingestion backoff", [
+        _add_column(ChannelIngestState, "last_attempt_at"),
+        _add_column(ChannelIngestState, "error_count"),
+        _add_column(ChannelIngestState, "retry_after"),
+    ]),
+]
+
+
+def run_migrations(engine: Engine) -> List[int]:
+    """
+    Apply pending migrations, each in its own transaction.
+    
+    Steps are idempotent, so a fresh database (already created by
+    create_all) just records the versions. ANALYZE runs after any change
+    so the query planner sees the new indexes.
+    
+    Args:
+        engine: Sync engine
+    
+    Returns:
+        Versions applied now
+    """
+    schema_migrations.create(engine, checkfirst=True)
+    with engine.connect() as conn:
+        applied = set(conn.scalars(select(schema_migrations.c.version)))
+    
+    done = []
+    for version, name, steps in MIGRATIONS:
+        if version in applied:
+            continue
+        with engine.begin() as conn:
+            for step in steps:
+                if callable(step):
+                    step(conn)
+                else:
+                    conn.execute(text(step))
+            conn.execute(schema_migrations.insert().values(
+                version=version, name=name, applied_at=datetime.now(timezone.utc)
+            ))
+        print(f"✅ Applied migration {version}: {name}")
+        done.append(version)
+    
+    if done:
+        with engine.begin() as conn:
+            conn.execute(text("ANALYZE"))
+    _enable_incremental_vacuum(engine)
+    return done
+
+
+def _enable_incremental_vacuum(engine: Engine):
+    """
+    Switch an existing SQLite file to incremental auto-vacuum.
+    
+    New files get it from the connection pragmas; an existing file needs
+    one full VACUUM to change the mode, after that the retention job frees
+    pages with PRAGMA incremental_vacuum.
+    """
+    if engine.dialect.name != "sqlite":
+        return
+    with engine.connect() as conn:
+        if conn.exec_driver_sql("PRAGMA auto_vacuum").scalar() == 2:
+            return
+    print("⏳ Enabling incremental auto-vacuum (one-time VACUUM)...")
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.exec_driver_sql("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.exec_driver_sql("VACUUM")
@@ -1,28 +1,47 @@
 """Database models."""
-from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime, Boolean
-from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy import (
+    Column, Integer, String, Text, DateTime, Boolean, Float, Index, LargeBinary, UniqueConstraint
+)
+from sqlalchemy.orm import declarative_base
 from datetime import datetime, timezone
-from src.config import DATABASE_URL
+from .session import engine
+from .compression import decompress_text
 
-engine = create_engine(DATABASE_URL, future=True)
-SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
 Base = declarative_base()
 
 
 class PendingEmailDraft(Base):
     """Stores email drafts pending user approval."""
     __tablename__ = "pending_email_drafts"
+    __table_args__ = (Index("ix_pending_email_drafts_user_created", "telegram_user_id", "created_at"),)
     
     id = Column(Integer, primary_key=True)
     telegram_user_id = Column(String, index=True)
     message_id = Column(String)
-    draft_id = Column(String, unique=True)
+    draft_id = Column(String, unique=True)  # Уникальный индекс, по нему ищут при нажатии кнопок
     draft_text = Column(Text)
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+
+
+class PendingAction(Base):
+    """State of a multi-step bot flow waiting for the user (e.g. spam confirmation)."""
+    __tablename__ = "pending_actions"
+    __table_args__ = (UniqueConstraint("kind", "key"),)
+    
+    id = Column(Integer, primary_key=True)
+    kind = Column(String, nullable=False)  # Имя хранилища, например 'spam'
+    key = Column(String, nullable=False)  # Обычно telegram_user_id
+    payload = Column(Text)  # JSON
+    expires_at = Column(DateTime, nullable=False, index=True)
+    
+    def __repr__(self):
+        return f"<PendingAction {self.kind}:{self.key}>"
 
 
 class MonitoredChannel(Base):
     """Telegram channels to monitor for news."""
     __tablename__ = "monitored_channels"
+    __table_args__ = (Index("ix_monitored_channels_active", "is_active", "channel_username"),)
     
     id = Column(Integer, primary_key=True)
     channel_username = Column(String, unique=True, nullable=False)  # @channelname или ID
@@ -38,18 +57,247 @@ class MonitoredChannel(Base):
 class NewsDigest(Base):
     """Store news digests history."""
     __tablename__ = "news_digests"
+    __table_args__ = (
+        Index("ix_news_digests_created_at", "created_at"),
+        Index("ix_news_digests_type_created", "digest_type", "created_at"),
+    )
     
     id = Column(Integer, primary_key=True)
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
     digest_type = Column(String)  # 'brief' или 'full'
     is_scheduled = Column(Boolean, default=False)  # Auto or manual
     content = Column(Text)
+    content_compressed = Column(LargeBinary, nullable=True)  # Заполняется вместо content для старых сводок
     message_count = Column(Integer, default=0)
     
+    @property
+    def body(self) -> str:
+        """Digest text, compressed or not."""
+        return self.content if self.content is not None else decompress_text(self.content_compressed)
+    
     def __repr__(self):
         return f"<NewsDigest {self.created_at} ({self.digest_type})>"
 
 
+class ChannelStats(Base):
+    """Per-channel posting-rate statistics used to size message fetches."""
+    __tablename__ = "channel_stats"
+    
+    id = Column(Integer, primary_key=True)
+    channel_username = Column(String, unique=True, nullable=False)
+    posts_per_hour = Column(Float, default=0.0)  # Сглаженная (EWMA) частота постов
+    fetch_count = Column(Integer, default=0)
+    last_fetch_count = Column(Integer, default=0)  # Сколько постов попало в последнее окно
+    truncated_windows = Column(Integer, default=0)  # Сколько раз окно не уместилось в лимит
+    last_truncated_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    
+    def __repr__(self):
+        return f"<ChannelStats {self.channel_username} {self.posts_per_hour:.2f}/h>"
+
+
+class PartialSummary(Base):
+    """Cached map-stage summary of one channel's posts in one time bucket."""
+    __tablename__ = "partial_summaries"
+    __table_args__ = (
+        UniqueConstraint("channel_username", "bucket_start"),
+        Index("ix_partial_summaries_bucket_start", "bucket_start"),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    channel_username = Column(String, nullable=False)
+    bucket_start = Column(DateTime, nullable=False)  # Начало интервала (UTC)
+    post_ids = Column(Text)  # Отсортированные id постов через запятую
+    post_ids_hash = Column(String)  # sha1 от post_ids, ключ актуальности
+    summary = Column(Text)
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    
+    def __repr__(self):
+        return f"<PartialSummary {self.channel_username} {self.bucket_start}>"
+
+
+class DigestSubscription(Base):
+    """Per-user settings of scheduled news digests."""
+    __tablename__ = "digest_subscriptions"
+    
+    id = Column(Integer, primary_key=True)
+    telegram_user_id = Column(String, unique=True, nullable=False)
+    schedule_times = Column(String)  # "HH:MM" через запятую
+    digest_type = Column(String, default="full")  # 'brief' или 'full'
+    channels = Column(Text, default="")  # Каналы через запятую, пусто = все отслеживаемые
+    hours_back = Column(Integer, default=12)
+    is_active = Column(Boolean, default=True)
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    
+    def __repr__(self):
+        return f"<DigestSubscription {self.telegram_user_id} {self.schedule_times} ({self.digest_type})>"
+
+
+class OutboxMessage(Base):
+    """Bot message waiting to be delivered (one row per chunk)."""
+    __tablename__ = "outbox_messages"
+    __table_args__ = (
+        Index("ix_outbox_messages_status_id", "status", "id"),
+        Index("ix_outbox_messages_status_sent_at", "status", "sent_at"),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    chat_id = Column(String, index=True, nullable=False)
+    text = Column(Text, nullable=False)
+    status = Column(String, default="pending")  # pending/sent/failed
+    attempts = Column(Integer, default=0)
+    next_attempt_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    sent_at = Column(DateTime, nullable=True)
+    
+    def __repr__(self):
+        return f"<OutboxMessage {self.chat_id} {self.status}>"
+
+
+class ChannelPost(Base):
+    """Channel post in the local store filled by background ingestion."""
+    __tablename__ = "channel_posts"
+    __table_args__ = (
+        UniqueConstraint("channel_username", "message_id"),
+        Index("ix_channel_posts_channel_date", "channel_username", "date"),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    channel_username = Column(String, nullable=False)
+    message_id = Column(Integer, nullable=False)
+    date = Column(DateTime, nullable=False, index=True)  # UTC
+    text = Column(Text)
+    text_compressed = Column(LargeBinary, nullable=True)  # Заполняется вместо text для старых постов
+    views = Column(Integer, default=0)
+    forwards = Column(Integer, default=0)
+    reactions = Column(Integer, default=0)
+    fetched_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    
+    @property
+    def body(self) -> str:
+        """Post text, compressed or not."""
+        return self.text if self.text is not None else decompress_text(self.text_compressed)
+    
+    def __repr__(self):
+        return f"<ChannelPost {self.channel_username}/{self.message_id}>"
+
+
+class ChannelIngestState(Base):
+    """How much of a channel's history the local post store covers."""
+    __tablename__ = "channel_ingest_state"
+    
+    id = Column(Integer, primary_key=True)
+    channel_username = Column(String, unique=True, nullable=False)
+    covered_from = Column(DateTime, nullable=True)  # Посты с этого момента есть в хранилище без пропусков
+    last_ingested_at = Column(DateTime, nullable=True)
+    last_attempt_at = Column(DateTime, nullable=True)  # Последняя попытка, в том числе неудачная
+    error_count = Column(Integer, default=0)  # Неудачных попыток подряд
+    retry_after = Column(DateTime, nullable=True)  # До этого времени канал не собирается (после ошибок)
+    
+    def __repr__(self):
+        return f"<ChannelIngestState {self.channel_username} {self.last_ingested_at}>"
+
+
+class MonitoredFeed(Base):
+    """RSS/Atom feed monitored as a news source."""
+    __tablename__ = "monitored_feeds"
+    __table_args__ = (Index("ix_monitored_feeds_active_next_poll", "is_active", "next_poll_at"),)
+    
+    id = Column(Integer, primary_key=True)
+    url = Column(String, unique=True, nullable=False)
+    title = Column(String, nullable=True)
+    is_active = Column(Boolean, default=True)
+    added_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    etag = Column(String, nullable=True)
+    last_modified = Column(String, nullable=True)
+    poll_interval_minutes = Column(Float, nullable=True)  # Подстраивается под частоту публикаций
+    next_poll_at = Column(DateTime, nullable=True)
+    last_polled_at = Column(DateTime, nullable=True)
+    error_count = Column(Integer, default=0)  # Ошибок подряд
+    
+    def __repr__(self):
+        return f"<MonitoredFeed {self.url}>"
+
+
+class FeedEntry(Base):
+    """Feed entry in the local post store, next to channel posts."""
+    __tablename__ = "feed_entries"
+    __table_args__ = (
+        UniqueConstraint("feed_id", "guid"),
+        Index("ix_feed_entries_feed_date", "feed_id", "date"),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    feed_id = Column(Integer, nullable=False)
+    guid = Column(String, nullable=False)  # id записи, ссылка или хэш заголовка
+    date = Column(DateTime, nullable=False, index=True)  # UTC
+    title = Column(Text)
+    text = Column(Text)
+    link = Column(String)
+    fetched_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    
+    def __repr__(self):
+        return f"<FeedEntry {self.feed_id}/{self.guid}>"
+
+
+class DigestSection(Base):
+    """Topic (or channel) of a brief digest that can be expanded on demand."""
+    __tablename__ = "digest_sections"
+    
+    id = Column(Integer, primary_key=True)
+    digest_id = Column(Integer, index=True)  # NewsDigest с краткой сводкой
+    position = Column(Integer, default=0)
+    label = Column(String)
+    channels = Column(Text)  # Названия каналов через запятую
+    source = Column(Text)  # Посты темы для подробной версии
+    detail = Column(Text, nullable=True)  # Подробная версия, появляется после первого запроса
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), index=True)
+    expanded_at = Column(DateTime, nullable=True)
+    
+    def __repr__(self):
+        return f"<DigestSection {self.digest_id}/{self.position} {self.label}>"
+
+
+class SearchCache(Base):
+    """Cached DuckDuckGo search results."""
+    __tablename__ = "search_cache"
+    
+    id = Column(Integer, primary_key=True)
+    key = Column(String, unique=True, nullable=False)  # вид:регион:количество:нормализованный запрос
+    kind = Column(String)  # 'web' или 'news'
+    query = Column(Text)
+    results = Column(Text)  # JSON
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), index=True)
+    
+    def __repr__(self):
+        return f"<SearchCache {self.key}>"
+
+
+class PageCache(Base):
+    """Main text extracted from web pages, with HTTP validators for revalidation."""
+    __tablename__ = "page_cache"
+    
+    id = Column(Integer, primary_key=True)
+    url = Column(String, unique=True, nullable=False)
+    etag = Column(String)
+    last_modified = Column(String)
+    content_compressed = Column(LargeBinary)
+    checked_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), index=True)  # Последняя проверка на сервере
+    
+    @property
+    def body(self) -> str:
+        """Extracted page text."""
+        return decompress_text(self.content_compressed) or ""
+    
+    def __repr__(self):
+        return f"<PageCache {self.url}>"
+
+
 def init_db():
-    """Initialize database tables."""
+    """Initialize database tables and bring an existing schema up to date."""
+    from .migrations import run_migrations
+    
     Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
@@ -0,0 +1,145 @@
+"""Retention policies: compress old history, delete expired rows, free pages."""
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from src.config import (
+    CHANNEL_POST_RETENTION_HOURS,
+    POST_COMPRESS_AFTER_HOURS,
+    DIGEST_COMPRESS_AFTER_DAYS,
+    DIGEST_RETENTION_DAYS,
+    DIGEST_SECTION_RETENTION_DAYS,
+    SEARCH_WEB_CACHE_TTL_MINUTES,
+    SEARCH_NEWS_CACHE_TTL_MINUTES,
+    PAGE_CACHE_RETENTION_DAYS,
+)
+from .compression import compress_text
+from .models import NewsDigest, ChannelPost, DigestSection, SearchCache, PageCache, FeedEntry, PendingAction
+from .session import get_session, async_engine
+
+# Rows per transaction: short write locks keep ingestion and delivery responsive
+BATCH_SIZE = 500
+# Pages returned to the OS per PRAGMA incremental_vacuum call
+VACUUM_PAGES = 2000
+
+
+async def _compress_batches(model, text_column, compressed_column, older_than: datetime, date_column) -> int:
+    """Move plain text of rows older than a cutoff into the compressed column, in batches."""
+    done = 0
+    while True:
+        async with get_session() as db:
+            rows = (await db.execute(
+                select(model.id, text_column)
+                .where(date_column < older_than, text_column.is_not(None))
+                .limit(BATCH_SIZE)
+            )).all()
+            if not rows:
+                return done
+            for row_id, body in rows:
+                await db.execute(
+                    update(model)
+                    .where(model.id == row_id)
+                    .values({text_column: None, compressed_column: compress_text(body)})
+                )
+            await db.commit()
+        done += len(rows)
+
+
+async def _delete_batches(model, older_than: datetime, date_column) -> int:
+    """Delete rows older than a cutoff, one batch per transaction."""
+    done = 0
+    while True:
+        async with get_session() as db:
+            ids = select(model.id).where(date_column < older_than).limit(BATCH_SIZE).scalar_subquery()
+            result = await db.execute(delete(model).where(model.id.in_(ids)))
+            await db.commit()
+        if not result.rowcount:
+            return done
+        done += result.rowcount
+
+
+async def _free_pages(conn: AsyncConnection) -> int:
+    return (await conn.exec_driver_sql("PRAGMA freelist_count")).scalar() or 0
+
+
+async def _incremental_vacuum(engine: AsyncEngine = async_engine) -> int:
+    """
+    Return free pages to the OS (SQLite with auto_vacuum=INCREMENTAL only).
+    
+    The sqlite3 driver steps a row-less pragma only once per execute(),
+    which frees a single page, so the pragma goes through executescript(),
+    which runs it to the end. Calls repeat in VACUUM_PAGES chunks while the
+    free list keeps shrinking.
+    
+    Returns:
+        Number of pages actually freed
+    """
+    if engine.dialect.name != "sqlite":
+        return 0
+    async with engine.connect() as conn:
+        before = remaining = await _free_pages(conn)
+        raw = (await conn.get_raw_connection()).driver_connection
+        while remaining:
+            await raw.executescript(f"PRAGMA incremental_vacuum({VACUUM_PAGES});")
+            now = await _free_pages(conn)
+            if now >= remaining:
+                # auto_vacuum is not INCREMENTAL, nothing can be freed
+                break
+            remaining = now
+        return before - remaining
+
+
+async def run_retention() -> dict:
+    """
+    Apply retention policies to digest and post history.
+    
+    Digests older than DIGEST_COMPRESS_AFTER_DAYS and posts older than
+    POST_COMPRESS_AFTER_HOURS are stored compressed; digests older than
+    DIGEST_RETENTION_DAYS (0 keeps them forever), expandable digest
+    sections older than DIGEST_SECTION_RETENTION_DAYS, expired search
+    cache entries and pending actions, web pages not checked for
+    PAGE_CACHE_RETENTION_DAYS and posts and feed entries older than
+    CHANNEL_POST_RETENTION_HOURS are deleted. Freed pages are returned
+    with an incremental vacuum.
+    
+    Returns:
+        Dict with the number of rows compressed and deleted per table
+        (and pages_freed when anything changed)
+    """
+    now = datetime.now(timezone.utc)
+    report = {'digests_deleted': 0}
+    # Delete first, so expiring rows are not compressed for nothing
+    if DIGEST_RETENTION_DAYS:
+        report['digests_deleted'] = await _delete_batches(
+            NewsDigest, now - timedelta(days=DIGEST_RETENTION_DAYS), NewsDigest.created_at
+        )
+    report['sections_deleted'] = await _delete_batches(
+        DigestSection, now - timedelta(days=DIGEST_SECTION_RETENTION_DAYS), DigestSection.created_at
+    )
+    search_ttl = max(SEARCH_WEB_CACHE_TTL_MINUTES, SEARCH_NEWS_CACHE_TTL_MINUTES)
+    report['search_cache_deleted'] = await _delete_batches(
+        SearchCache, now - timedelta(minutes=search_ttl), SearchCache.created_at
+    )
+    report['page_cache_deleted'] = await _delete_batches(
+        PageCache, now - timedelta(days=PAGE_CACHE_RETENTION_DAYS), PageCache.checked_at
+    )
+    report['pending_actions_deleted'] = await _delete_batches(PendingAction, now, PendingAction.expires_at)
+    report['digests_compressed'] = await _compress_batches(
+        NewsDigest, NewsDigest.content, NewsDigest.content_compressed,
+        now - timedelta(days=DIGEST_COMPRESS_AFTER_DAYS), NewsDigest.created_at
+    )
+    report['posts_deleted'] = await _delete_batches(
+        ChannelPost, now - timedelta(hours=CHANNEL_POST_RETENTION_HOURS), ChannelPost.date
+    )
+    report['feed_entries_deleted'] = await _delete_batches(
+        FeedEntry, now - timedelta(hours=CHANNEL_POST_RETENTION_HOURS), FeedEntry.date
+    )
+    report['posts_compressed'] = await _compress_batches(
+        ChannelPost, ChannelPost.text, ChannelPost.text_compressed,
+        now - timedelta(hours=POST_COMPRESS_AFTER_HOURS), ChannelPost.date
+    )
+    
+    if any(report.values()):
+        report['pages_freed'] = await _incremental_vacuum()
+    return report
@@ -0,0 +1,97 @@
+"""Database engines and session helpers."""
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.config import DATABASE_URL, DB_POOL_SIZE, DB_MAX_OVERFLOW
+
+# Async drivers for the sync URLs used in DATABASE_URL
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgres": "postgresql+asyncpg",
+}
+
+# SQLite tuning: WAL lets readers work while a writer commits, NORMAL sync is
+# safe with WAL, busy_timeout makes writers wait for each other instead of failing
+SQLITE_PRAGMAS = {
+    # Before journal_mode: it only takes effect on a new file. Lets the
+    # retention job return freed pages to the OS without a full VACUUM
+    "auto_vacuum": "INCREMENTAL",
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": "5000",
+    "foreign_keys": "ON",
+    "temp_store": "MEMORY",
+    "cache_size": "-20000",  # ~20 MB
+}
+
+
+def async_url(url: str) -> str:
+    """Switch a database URL to its async driver (URLs with an explicit driver are kept)."""
+    scheme, sep, rest = url.partition("://")
+    if "+" in scheme:
+        return url
+    return ASYNC_DRIVERS.get(scheme, scheme) + sep + rest
+
+
+def _is_sqlite(url: str) -> bool:
+    return url.startswith("sqlite")
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+
+def _pool_options(url: str) -> dict:
+    if _is_sqlite(url) and ":memory:" in url:
+        return {}
+    options = {"pool_size": DB_POOL_SIZE, "max_overflow": DB_MAX_OVERFLOW}
+    if not _is_sqlite(url):
+        options["pool_pre_ping"] = True
+    return options
+
+
+# Sync engine: schema setup and code that cannot await
+engine = create_engine(DATABASE_URL, future=True, **_pool_options(DATABASE_URL))
+SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
+
+# Async engine: everything that runs on the event loop
+async_engine = create_async_engine(async_url(DATABASE_URL), **_pool_options(DATABASE_URL))
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+if _is_sqlite(DATABASE_URL):
+    event.listen(engine, "connect", _set_sqlite_pragmas)
+    event.listen(async_engine.sync_engine, "connect", _set_sqlite_pragmas)
+
+
+@asynccontextmanager
+async def get_session() -> AsyncIterator[AsyncSession]:
+    """
+    Async session from the pool; rolled back on error, always closed.
+    
+    Usage:
+        async with get_session() as db:
+            ...
+            await db.commit()
+    """
+    session = AsyncSessionLocal()
+    try:
+        yield session
+    except Exception:
+        await session.rollback()
+        raise
+    finally:
+        await session.close()
+
+
+async def dispose_engines():
+    """Close pooled connections (call on shutdown)."""
+    await async_engine.dispose()
+    engine.dispose()
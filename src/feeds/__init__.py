@@ -0,0 +1,20 @@
+"""RSS/Atom feeds as news sources."""
+from .poller import (
+    add_feeds,
+    remove_feed,
+    get_monitored_feeds,
+    get_feed_messages,
+    poll_due_feeds,
+    close_feed_client,
+    feed_title,
+)
+
+__all__ = [
+    "add_feeds",
+    "remove_feed",
+    "get_monitored_feeds",
+    "get_feed_messages",
+    "poll_due_feeds",
+    "close_feed_client",
+    "feed_title",
+]
@@ -0,0 +1,372 @@
+"""RSS/Atom feeds: management, conditional-GET polling and entry retrieval."""
+from typing import Dict, List, Optional, Tuple
+from datetime import datetime, timedelta, timezone
+from calendar import timegm
+from urllib.parse import urlparse
+import asyncio
+import hashlib
+import re
+
+import feedparser
+import httpx
+from bs4 import BeautifulSoup
+from sqlalchemy import select, update
+
+from src.config import (
+    FEED_POLL_MIN_MINUTES,
+    FEED_POLL_MAX_MINUTES,
+    FEED_FETCH_CONCURRENCY,
+    FEED_FETCH_TIMEOUT,
+    FEED_MAX_BYTES,
+    CHANNEL_POST_RETENTION_HOURS,
+)
+from src.database import get_session, MonitoredFeed, FeedEntry
+
+USER_AGENT = "Mozilla/5.0 (compatible; JarvisBot/1.0)"
+# Polling interval of a feed that was never polled
+INITIAL_INTERVAL_MINUTES = 30
+# Interval multiplier after a poll with new entries / without them
+SPEEDUP = 0.5
+SLOWDOWN = 1.5
+# Entry text kept for digests (title and summary)
+ENTRY_MAX_CHARS = 2000
+
+_client: Optional[httpx.AsyncClient] = None
+_slots: Optional[asyncio.Semaphore] = None
+
+
+def _get_client() -> httpx.AsyncClient:
+    """Shared HTTP client for feed polling (keep-alive connections, bounded pool)."""
+    global _client, _slots
+    if _client is None:
+        _client = httpx.AsyncClient(
+            timeout=httpx.Timeout(FEED_FETCH_TIMEOUT),
+            limits=httpx.Limits(max_connections=FEED_FETCH_CONCURRENCY),
+            headers={"User-Agent": USER_AGENT},
+            follow_redirects=True,
+        )
+        _slots = asyncio.Semaphore(FEED_FETCH_CONCURRENCY)
+    return _client
+
+
+async def close_feed_client():
+    """Close the feed HTTP client, if it was used."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def _utc(value: Optional[datetime]) -> Optional[datetime]:
+    """SQLite returns naive datetimes; stored values are UTC."""
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def _plain_text(html: str) -> str:
+    text = BeautifulSoup(html, "html.parser").get_text(" ", strip=True) if "<" in html else html
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def _entry(entry, now: datetime) -> Optional[dict]:
+    """Normalize a feedparser entry (None for entries without text)."""
+    title = _plain_text(entry.get("title", ""))
+    summary = entry.get("summary", "")
+    if entry.get("content"):
+        # Full content is often the same as the summary but longer
+        summary = max((c.get("value", "") for c in entry.content), key=len, default=summary) or summary
+    summary = _plain_text(summary)
+    if summary.startswith(title):
+        summary = summary[len(title):].strip()
+    text = f"{title}\n{summary}".strip() if summary else title
+    if not text:
+        return None
+    
+    published = entry.get("published_parsed") or entry.get("updated_parsed")
+    date = datetime.fromtimestamp(timegm(published), tz=timezone.utc) if published else now
+    link = entry.get("link", "")
+    guid = entry.get("id") or link or hashlib.sha1(text.encode("utf-8")).hexdigest()
+    return {
+        'guid': guid[:500],
+        'date': min(date, now),
+        'title': title,
+        'text': text[:ENTRY_MAX_CHARS],
+        'link': link,
+    }
+
+
+def parse_feed(data: bytes, now: datetime) -> dict:
+    """
+    Parse an RSS/Atom document (CPU-bound, run in a worker thread).
+    
+    Returns:
+        Dict with the feed title and normalized entries
+    """
+    parsed = feedparser.parse(data)
+    if parsed.bozo and not parsed.entries:
+        raise ValueError(f"not a feed: {parsed.get('bozo_exception')}")
+    entries = [e for e in (_entry(entry, now) for entry in parsed.entries) if e is not None]
+    return {'title': _plain_text(parsed.feed.get("title", "")), 'entries': entries}
+
+
+async def _download(url: str, etag: Optional[str], last_modified: Optional[str]) -> Tuple[int, Optional[bytes], httpx.Headers]:
+    """Conditional GET of a feed, reading at most FEED_MAX_BYTES."""
+    headers = {}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+    
+    client = _get_client()
+    async with _slots:
+        async with client.stream("GET", url, headers=headers) as response:
+            if response.status_code != 200:
+                return response.status_code, None, response.headers
+            chunks = []
+            size = 0
+            async for chunk in response.aiter_bytes():
+                chunks.append(chunk)
+                size += len(chunk)
+                if size > FEED_MAX_BYTES:
+                    raise ValueError(f"feed larger than {FEED_MAX_BYTES} bytes")
+            return 200, b"".join(chunks), response.headers
+
+
+async def _poll(feed: MonitoredFeed, now: datetime) -> dict:
+    """Fetch and parse one feed (no database access)."""
+    try:
+        status, data, headers = await asyncio.wait_for(
+            _download(feed.url, feed.etag, feed.last_modified), FEED_FETCH_TIMEOUT * 2
+        )
+        if status == 304:
+            return {'status': 304, 'headers': headers}
+        if status != 200:
+            return {'status': status, 'error': f"HTTP {status}"}
+        parsed = await asyncio.to_thread(parse_feed, data, now)
+        return {'status': 200, 'headers': headers, 'feed': parsed}
+    except Exception as e:
+        return {'status': None, 'error': str(e) or type(e).__name__}
+
+
+def _next_interval(feed: MonitoredFeed, new_entries: int) -> float:
+    """
+    Adapt a feed's polling interval after a successful poll.
+    
+    Polls that bring new entries halve the interval, empty ones (including
+    304 Not Modified) stretch it.
+    """
+    interval = feed.poll_interval_minutes or INITIAL_INTERVAL_MINUTES
+    interval *= SPEEDUP if new_entries else SLOWDOWN
+    return max(FEED_POLL_MIN_MINUTES, min(FEED_POLL_MAX_MINUTES, interval))
+
+
+def _backoff(error_count: int) -> float:
+    """
+    Delay before the next poll of a failing feed.
+    
+    Doubles from INITIAL_INTERVAL_MINUTES with every consecutive failure.
+    It does not touch the adaptive interval, so a recovered feed goes back
+    to the rate it had before the failures.
+    """
+    interval = INITIAL_INTERVAL_MINUTES * 2 ** min(max(error_count - 1, 0), 10)
+    return max(FEED_POLL_MIN_MINUTES, min(FEED_POLL_MAX_MINUTES, interval))
+
+
+async def poll_feeds(feeds: List[MonitoredFeed]) -> int:
+    """
+    Poll feeds concurrently and store new entries.
+    
+    Every feed is fetched with a conditional GET (ETag / Last-Modified), so
+    unchanged feeds cost one 304 response. Entries and feed state of the
+    whole run are written in one transaction. Entries older than the
+    retention window are skipped: the retention job would delete them
+    again, and feeds that ignore conditional GET keep listing them.
+    
+    Args:
+        feeds: Feeds to poll (detached rows are fine)
+    
+    Returns:
+        Number of new entries stored
+    """
+    if not feeds:
+        return 0
+    
+    now = datetime.now(timezone.utc)
+    results = await asyncio.gather(*(_poll(feed, now) for feed in feeds))
+    cutoff = now - timedelta(hours=CHANNEL_POST_RETENTION_HOURS)
+    for result in results:
+        if 'feed' in result:
+            result['feed']['entries'] = [e for e in result['feed']['entries'] if e['date'] >= cutoff]
+    
+    feed_ids = [feed.id for feed in feeds]
+    guids = {e['guid'] for r in results if 'feed' in r for e in r['feed']['entries']}
+    new_total = 0
+    async with get_session() as db:
+        existing = {}
+        if guids:
+            rows = await db.scalars(
+                select(FeedEntry).where(FeedEntry.feed_id.in_(feed_ids), FeedEntry.guid.in_(guids))
+            )
+            existing = {(row.feed_id, row.guid): row for row in rows}
+        rows = await db.scalars(select(MonitoredFeed).where(MonitoredFeed.id.in_(feed_ids)))
+        stored = {row.id: row for row in rows}
+        
+        for feed, result in zip(feeds, results):
+            row = stored.get(feed.id)
+            if row is None:
+                continue
+            new_entries = 0
+            for entry in result.get('feed', {}).get('entries', []):
+                key = (feed.id, entry['guid'])
+                if key not in existing:
+                    existing[key] = FeedEntry(feed_id=feed.id, guid=entry['guid'], date=entry['date'], fetched_at=now)
+                    db.add(existing[key])
+                    new_entries += 1
+                # Publishers edit entries, keep the latest text
+                existing[key].title = entry['title']
+                existing[key].text = entry['text']
+                existing[key].link = entry['link']
+            
+            if 'error' in result:
+                row.error_count = (row.error_count or 0) + 1
+                delay = _backoff(row.error_count)
+                print(f"⚠️ Feed {feed.url}: {result['error']}")
+            else:
+                row.error_count = 0
+                headers = result['headers']
+                row.etag = headers.get("etag") or row.etag
+                row.last_modified = headers.get("last-modified") or row.last_modified
+                if result.get('feed', {}).get('title') and not row.title:
+                    row.title = result['feed']['title']
+                row.poll_interval_minutes = _next_interval(row, new_entries)
+                delay = row.poll_interval_minutes
+            row.last_polled_at = now
+            row.next_poll_at = now + timedelta(minutes=delay)
+            new_total += new_entries
+        
+        await db.commit()
+    return new_total
+
+
+async def poll_due_feeds() -> int:
+    """
+    Poll the feeds whose next poll time has come.
+    
+    Returns:
+        Number of new entries stored
+    """
+    now = datetime.now(timezone.utc)
+    async with get_session() as db:
+        feeds = list(await db.scalars(
+            select(MonitoredFeed).where(
+                MonitoredFeed.is_active == True,
+                (MonitoredFeed.next_poll_at == None) | (MonitoredFeed.next_poll_at <= now)
+            )
+        ))
+    return await poll_feeds(feeds)
+
+
+async def get_monitored_feeds() -> List[MonitoredFeed]:
+    """Get list of active monitored feeds."""
+    async with get_session() as db:
+        result = await db.scalars(
+            select(MonitoredFeed).where(MonitoredFeed.is_active == True).order_by(MonitoredFeed.added_at)
+        )
+        return list(result)
+
+
+async def add_feeds(urls: List[str]) -> List[MonitoredFeed]:
+    """
+    Add feeds to monitoring and poll the new ones right away.
+    
+    Returns:
+        Monitored feeds in the order given
+    """
+    urls = list(dict.fromkeys(urls))
+    if not urls:
+        return []
+    
+    # Feeds polled here are kept out of the feed_poll job until this poll is
+    # done, otherwise both store the same entries at once; the time is only
+    # a fallback in case this poll never finishes
+    deferred = datetime.now(timezone.utc) + timedelta(minutes=INITIAL_INTERVAL_MINUTES)
+    async with get_session() as db:
+        rows = await db.scalars(select(MonitoredFeed).where(MonitoredFeed.url.in_(urls)))
+        feeds = {feed.url: feed for feed in rows}
+        for feed in feeds.values():
+            feed.is_active = True
+        for url in urls:
+            if url not in feeds:
+                feeds[url] = MonitoredFeed(url=url, is_active=True)
+                db.add(feeds[url])
+        for feed in feeds.values():
+            if feed.last_polled_at is None:
+                feed.next_poll_at = deferred
+        await db.commit()
+    
+    # First poll fills in the title and the recent entries
+    await poll_feeds([feed for feed in feeds.values() if feed.last_polled_at is None])
+    async with get_session() as db:
+        rows = await db.scalars(select(MonitoredFeed).where(MonitoredFeed.url.in_(urls)))
+        feeds = {feed.url: feed for feed in rows}
+    return [feeds[url] for url in urls]
+
+
+async def remove_feed(url: str) -> bool:
+    """Remove a feed from monitoring (soft delete)."""
+    async with get_session() as db:
+        result = await db.execute(
+            update(MonitoredFeed).where(MonitoredFeed.url == url).values(is_active=False)
+        )
+        await db.commit()
+        return result.rowcount > 0
+
+
+def feed_title(feed: MonitoredFeed) -> str:
+    """Feed title, or its host when the feed has none."""
+    return feed.title or urlparse(feed.url).netloc or feed.url
+
+
+async def get_feed_messages(hours_back: int = 24, sources: Optional[List[str]] = None) -> Dict[str, dict]:
+    """
+    Get recent entries of monitored feeds from the local store.
+    
+    Entries come in the structure of get_all_monitored_messages(), keyed
+    by feed URL, so digests treat feeds like channels.
+    
+    Args:
+        hours_back: How many hours back to read entries
+        sources: Only feeds with these URLs (default: all monitored)
+    """
+    feeds = await get_monitored_feeds()
+    if sources:
+        wanted = {s.lower() for s in sources}
+        feeds = [feed for feed in feeds if feed.url.lower() in wanted]
+    if not feeds:
+        return {}
+    
+    since = datetime.now(timezone.utc) - timedelta(hours=hours_back)
+    async with get_session() as db:
+        rows = list(await db.scalars(
+            select(FeedEntry).where(
+                FeedEntry.feed_id.in_([feed.id for feed in feeds]),
+                FeedEntry.date >= since
+            ).order_by(FeedEntry.date.desc())
+        ))
+    
+    messages: Dict[int, List[dict]] = {feed.id: [] for feed in feeds}
+    titles = {feed.id: feed_title(feed) for feed in feeds}
+    for row in rows:
+        messages[row.feed_id].append({
+            'id': row.id,
+            'date': _utc(row.date),
+            'text': row.text,
+            'sender': titles[row.feed_id],
+            'link': row.link,
+            # Feeds carry no engagement, ranking falls back to recency
+            'views': 0,
+            'forwards': 0,
+            'reactions': 0,
+        })
+    return {feed.url: {'title': titles[feed.id], 'messages': messages[feed.id]} for feed in feeds}
@@ -1,9 +1,11 @@
 """LM Studio client."""
+import asyncio
 import requests
 from collections import defaultdict, deque
 from typing import Dict, List
 
 from src.config import LM_BASE, LM_MODEL
+from .tokens import calibrate
 
 
 class LLMClient:
@@ -16,6 +18,14 @@ class LLMClient:
         # Per-user chat memory (last 20 turns per user)
         self.history: Dict[int, deque] = defaultdict(lambda: deque(maxlen=20))
     
+    @staticmethod
+    def _calibrate(messages: List[dict], response: dict):
+        """Feed the real prompt size reported by LM Studio into the token estimator."""
+        prompt_tokens = (response.get("usage") or {}).get("prompt_tokens")
+        if prompt_tokens:
+            text = "".join(m["content"] for m in messages)
+            calibrate(text, prompt_tokens, message_count=len(messages))
+    
     def call(self, user_id: int, user_text: str, temperature: float = 0.4) -> str:
         """
         Call LM Studio with user text and conversation history.
@@ -37,7 +47,9 @@ class LLMClient:
         payload = {"model": self.model, "messages": messages, "temperature": temperature}
         r = requests.post(url, json=payload, timeout=120)
         r.raise_for_status()
-        content = r.json()["choices"][0]["message"]["content"]
+        data = r.json()
+        content = data["choices"][0]["message"]["content"]
+        self._calibrate(messages, data)
         
         # Update history
         self.history[user_id].append({"role": "user", "content": user_text})
@@ -68,7 +80,9 @@ class LLMClient:
         try:
             r = requests.post(url, json=payload, timeout=120)
             r.raise_for_status()
-            content = r.json()["choices"][0]["message"]["content"]
+            data = r.json()
+            content = data["choices"][0]["message"]["content"]
+            self._calibrate(messages, data)
             return content
         except requests.exceptions.HTTPError as e:
             # Log the error with more details
@@ -80,3 +94,30 @@ class LLMClient:
         except Exception as e:
             print(f"Unexpected error calling LLM: {e}")
             raise
+    
+    async def acall(self, user_id: int, user_text: str, temperature: float = 0.4) -> str:
+        """
+        Async variant of call (runs the HTTP call in a worker thread).
+        
+        Args:
+            user_id: Telegram user ID for conversation context
+            user_text: User's message
+            temperature: LLM temperature (default 0.4)
+            
+        Returns:
+            LLM response text
+        """
+        return await asyncio.to_thread(self.call, user_id, user_text, temperature)
+    
+    async def acall_without_history(self, prompt: str, temperature: float = 0.4) -> str:
+        """
+        Async variant of call_without_history (runs the HTTP call in a worker thread).
+        
+        Args:
+            prompt: Complete prompt to send
+            temperature: LLM temperature (default 0.4)
+            
+        Returns:
+            LLM response text
+        """
+        return await asyncio.to_thread(self.call_without_history, prompt, temperature)
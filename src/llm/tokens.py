@@ -0,0 +1,141 @@
+"""Token counting for prompt budgeting."""
+import re
+from typing import Callable, Optional
+
+from src.config import LLM_CONTEXT_TOKENS, LLM_TOKENIZER, DIGEST_OUTPUT_TOKENS
+
+# Characters per token of the calibrated estimator, per character class
+# (measured on Llama 3 / Qwen 2.5 tokenizers; the calibration factor corrects the rest)
+CYRILLIC_CHARS_PER_TOKEN = 3.0
+LATIN_CHARS_PER_TOKEN = 4.0
+DIGITS_PER_TOKEN = 2.5
+# Chat template overhead per message (role markers, separators)
+TOKENS_PER_CHAT_MESSAGE = 8
+
+_CYRILLIC_RE = re.compile(r"[Ѐ-ӿ]")
+_LATIN_RE = re.compile(r"[A-Za-z]")
+_DIGIT_RE = re.compile(r"[0-9]")
+_SPACE_RE = re.compile(r"\s")
+
+_tokenizer: Optional[Callable[[str], int]] = None
+_calibration = 1.0
+_CALIBRATION_SMOOTHING = 0.2
+_MIN_CALIBRATION_CHARS = 200
+
+
+def set_tokenizer(count_tokens: Optional[Callable[[str], int]]):
+    """
+    Plug in an exact token counter (None goes back to the estimator).
+    
+    Args:
+        count_tokens: Function that returns the number of tokens in a text
+    """
+    global _tokenizer
+    _tokenizer = count_tokens
+
+
+def _load_configured_tokenizer():
+    """Load the tokenizer named by LLM_TOKENIZER ('tiktoken:<encoding>' or 'hf:<model>')."""
+    if not LLM_TOKENIZER:
+        return
+    
+    kind, _, name = LLM_TOKENIZER.partition(":")
+    try:
+        if kind == "tiktoken":
+            import tiktoken
+            encoding = tiktoken.get_encoding(name or "cl100k_base")
+            set_tokenizer(lambda text: len(encoding.encode(text)))
+        elif kind == "hf":
+            from transformers import AutoTokenizer
+            hf_tokenizer = AutoTokenizer.from_pretrained(name)
+            set_tokenizer(lambda text: len(hf_tokenizer.encode(text, add_special_tokens=False)))
+        else:
+            print(f"⚠️ Unknown LLM_TOKENIZER '{LLM_TOKENIZER}', using estimator")
+    except Exception as e:
+        print(f"⚠️ Could not load tokenizer '{LLM_TOKENIZER}' ({e}), using estimator")
+
+
+def _raw_estimate(text: str) -> float:
+    cyrillic = len(_CYRILLIC_RE.findall(text))
+    latin = len(_LATIN_RE.findall(text))
+    digits = len(_DIGIT_RE.findall(text))
+    spaces = len(_SPACE_RE.findall(text))
+    other = len(text) - cyrillic - latin - digits - spaces
+    return (
+        cyrillic / CYRILLIC_CHARS_PER_TOKEN
+        + latin / LATIN_CHARS_PER_TOKEN
+        + digits / DIGITS_PER_TOKEN
+        + other  # punctuation, emoji and symbols are mostly one token or more each
+    )
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Number of tokens in a text.
+    
+    Uses the plugged-in tokenizer if there is one, otherwise the
+    character-class estimator scaled by the calibration factor.
+    """
+    if not text:
+        return 0
+    if _tokenizer is not None:
+        return _tokenizer(text)
+    return int(_raw_estimate(text) * _calibration) + 1
+
+
+def calibrate(prompt_text: str, prompt_tokens: int, message_count: int = 1):
+    """
+    Adjust the estimator with the real prompt size reported by the LLM server.
+    
+    Args:
+        prompt_text: All message contents sent in the request, concatenated
+        prompt_tokens: ``usage.prompt_tokens`` from the response
+        message_count: Number of chat messages in the request
+    """
+    global _calibration
+    if _tokenizer is not None or len(prompt_text) < _MIN_CALIBRATION_CHARS:
+        return
+    
+    estimated = _raw_estimate(prompt_text)
+    actual = prompt_tokens - TOKENS_PER_CHAT_MESSAGE * message_count
+    if estimated <= 0 or actual <= 0:
+        return
+    
+    ratio = max(0.5, min(2.5, actual / estimated))
+    _calibration = (1 - _CALIBRATION_SMOOTHING) * _calibration + _CALIBRATION_SMOOTHING * ratio
+
+
+def get_calibration() -> float:
+    """Current estimator calibration factor (1.0 = uncalibrated)."""
+    return _calibration
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut a text so that it takes at most ``max_tokens`` tokens."""
+    tokens = estimate_tokens(text)
+    if tokens <= max_tokens:
+        return text
+    
+    cut = int(len(text) * max_tokens / tokens)
+    while cut > 0 and estimate_tokens(text[:cut]) > max_tokens:
+        cut = int(cut * 0.9)
+    return text[:cut]
+
+
+def prompt_budget(template: str = "", reserved_tokens: int = 0, context_tokens: int = LLM_CONTEXT_TOKENS) -> int:
+    """
+    Tokens left for content in a prompt.
+    
+    Args:
+        template: Prompt template the content is embedded into
+        reserved_tokens: Extra tokens to keep free (e.g. when the template is not known here)
+        context_tokens: Model context size
+        
+    Returns:
+        Token budget for the content
+    """
+    overhead = estimate_tokens(template) + reserved_tokens + 2 * TOKENS_PER_CHAT_MESSAGE
+    return context_tokens - DIGEST_OUTPUT_TOKENS - overhead
+
+
+_load_configured_tokenizer()
@@ -1,14 +1,21 @@
 """Main entry point for Jarvis Telegram bot."""
+import asyncio
+
 from telegram.ext import Application
 from telegram import BotCommand
 
-from src.config import BOT_TOKEN
-from src.database import init_db
+from src.config import BOT_TOKEN, BOT_MAX_CONCURRENT_HANDLERS, BOT_MAX_PENDING_UPDATES, BOT_MODE
+from src.database import init_db, dispose_engines
+from src.tools import close_page_fetcher
+from src.feeds import close_feed_client
 from src.llm import LLMClient
 from src.bot import register_handlers
+from src.bot.concurrency import ChatOrderedUpdateProcessor
+from src.bot.delivery import init_delivery
 from src.bot.prompts import SYSTEM_PROMPT
 from src.scheduler import start_scheduler, stop_scheduler
 from src.agent.builtin_tools import init_builtin_tools
+from src.telegram_client.channels import import_default_channels
 
 
 async def setup_commands(app: Application):
@@ -20,13 +27,41 @@ async def setup_commands(app: Application):
         BotCommand("unread_all", "Показать все непрочитанные письма"),
         BotCommand("spam_sweep", "Сканировать inbox на спам"),
         BotCommand("news", "Получить дайджест новостей"),
+        BotCommand("digest", "Настройки сводок по расписанию"),
         BotCommand("channels", "Управление отслеживаемыми каналами"),
+        BotCommand("feeds", "Управление RSS-лентами"),
         BotCommand("search", "Поиск в интернете с AI обобщением"),
         BotCommand("news_search", "Поиск новостей по теме"),
+        BotCommand("stats", "Статистика работы бота"),
     ]
     await app.bot.set_my_commands(commands)
 
 
+async def post_init(app: Application):
+    """Runs inside the bot's event loop once it is up."""
+    await setup_commands(app)
+    print("✅ Bot commands menu configured")
+    
+    # Start scheduler for automated news digests
+    try:
+        imported = await import_default_channels()
+        if imported:
+            print(f"✅ Imported {imported} default news channels")
+        await start_scheduler(app, app.bot_data["llm_client"])
+        print("✅ News scheduler started")
+    except Exception as e:
+        print(f"⚠️ Warning: Could not start scheduler: {e}")
+        print("   (This is normal if Telegram client is not configured yet)")
+
+
+async def post_shutdown(app: Application):
+    """Stop background jobs and close HTTP and database connections."""
+    stop_scheduler()
+    await close_page_fetcher()
+    await close_feed_client()
+    await dispose_engines()
+
+
 def main():
     """Run the bot."""
     # Initialize database
@@ -41,33 +76,34 @@ def main():
     llm_client = LLMClient(system_prompt=SYSTEM_PROMPT)
     print("✅ LLM client initialized")
     
-    # Create Telegram application
-    app = Application.builder().token(BOT_TOKEN).build()
+    # Create Telegram application (chats are served concurrently, each in order)
+    app = (
+        Application.builder()
+        .token(BOT_TOKEN)
+        .concurrent_updates(ChatOrderedUpdateProcessor(BOT_MAX_CONCURRENT_HANDLERS, BOT_MAX_PENDING_UPDATES))
+        .build()
+    )
+    init_delivery(app.bot)
     
     # Register handlers
     register_handlers(app, llm_client)
     print("✅ Bot handlers registered")
     
-    # Setup commands menu
-    app.post_init = setup_commands
-    print("✅ Bot commands menu configured")
-    
-    # Start scheduler for automated news digests
-    try:
-        start_scheduler(app, llm_client)
-        print("✅ News scheduler started")
-    except Exception as e:
-        print(f"⚠️ Warning: Could not start scheduler: {e}")
-        print("   (This is normal if Telegram client is not configured yet)")
+    # Setup commands menu and scheduler (they need the running event loop)
+    app.post_init = post_init
+    app.post_shutdown = post_shutdown
     
-    # Start polling
-    print("\n🤖 Jarvis bot is online!")
+    # Receive updates (long polling, or Telegram posts them to our webhook server)
+    print(f"\n🤖 Jarvis bot is online ({BOT_MODE})!")
     print("=" * 50)
     try:
-        app.run_polling()
+        if BOT_MODE == "webhook":
+            from src.bot.webhook import run_webhook
+            asyncio.run(run_webhook(app))
+        else:
+            app.run_polling()
     except KeyboardInterrupt:
         print("\n\n🛑 Shutting down...")
-        stop_scheduler()
         print("👋 Goodbye!")
 
 
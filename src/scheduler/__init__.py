@@ -1,4 +1,4 @@
 """Scheduler for automated tasks."""
-from .jobs import start_scheduler, stop_scheduler
+from .jobs import start_scheduler, stop_scheduler, sync_schedule
 
-__all__ = ["start_scheduler", "stop_scheduler"]
+__all__ = ["start_scheduler", "stop_scheduler", "sync_schedule"]
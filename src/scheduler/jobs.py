@@ -1,18 +1,28 @@
 """APScheduler jobs for automated news digests."""
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
 import asyncio
-from datetime import datetime
+import math
+import time
+from collections import deque, defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
 import pytz
 
 from src.config import (
-    NEWS_SCHEDULE_MORNING,
-    NEWS_SCHEDULE_EVENING,
     NEWS_TIMEZONE,
-    ALLOWED_USER_IDS
+    CHANNEL_INGEST_INTERVAL_MINUTES,
+    RETENTION_INTERVAL_HOURS,
+    DIGEST_WARMUP_MIN_MINUTES,
+    DIGEST_WARMUP_MAX_MINUTES
 )
-from src.tools import aggregate_news, create_digest
-from src.tools.news_aggregator import format_messages_for_llm
+from src.database import get_session, NewsDigest
+from src.database.retention import run_retention
+from src.tools import aggregate_news, generate_digest
+from src.telegram_client.channels import ingest_due_channels
+from src.feeds import poll_due_feeds
+from .subscriptions import ensure_default_subscriptions, group_subscribers, schedule_times
 
 
 # Global scheduler instance
@@ -20,65 +30,355 @@ _scheduler = None
 _bot_application = None
 _llm_client = None
 
+# Warm-up lead = slowest recent generation * WARMUP_SAFETY_FACTOR, clamped to the config limits
+WARMUP_SAFETY_FACTOR = 2.0
+# Seconds kept free between the end of the top-up and the delivery minute
+TOPUP_MARGIN_SECONDS = 30
+# A prepared digest older than this at delivery time is regenerated
+PREPARED_MAX_AGE = timedelta(minutes=DIGEST_WARMUP_MAX_MINUTES * 2)
 
-async def send_scheduled_digest(digest_type: str = 'full'):
+# Digest settings shared by a group of subscribers: (digest_type, channels, hours_back)
+DigestKey = Tuple[str, Tuple[str, ...], int]
+
+# Delivery time -> durations (seconds) of recent warm-ups (all digests of the time)
+_generation_seconds: Dict[str, deque] = defaultdict(lambda: deque(maxlen=10))
+# (delivery time, delivery slot, digest key) -> prepared digest: digest_id, post_keys, total_messages, prepared_at
+_prepared: Dict[Tuple[str, datetime, DigestKey], dict] = {}
+# Delivery time -> running warm-up: task, slot, topping_up
+_warmups: Dict[str, dict] = {}
+
+
+def _warmup_lead_minutes(at: str) -> int:
+    """Minutes before the delivery time to start preparing its digests."""
+    durations = _generation_seconds.get(at)
+    if not durations:
+        return DIGEST_WARMUP_MIN_MINUTES * 3
+    lead = math.ceil(max(durations) * WARMUP_SAFETY_FACTOR / 60)
+    return max(DIGEST_WARMUP_MIN_MINUTES, min(DIGEST_WARMUP_MAX_MINUTES, lead))
+
+
+def _parse_time(value: str):
+    hour, minute = map(int, value.split(':'))
+    return hour, minute
+
+
+def _minus_minutes(hour: int, minute: int, minutes: int):
+    """Time of day ``minutes`` before hour:minute (wraps around midnight)."""
+    total = (hour * 60 + minute - minutes) % (24 * 60)
+    return total // 60, total % 60
+
+
+def _next_run(hour: int, minute: int) -> datetime:
+    """Next occurrence of hour:minute in NEWS_TIMEZONE."""
+    tz = pytz.timezone(NEWS_TIMEZONE)
+    now = datetime.now(tz)
+    run = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if run <= now:
+        run += timedelta(days=1)
+    return run
+
+
+def _last_run(hour: int, minute: int) -> datetime:
+    """Latest occurrence of hour:minute in NEWS_TIMEZONE that is not in the future."""
+    tz = pytz.timezone(NEWS_TIMEZONE)
+    now = datetime.now(tz)
+    run = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if run > now:
+        run -= timedelta(days=1)
+    return run
+
+
+def _drop_prepared(at: str, before: datetime):
+    """Forget digests of a delivery time prepared for slots up to ``before``."""
+    for entry in [entry for entry in _prepared if entry[0] == at and entry[1] <= before]:
+        del _prepared[entry]
+
+
+def _post_keys(news_data: Dict) -> set:
+    return {
+        (channel_username, msg['id'])
+        for channel_username, data in news_data['channels'].items()
+        for msg in data['messages']
+    }
+
+
+async def _store_prepared(digest: str, digest_type: str, message_count: int, digest_id: Optional[int] = None) -> int:
+    """Insert a scheduled digest, or replace the content of a prepared one."""
+    async with get_session() as db:
+        news_digest = await db.get(NewsDigest, digest_id) if digest_id else None
+        if news_digest is None:
+            news_digest = NewsDigest(digest_type=digest_type, is_scheduled=True)
+            db.add(news_digest)
+        news_digest.content = digest
+        news_digest.message_count = message_count
+        await db.commit()
+        return news_digest.id
+
+
+async def _load_digest(digest_id: int) -> Optional[str]:
+    async with get_session() as db:
+        news_digest = await db.get(NewsDigest, digest_id)
+        return news_digest.body if news_digest else None
+
+
+async def _prepare(key: DigestKey, digest_id: Optional[int] = None, news_data: Optional[Dict] = None) -> Optional[dict]:
     """
-    Generate and send scheduled news digest to all allowed users.
+    Collect news and generate one digest.
     
     Args:
-        digest_type: 'brief' or 'full'
+        key: Digest settings (digest_type, channels, hours_back)
+        digest_id: Stored digest to overwrite (default: insert a new one)
+        news_data: Already collected news (default: collect now)
+    
+    Returns:
+        Prepared digest info, or None when there is no news
+    """
+    digest_type, channels, hours_back = key
+    if news_data is None:
+        news_data = await aggregate_news(hours_back=hours_back, channels=list(channels) or None)
+    if news_data['total_messages'] == 0:
+        return None
+    
+    digest = await generate_digest(
+        news_data=news_data,
+        digest_type=digest_type,
+        llm_client=_llm_client,
+        is_scheduled=True,
+        save=False
+    )
+    digest_id = await _store_prepared(digest, digest_type, news_data['total_messages'], digest_id)
+    
+    return {
+        'digest_id': digest_id,
+        'post_keys': _post_keys(news_data),
+        'total_messages': news_data['total_messages'],
+        'prepared_at': datetime.now(pytz.timezone(NEWS_TIMEZONE)),
+    }
+
+
+async def prepare_scheduled_digests(at: str):
+    """
+    Warm-up job: prepare the digests of a delivery time ahead of it.
+    
+    Subscribers with identical settings share one digest, so each distinct
+    digest is generated once. Shortly before the deadline (leaving the time
+    the warm-up took) the news is collected again and digests that got new
+    posts are regenerated; partial summaries are cached, so the top-up only
+    pays for the new posts. Digests are kept per delivery slot; the send
+    job cancels a top-up that is still running when the slot comes.
+    
+    Args:
+        at: Delivery time "HH:MM"
     """
     if not _bot_application or not _llm_client:
         print("Bot or LLM client not initialized")
         return
     
+    deadline = _next_run(*_parse_time(at))
+    warmup = {'task': asyncio.current_task(), 'slot': deadline, 'topping_up': False}
+    _warmups[at] = warmup
+    # Leftovers of slots that were never sent (e.g. send job missed)
+    _drop_prepared(at, deadline)
+    keys = list(await group_subscribers(at))
+    
     try:
-        # Calculate time range (12 hours for morning/evening digests)
-        hours_back = 12
-        
-        # Aggregate news from channels
-        news_data = await aggregate_news(hours_back=hours_back)
+        started = time.monotonic()
+        for key in keys:
+            prepared = await _prepare(key)
+            if prepared is not None:
+                _prepared[(at, deadline, key)] = prepared
+        took = time.monotonic() - started
+        _generation_seconds[at].append(took)
+        print(f"🔥 {len(keys)} digest(s) for {at} prepared in {took:.0f}s")
         
-        if news_data['total_messages'] == 0:
-            print(f"No news to digest at {datetime.now()}")
+        topup_at = deadline - timedelta(seconds=took * WARMUP_SAFETY_FACTOR + TOPUP_MARGIN_SECONDS)
+        delay = (topup_at - datetime.now(deadline.tzinfo)).total_seconds()
+        if delay <= 0:
             return
         
-        # Format for LLM
-        news_content = format_messages_for_llm(news_data)
+        warmup['topping_up'] = True
+        await asyncio.sleep(delay)
+        for key in keys:
+            digest_type, channels, hours_back = key
+            news_data = await aggregate_news(hours_back=hours_back, channels=list(channels) or None)
+            prepared = _prepared.get((at, deadline, key))
+            if prepared and not _post_keys(news_data) - prepared['post_keys']:
+                continue
+            
+            topped_up = await _prepare(key, prepared['digest_id'] if prepared else None, news_data)
+            if topped_up is not None:
+                _prepared[(at, deadline, key)] = topped_up
+                print(f"🔥 {digest_type} digest for {at} topped up ({topped_up['total_messages']} messages)")
+    
+    except asyncio.CancelledError:
+        print(f"Top-up of digests for {at} cancelled, sending the prepared ones")
+    
+    except Exception as e:
+        print(f"Error preparing digests for {at}: {e}")
+    
+    finally:
+        if _warmups.get(at) is warmup:
+            del _warmups[at]
+        _reschedule_warmup(at)
+
+
+def _reschedule_warmup(at: str):
+    """Move the warm-up job of a delivery time to match the current lead estimate."""
+    if _scheduler is None or _scheduler.get_job(f'digest_{at}_warmup') is None:
+        return
+    hour, minute = _minus_minutes(*_parse_time(at), _warmup_lead_minutes(at))
+    _scheduler.reschedule_job(
+        f'digest_{at}_warmup',
+        trigger=CronTrigger(hour=hour, minute=minute, timezone=NEWS_TIMEZONE)
+    )
+
+
+async def send_scheduled_digests(at: str):
+    """
+    Send the digests of a delivery time to their subscribers.
+    
+    Each group of subscribers with identical settings gets the digest
+    prepared by the warm-up job; if there is none (e.g. the bot was
+    restarted or the settings changed in between), it is generated on the
+    spot. A warm-up still running for this slot is waited for while it
+    prepares the first digests, and cancelled if it is only topping up.
+    
+    Args:
+        at: Delivery time "HH:MM"
+    """
+    from src.bot.delivery import get_delivery
+    
+    if not _bot_application or not _llm_client:
+        print("Bot or LLM client not initialized")
+        return
+    
+    slot = _last_run(*_parse_time(at))
+    warmup = _warmups.get(at)
+    if warmup is not None and warmup['slot'] == slot and not warmup['task'].done():
+        if warmup['topping_up']:
+            warmup['task'].cancel()
+        await asyncio.wait([warmup['task']])
+    
+    for key, user_ids in (await group_subscribers(at)).items():
+        digest_type, channels, hours_back = key
+        try:
+            prepared = _prepared.pop((at, slot, key), None)
+            now = datetime.now(pytz.timezone(NEWS_TIMEZONE))
+            digest = None
+            if prepared and now - prepared['prepared_at'] <= PREPARED_MAX_AGE:
+                digest = await _load_digest(prepared['digest_id'])
+            
+            if digest is None:
+                print(f"No prepared {digest_type} digest for {at}, generating now")
+                prepared = await _prepare(key)
+                if prepared is None:
+                    print(f"No news to digest at {datetime.now()}")
+                    continue
+                digest = await _load_digest(prepared['digest_id'])
+            
+            # Get current time for header
+            time_emoji = "🌅" if now.hour < 12 else "🌆"
+            header = f"{time_emoji} Новостная сводка за последние {hours_back} часов\n"
+            header += f"📊 Обработано сообщений: {prepared['total_messages']}\n\n"
+            
+            full_message = header + digest
+            
+            # Send to every subscriber of this digest (chunked, rate-limited, retried)
+            sent = await get_delivery().deliver(user_ids, full_message)
+            print(f"Sent scheduled digest to {len(user_ids)} user(s), {sent} message(s)")
         
-        # Create digest
-        digest = create_digest(
-            news_content=news_content,
-            digest_type='full',  # Always full for scheduled
-            llm_client=_llm_client,
-            is_scheduled=True
-        )
+        except Exception as e:
+            print(f"Error in scheduled digest: {e}")
+    
+    _drop_prepared(at, slot)
+
+
+async def ingest_channels():
+    """Sweep the next part of the channel list into the local post store."""
+    try:
+        await ingest_due_channels()
+    except Exception as e:
+        print(f"Error ingesting channels: {e}")
+
+
+async def poll_feeds():
+    """Poll the RSS/Atom feeds that are due (each feed has its own interval)."""
+    try:
+        new_entries = await poll_due_feeds()
+        if new_entries:
+            print(f"📡 Feeds: {new_entries} new entries")
+    except Exception as e:
+        print(f"Error polling feeds: {e}")
+
+
+async def apply_retention():
+    """Compress old history and delete expired digests and posts."""
+    try:
+        report = await run_retention()
+        if any(report.values()):
+            print(f"🗜️ Retention: {report}")
+    except Exception as e:
+        print(f"Error applying retention: {e}")
+
+
+async def flush_outbox():
+    """Retry messages left in the delivery outbox (failed sends, restarts)."""
+    from src.bot.delivery import get_delivery
+    
+    try:
+        sent = await get_delivery().flush()
+        if sent:
+            print(f"📤 Delivered {sent} queued message(s)")
+    except Exception as e:
+        print(f"Error flushing outbox: {e}")
+
+
+async def sync_schedule():
+    """Add and remove digest jobs so they match the active subscriptions."""
+    if _scheduler is None:
+        return
+    
+    times = set(await schedule_times())
+    for job in _scheduler.get_jobs():
+        if job.id.startswith('digest_') and job.kwargs.get('at') not in times:
+            job.remove()
+    
+    for at in sorted(times):
+        if _scheduler.get_job(f'digest_{at}') is not None:
+            continue
         
-        # Get current time for header
-        now = datetime.now()
-        time_emoji = "🌅" if now.hour < 12 else "🌆"
-        header = f"{time_emoji} Новостная сводка за последние {hours_back} часов\n"
-        header += f"📊 Обработано сообщений: {news_data['total_messages']}\n\n"
+        # Parse time strings (format: "HH:MM")
+        hour, minute = _parse_time(at)
+        warmup_hour, warmup_minute = _minus_minutes(hour, minute, _warmup_lead_minutes(at))
         
-        full_message = header + digest
+        _scheduler.add_job(
+            prepare_scheduled_digests,
+            trigger=CronTrigger(
+                hour=warmup_hour,
+                minute=warmup_minute,
+                timezone=NEWS_TIMEZONE
+            ),
+            id=f'digest_{at}_warmup',
+            name=f'News Digest {at} (warm-up)',
+            replace_existing=True,
+            kwargs={'at': at}
+        )
         
-        # Send to all allowed users
-        for user_id in ALLOWED_USER_IDS:
-            try:
-                await _bot_application.bot.send_message(
-                    chat_id=user_id,
-                    text=full_message,
-                    parse_mode=None  # Plain text for better compatibility
-                )
-                print(f"Sent scheduled digest to user {user_id}")
-            except Exception as e:
-                print(f"Failed to send digest to user {user_id}: {e}")
-    
-    except Exception as e:
-        print(f"Error in scheduled digest: {e}")
+        _scheduler.add_job(
+            send_scheduled_digests,
+            trigger=CronTrigger(
+                hour=hour,
+                minute=minute,
+                timezone=NEWS_TIMEZONE
+            ),
+            id=f'digest_{at}',
+            name=f'News Digest {at}',
+            replace_existing=True,
+            kwargs={'at': at}
+        )
 
 
-def start_scheduler(bot_application, llm_client):
+async def start_scheduler(bot_application, llm_client):
     """
     Start the scheduler for automated news digests.
     
@@ -95,44 +395,54 @@ def start_scheduler(bot_application, llm_client):
         print("Scheduler already running")
         return
     
+    await ensure_default_subscriptions()
+    
     _scheduler = AsyncIOScheduler(timezone=NEWS_TIMEZONE)
+    await sync_schedule()
     
-    # Parse time strings (format: "HH:MM")
-    morning_hour, morning_minute = map(int, NEWS_SCHEDULE_MORNING.split(':'))
-    evening_hour, evening_minute = map(int, NEWS_SCHEDULE_EVENING.split(':'))
+    # Rolling channel ingestion (digests read the local post store)
+    _scheduler.add_job(
+        ingest_channels,
+        trigger=IntervalTrigger(minutes=CHANNEL_INGEST_INTERVAL_MINUTES),
+        id='channel_ingest',
+        name='Channel Ingestion',
+        replace_existing=True,
+        next_run_time=datetime.now(pytz.timezone(NEWS_TIMEZONE))
+    )
     
-    # Morning digest
+    # Feed polling (runs every minute, polls only feeds whose interval is up)
     _scheduler.add_job(
-        send_scheduled_digest,
-        trigger=CronTrigger(
-            hour=morning_hour,
-            minute=morning_minute,
-            timezone=NEWS_TIMEZONE
-        ),
-        id='morning_digest',
-        name='Morning News Digest',
+        poll_feeds,
+        trigger=IntervalTrigger(minutes=1),
+        id='feed_poll',
+        name='Feed Polling',
         replace_existing=True,
-        kwargs={'digest_type': 'full'}
+        next_run_time=datetime.now(pytz.timezone(NEWS_TIMEZONE))
     )
     
-    # Evening digest
+    # Outbox retries (first run right away picks up messages left before a restart)
     _scheduler.add_job(
-        send_scheduled_digest,
-        trigger=CronTrigger(
-            hour=evening_hour,
-            minute=evening_minute,
-            timezone=NEWS_TIMEZONE
-        ),
-        id='evening_digest',
-        name='Evening News Digest',
+        flush_outbox,
+        trigger=IntervalTrigger(minutes=1),
+        id='outbox_flush',
+        name='Delivery Outbox',
         replace_existing=True,
-        kwargs={'digest_type': 'full'}
+        next_run_time=datetime.now(pytz.timezone(NEWS_TIMEZONE))
     )
     
+    # History retention (compression, expiry, incremental vacuum)
+    _scheduler.add_job(
+        apply_retention,
+        trigger=IntervalTrigger(hours=RETENTION_INTERVAL_HOURS),
+        id='retention',
+        name='History Retention',
+        replace_existing=True
+    )
     _scheduler.start()
+    
     print(f"📅 Scheduler started:")
-    print(f"  🌅 Morning digest: {NEWS_SCHEDULE_MORNING} {NEWS_TIMEZONE}")
-    print(f"  🌆 Evening digest: {NEWS_SCHEDULE_EVENING} {NEWS_TIMEZONE}")
+    for at in await schedule_times():
+        print(f"  📰 Digest: {at} {NEWS_TIMEZONE} ({len(await group_subscribers(at))} distinct digest(s))")
 
 
 def stop_scheduler():
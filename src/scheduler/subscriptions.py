@@ -0,0 +1,135 @@
+"""Per-user digest subscriptions."""
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from src.config import ALLOWED_USER_IDS, NEWS_SCHEDULE_MORNING, NEWS_SCHEDULE_EVENING
+from sqlalchemy import select
+
+from src.database import get_session, DigestSubscription
+
+DEFAULT_HOURS_BACK = 12
+MAX_HOURS_BACK = 72
+DIGEST_TYPES = ('brief', 'full')
+
+
+def parse_times(value: str) -> List[str]:
+    """
+    Parse and normalize "HH:MM" times separated by commas or spaces.
+    
+    Raises:
+        ValueError: If a time is malformed
+    """
+    times = set()
+    for part in value.replace(',', ' ').split():
+        hour, minute = map(int, part.split(':'))
+        if not (0 <= hour < 24 and 0 <= minute < 60):
+            raise ValueError(f"Invalid time: {part}")
+        times.add(f"{hour:02d}:{minute:02d}")
+    return sorted(times)
+
+
+def parse_channels(value: str) -> List[str]:
+    """Normalize a comma/space separated channel list to sorted usernames without '@'."""
+    return sorted({c.strip().lstrip('@').lower() for c in value.replace(',', ' ').split() if c.strip()})
+
+
+def _default_subscription(telegram_user_id) -> DigestSubscription:
+    """Subscription with the global schedule (NEWS_SCHEDULE_MORNING/EVENING)."""
+    return DigestSubscription(
+        telegram_user_id=str(telegram_user_id),
+        schedule_times=",".join(parse_times(f"{NEWS_SCHEDULE_MORNING},{NEWS_SCHEDULE_EVENING}")),
+        digest_type='full',
+        channels="",
+        hours_back=DEFAULT_HOURS_BACK,
+        is_active=True
+    )
+
+
+async def ensure_default_subscriptions():
+    """Subscribe every allowed user without settings to the default schedule."""
+    async with get_session() as db:
+        existing = set(await db.scalars(select(DigestSubscription.telegram_user_id)))
+        for user_id in ALLOWED_USER_IDS:
+            if str(user_id) not in existing:
+                db.add(_default_subscription(user_id))
+        await db.commit()
+
+
+async def get_subscription(telegram_user_id) -> Optional[DigestSubscription]:
+    """Get a user's subscription (None if the user has none)."""
+    async with get_session() as db:
+        return await db.scalar(
+            select(DigestSubscription).where(DigestSubscription.telegram_user_id == str(telegram_user_id))
+        )
+
+
+async def update_subscription(telegram_user_id, **fields) -> DigestSubscription:
+    """
+    Create or update a user's subscription.
+    
+    Args:
+        telegram_user_id: Telegram user id
+        **fields: schedule_times, digest_type, channels, hours_back, is_active
+    
+    Returns:
+        Updated subscription
+    """
+    async with get_session() as db:
+        subscription = await db.scalar(
+            select(DigestSubscription).where(DigestSubscription.telegram_user_id == str(telegram_user_id))
+        )
+        if subscription is None:
+            subscription = _default_subscription(telegram_user_id)
+            db.add(subscription)
+        for name, value in fields.items():
+            setattr(subscription, name, value)
+        subscription.updated_at = datetime.now(timezone.utc)
+        await db.commit()
+        return subscription
+
+
+async def get_active_subscriptions() -> List[DigestSubscription]:
+    """Get active subscriptions of users that are still in ALLOWED_USER_IDS."""
+    allowed = [str(user_id) for user_id in ALLOWED_USER_IDS]
+    async with get_session() as db:
+        return list(await db.scalars(
+            select(DigestSubscription).where(
+                DigestSubscription.is_active == True,
+                DigestSubscription.telegram_user_id.in_(allowed)
+            )
+        ))
+
+
+def digest_key(subscription: DigestSubscription) -> Tuple[str, Tuple[str, ...], int]:
+    """Settings that define the digest content: (digest_type, channels, hours_back)."""
+    return (
+        subscription.digest_type or 'full',
+        tuple(parse_channels(subscription.channels or "")),
+        subscription.hours_back or DEFAULT_HOURS_BACK,
+    )
+
+
+async def schedule_times() -> List[str]:
+    """All distinct delivery times of active subscriptions."""
+    times = set()
+    for subscription in await get_active_subscriptions():
+        times.update(parse_times(subscription.schedule_times or ""))
+    return sorted(times)
+
+
+async def group_subscribers(at: str) -> Dict[Tuple[str, Tuple[str, ...], int], List[int]]:
+    """
+    Group the users subscribed at a time by identical digest settings.
+    
+    Args:
+        at: Delivery time "HH:MM"
+    
+    Returns:
+        Dict digest_key -> telegram user ids
+    """
+    groups: Dict[Tuple[str, Tuple[str, ...], int], List[int]] = defaultdict(list)
+    for subscription in await get_active_subscriptions():
+        if at in parse_times(subscription.schedule_times or ""):
+            groups[digest_key(subscription)].append(int(subscription.telegram_user_id))
+    return dict(groups)
@@ -0,0 +1,66 @@
+"""Single-flight: concurrent identical requests share one in-flight call."""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key onto one task.
+    
+    The first caller starts the work, callers arriving while it runs await
+    the same task and get the same result (or exception). Nothing is cached:
+    once the task finishes, the next call starts fresh work. A caller that
+    is cancelled does not cancel the work the others are waiting for.
+    """
+    
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.calls = 0
+        self.shared = 0
+    
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        Run ``fn()`` unless a call with the same key is already in flight.
+        
+        Args:
+            key: Operation and its parameters, e.g. ("digest", "brief", 24)
+            fn: Starts the work (called only by the first caller)
+        
+        Returns:
+            Result of the shared call
+        """
+        self.calls += 1
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            self.shared += 1
+        return await asyncio.shield(task)
+    
+    def _forget(self, key: Hashable, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # Mark the exception as retrieved when every caller was cancelled
+            task.exception()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Calls, calls that joined an in-flight one, and keys in flight now."""
+        return {'calls': self.calls, 'shared': self.shared, 'in_flight': len(self._inflight)}
+
+
+_flights = SingleFlight()
+
+
+async def single_flight(key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+    """Run ``fn()`` once for concurrent callers with the same key (see SingleFlight)."""
+    return await _flights.do(key, fn)
+
+
+def single_flight_stats() -> Dict[str, Any]:
+    """Statistics of the shared single-flight group."""
+    return _flights.stats()
@@ -1,9 +1,10 @@
 """Telegram client for reading channels."""
 from .client import TelegramClientManager
-from .channels import get_channel_messages, get_monitored_channels
+from .channels import ChannelRecord, get_channel_messages, get_monitored_channels
 
 __all__ = [
     "TelegramClientManager",
+    "ChannelRecord",
     "get_channel_messages",
     "get_monitored_channels",
 ]
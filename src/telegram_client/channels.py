@@ -1,102 +1,574 @@
 """Channel management and message retrieval."""
-from typing import List
-from datetime import datetime, timezone
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from datetime import datetime, timedelta, timezone
 import asyncio
+import math
 
-from src.database import SessionLocal, MonitoredChannel
-from .client import get_telegram_client
+from src.config import (
+    CHANNEL_FETCH_MIN_LIMIT,
+    CHANNEL_FETCH_MAX_LIMIT,
+    CHANNEL_FETCH_HEADROOM,
+    CHANNEL_INGEST_INTERVAL_MINUTES,
+    CHANNEL_INGEST_SWEEP_MINUTES,
+    CHANNEL_POST_RETENTION_HOURS,
+    DEFAULT_NEWS_CHANNELS,
+)
+from sqlalchemy import select, update
 
+from src.database import get_session, MonitoredChannel, ChannelStats, ChannelPost, ChannelIngestState
+from .client import get_telegram_client, MAX_PAGE_SIZE
 
-def get_monitored_channels() -> List[MonitoredChannel]:
-    """Get list of active monitored channels from database."""
-    db = SessionLocal()
-    try:
-        channels = db.query(MonitoredChannel).filter(
-            MonitoredChannel.is_active == True
-        ).all()
-        return channels
-    finally:
-        db.close()
+# Weight of the latest observation in the posting-rate EWMA
+RATE_SMOOTHING = 0.3
+# Ingestion re-fetches this many hours before the previous run to refresh views/reactions
+INGEST_OVERLAP_HOURS = 2
+# Longest pause after consecutive ingestion errors of a channel
+INGEST_BACKOFF_MAX_MINUTES = 240
+
+
+class ChannelRecord(NamedTuple):
+    """Immutable snapshot of an active monitored channel."""
+    id: int
+    channel_username: str
+    channel_title: Optional[str]
+    added_at: Optional[datetime]
+
+
+# Read-through cache of active channels, dropped by every change to the list
+_active_channels: Optional[Tuple[ChannelRecord, ...]] = None
+# Bumped on invalidation, so a load that raced with a change is not cached
+_cache_generation = 0
+_cache_stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+
+
+def invalidate_channel_cache():
+    """Forget the cached active channel list (call after changing monitored_channels)."""
+    global _active_channels, _cache_generation
+    _active_channels = None
+    _cache_generation += 1
+    _cache_stats['invalidations'] += 1
+
+
+def channel_cache_stats() -> dict:
+    """Hits, misses, invalidations and hit_rate of the active channel cache."""
+    lookups = _cache_stats['hits'] + _cache_stats['misses']
+    return {**_cache_stats, 'hit_rate': _cache_stats['hits'] / lookups if lookups else 0.0}
+
+
+async def get_monitored_channels() -> List[ChannelRecord]:
+    """Get list of active monitored channels (cached until the list changes)."""
+    global _active_channels
+    if _active_channels is not None:
+        _cache_stats['hits'] += 1
+        return list(_active_channels)
+    
+    _cache_stats['misses'] += 1
+    generation = _cache_generation
+    async with get_session() as db:
+        result = await db.execute(
+            select(MonitoredChannel).where(MonitoredChannel.is_active == True)
+        )
+        records = tuple(
+            ChannelRecord(c.id, c.channel_username, c.channel_title, c.added_at)
+            for c in result.scalars()
+        )
+    if generation == _cache_generation:
+        _active_channels = records
+    return list(records)
+
+
+async def add_channels(channel_usernames: List[str]) -> List[MonitoredChannel]:
+    """
+    Add many channels to the monitoring list at once.
+    
+    Known channels are reactivated, new ones are resolved in one round of
+    entity resolution and inserted in a single transaction.
+    
+    Returns:
+        Monitored channels in the order given
+    """
+    channel_usernames = list(dict.fromkeys(channel_usernames))
+    if not channel_usernames:
+        return []
+    
+    async with get_session() as db:
+        rows = await db.scalars(
+            select(MonitoredChannel).where(MonitoredChannel.channel_username.in_(channel_usernames))
+        )
+        channels = {channel.channel_username: channel for channel in rows}
+        for channel in channels.values():
+            channel.is_active = True
+        await db.commit()
+    invalidate_channel_cache()
+    
+    new_usernames = [c for c in channel_usernames if c not in channels]
+    if new_usernames:
+        # Resolve channel info (outside the session, it is a network call)
+        client = get_telegram_client()
+        infos = await client.resolve_channels(new_usernames)
+        
+        async with get_session() as db:
+            for channel_username in new_usernames:
+                channel_info = infos.get(channel_username)
+                channels[channel_username] = MonitoredChannel(
+                    channel_username=channel_username,
+                    channel_title=channel_info['title'] if channel_info else None,
+                    is_active=True
+                )
+            db.add_all(channels[c] for c in new_usernames)
+            await db.commit()
+        invalidate_channel_cache()
+    
+    return [channels[c] for c in channel_usernames]
 
 
 async def add_channel(channel_username: str) -> MonitoredChannel:
     """Add a channel to monitoring list."""
-    db = SessionLocal()
-    try:
-        # Check if already exists
-        existing = db.query(MonitoredChannel).filter(
-            MonitoredChannel.channel_username == channel_username
-        ).first()
+    return (await add_channels([channel_username]))[0]
+
+
+async def import_default_channels() -> int:
+    """
+    Add DEFAULT_NEWS_CHANNELS that are not in the database yet.
+    
+    Channels the user removed stay removed.
+    
+    Returns:
+        Number of channels imported
+    """
+    usernames = [c.strip().lstrip('@') for c in DEFAULT_NEWS_CHANNELS if c.strip()]
+    if not usernames:
+        return 0
+    async with get_session() as db:
+        known = set(await db.scalars(
+            select(MonitoredChannel.channel_username).where(MonitoredChannel.channel_username.in_(usernames))
+        ))
+    missing = [c for c in usernames if c not in known]
+    await add_channels(missing)
+    return len(missing)
+
+
+async def remove_channel(channel_username: str) -> bool:
+    """Remove a channel from monitoring (soft delete)."""
+    async with get_session() as db:
+        result = await db.execute(
+            update(MonitoredChannel)
+            .where(MonitoredChannel.channel_username == channel_username)
+            .values(is_active=False)
+        )
+        await db.commit()
+        invalidate_channel_cache()
+        return result.rowcount > 0
+
+
+async def deactivate_all_channels() -> int:
+    """Remove every channel from monitoring (soft delete)."""
+    async with get_session() as db:
+        result = await db.execute(
+            update(MonitoredChannel)
+            .where(MonitoredChannel.is_active == True)
+            .values(is_active=False)
+        )
+        await db.commit()
+        invalidate_channel_cache()
+        return result.rowcount
+
+
+def plan_fetch(stats: Optional[ChannelStats], hours_back: int) -> Tuple[int, int]:
+    """
+    Choose fetch limit and page size for a channel window.
+    
+    Args:
+        stats: Channel statistics (None for a channel never fetched before)
+        hours_back: Window size in hours
         
-        if existing:
-            existing.is_active = True
-            db.commit()
-            return existing
+    Returns:
+        Tuple of (limit, page_size)
+    """
+    if stats is None or not stats.fetch_count:
+        # Unknown rate: full pages, pagination stops at the window start anyway
+        return CHANNEL_FETCH_MAX_LIMIT, MAX_PAGE_SIZE
+    
+    expected = (stats.posts_per_hour or 0.0) * hours_back
+    wanted = math.ceil(expected * CHANNEL_FETCH_HEADROOM)
+    limit = max(CHANNEL_FETCH_MIN_LIMIT, min(CHANNEL_FETCH_MAX_LIMIT, wanted))
+    page_size = max(1, min(MAX_PAGE_SIZE, math.ceil(expected) + 5, limit))
+    return limit, page_size
+
+
+def _record_fetch(stats: ChannelStats, result: dict, hours_back: int, now: datetime):
+    """Fold a fetch result into channel posting-rate statistics."""
+    covered_hours = hours_back
+    if result['truncated'] and result['oldest'] is not None:
+        # Only part of the window was seen, measure the rate over that part
+        covered_hours = max((now - result['oldest']).total_seconds() / 3600, 1 / 60)
+    
+    observed_rate = result['scanned'] / covered_hours if covered_hours else 0.0
+    if stats.fetch_count:
+        stats.posts_per_hour = (1 - RATE_SMOOTHING) * (stats.posts_per_hour or 0.0) + RATE_SMOOTHING * observed_rate
+    else:
+        stats.posts_per_hour = observed_rate
+    if result['truncated']:
+        # Never let a truncated window pull the estimate below what we just saw
+        stats.posts_per_hour = max(stats.posts_per_hour, observed_rate)
+        stats.truncated_windows = (stats.truncated_windows or 0) + 1
+        stats.last_truncated_at = now
+    
+    stats.fetch_count = (stats.fetch_count or 0) + 1
+    stats.last_fetch_count = result['scanned']
+    stats.updated_at = now
+
+
+async def _load_stats(channel_usernames: List[str]) -> Dict[str, ChannelStats]:
+    async with get_session() as db:
+        rows = await db.scalars(
+            select(ChannelStats).where(ChannelStats.channel_username.in_(channel_usernames))
+        )
+        return {stats.channel_username: stats for stats in rows}
+
+
+async def _fetch(channel_username: str, hours_back: float, stats: Optional[ChannelStats]) -> dict:
+    """Fetch a channel window sized from its statistics (no database access)."""
+    limit, page_size = plan_fetch(stats, hours_back)
+    client = get_telegram_client()
+    result = await client.fetch_channel_messages(
+        channel_username,
+        hours_back=hours_back,
+        limit=limit,
+        page_size=page_size
+    )
+    if result['truncated']:
+        print(f"⚠️ {channel_username}: window of {hours_back:.0f}h truncated at {limit} messages")
+    return result
+
+
+async def _save_run(fetches: List[dict], now: datetime, store_posts: bool = True):
+    """
+    Write the bookkeeping of a collection run in one transaction.
+    
+    last_checked is set with a single UPDATE, statistics, ingest states and
+    posts are loaded with one query each and upserted together.
+    
+    Args:
+        fetches: Dicts with channel, result, hours_back and window_start
+        now: Time of the run
+        store_posts: Also upsert posts into the local store and extend coverage
+    """
+    if not fetches:
+        return
+    channels = [f['channel'] for f in fetches]
+    
+    async with get_session() as db:
+        await db.execute(
+            update(MonitoredChannel)
+            .where(MonitoredChannel.channel_username.in_(channels))
+            .values(last_checked=now)
+        )
         
-        # Resolve channel info
-        client = get_telegram_client()
-        channel_info = await client.resolve_channel(channel_username)
+        stats_rows = await db.scalars(select(ChannelStats).where(ChannelStats.channel_username.in_(channels)))
+        all_stats = {stats.channel_username: stats for stats in stats_rows}
+        for fetch in fetches:
+            if fetch['result'].get('error'):
+                # A window cut short by an error says nothing about the posting rate
+                continue
+            stats = all_stats.get(fetch['channel'])
+            if stats is None:
+                stats = ChannelStats(channel_username=fetch['channel'])
+                db.add(stats)
+            _record_fetch(stats, fetch['result'], fetch['hours_back'], now)
         
-        channel = MonitoredChannel(
-            channel_username=channel_username,
-            channel_title=channel_info['title'] if channel_info else None,
-            is_active=True
-        )
-        db.add(channel)
-        db.commit()
-        db.refresh(channel)
-        return channel
-    finally:
-        db.close()
+        if store_posts:
+            await _upsert_posts(db, fetches, now)
+        
+        await db.commit()
 
 
-def remove_channel(channel_username: str) -> bool:
-    """Remove a channel from monitoring (soft delete)."""
-    db = SessionLocal()
-    try:
-        channel = db.query(MonitoredChannel).filter(
-            MonitoredChannel.channel_username == channel_username
-        ).first()
+async def _upsert_posts(db, fetches: List[dict], now: datetime):
+    """
+    Upsert fetched posts and extend each channel's covered range (inside a run's session).
+    
+    A fetch that stopped on an error leaves the channel's coverage and
+    last_ingested_at untouched and backs the channel off (see
+    _ingest_backoff); a truncated one covers only back to its oldest
+    scanned post.
+    """
+    channels = [f['channel'] for f in fetches]
+    message_ids = {msg['id'] for f in fetches for msg in f['result']['messages']}
+    
+    existing = {}
+    if message_ids:
+        rows = await db.scalars(
+            select(ChannelPost).where(
+                ChannelPost.channel_username.in_(channels),
+                ChannelPost.message_id.in_(message_ids)
+            )
+        )
+        existing = {(row.channel_username, row.message_id): row for row in rows}
+    
+    state_rows = await db.scalars(
+        select(ChannelIngestState).where(ChannelIngestState.channel_username.in_(channels))
+    )
+    states = {state.channel_username: state for state in state_rows}
+    
+    for fetch in fetches:
+        channel_username = fetch['channel']
+        for msg in fetch['result']['messages']:
+            row = existing.get((channel_username, msg['id']))
+            if row is None:
+                row = ChannelPost(channel_username=channel_username, message_id=msg['id'])
+                db.add(row)
+            # Edits and engagement change after publication, refresh them
+            row.date = msg['date']
+            row.text = msg['text']
+            row.text_compressed = None
+            row.views = msg.get('views') or 0
+            row.forwards = msg.get('forwards') or 0
+            row.reactions = msg.get('reactions') or 0
+            row.fetched_at = now
+        
+        state = states.get(channel_username)
+        if state is None:
+            state = ChannelIngestState(channel_username=channel_username)
+            states[channel_username] = state
+            db.add(state)
+        state.last_attempt_at = now
+        
+        result = fetch['result']
+        if result.get('error'):
+            # Posts read before the error are kept, but the window was not read
+            # to its start: coverage stays as it was and a later run fetches it again
+            state.error_count = (state.error_count or 0) + 1
+            state.retry_after = now + timedelta(minutes=_ingest_backoff(state.error_count))
+            continue
         
-        if channel:
-            channel.is_active = False
-            db.commit()
-            return True
-        return False
-    finally:
-        db.close()
+        state.error_count = 0
+        state.retry_after = None
+        window_start = fetch['window_start']
+        if result['truncated'] and result['oldest'] is not None:
+            # Only posts back to the oldest scanned one were read
+            window_start = max(window_start, result['oldest'])
+        last = _utc(state.last_ingested_at)
+        if state.covered_from is not None and last is not None and last >= window_start:
+            # The new window overlaps the covered range, so coverage stays contiguous
+            state.covered_from = min(_utc(state.covered_from), window_start)
+        else:
+            state.covered_from = window_start
+        state.last_ingested_at = now
 
 
 async def get_channel_messages(channel_username: str, hours_back: int = 24) -> List[dict]:
     """Get messages from a specific channel."""
-    client = get_telegram_client()
-    messages = await client.get_channel_messages(channel_username, hours_back=hours_back)
-    
-    # Update last_checked in database
-    db = SessionLocal()
-    try:
-        channel = db.query(MonitoredChannel).filter(
-            MonitoredChannel.channel_username == channel_username
-        ).first()
-        if channel:
-            channel.last_checked = datetime.now(timezone.utc)
-            db.commit()
-    finally:
-        db.close()
-    
-    return messages
-
-
-async def get_all_monitored_messages(hours_back: int = 24) -> dict:
-    """Get messages from all monitored channels."""
-    channels = get_monitored_channels()
-    all_messages = {}
+    stats = (await _load_stats([channel_username])).get(channel_username)
+    result = await _fetch(channel_username, hours_back, stats)
+    
+    # Update last_checked and posting-rate statistics in database
+    now = datetime.now(timezone.utc)
+    await _save_run(
+        [{'channel': channel_username, 'result': result, 'hours_back': hours_back, 'window_start': None}],
+        now,
+        store_posts=False
+    )
+    return result['messages']
+
+
+def _utc(value: Optional[datetime]) -> Optional[datetime]:
+    """SQLite returns naive datetimes; stored values are UTC."""
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+async def _load_ingest_states(channel_usernames: List[str]) -> Dict[str, ChannelIngestState]:
+    async with get_session() as db:
+        states = await db.scalars(
+            select(ChannelIngestState).where(ChannelIngestState.channel_username.in_(channel_usernames))
+        )
+        return {state.channel_username: state for state in states}
+
+
+def _ingest_backoff(error_count: int) -> float:
+    """Minutes to leave a channel alone after ``error_count`` failed ingestions in a row."""
+    return min(INGEST_BACKOFF_MAX_MINUTES, CHANNEL_INGEST_INTERVAL_MINUTES * 2 ** min(error_count - 1, 10))
+
+
+def _backing_off(state: Optional[ChannelIngestState], now: datetime) -> bool:
+    retry_after = _utc(state.retry_after) if state else None
+    return retry_after is not None and retry_after > now
+
+
+def _ingest_window(state: Optional[ChannelIngestState], hours_back: Optional[float], now: datetime) -> float:
+    """Hours to fetch so the store catches up (and covers ``hours_back`` if given)."""
+    last = _utc(state.last_ingested_at) if state else None
+    if last is None:
+        window = CHANNEL_POST_RETENTION_HOURS
+    else:
+        window = (now - last).total_seconds() / 3600 + INGEST_OVERLAP_HOURS
+    if hours_back:
+        covered_from = _utc(state.covered_from) if state else None
+        if covered_from is None or covered_from > now - timedelta(hours=hours_back):
+            window = max(window, hours_back)
+    return min(window, max(CHANNEL_POST_RETENTION_HOURS, hours_back or 0))
+
+
+async def ingest_channels(
+    channel_usernames: List[str],
+    hours_back: Optional[float] = None,
+    spacing: float = 0.0
+) -> int:
+    """
+    Fetch channels' new posts into the local post store.
     
-    for channel in channels:
-        messages = await get_channel_messages(channel.channel_username, hours_back)
+    Only the time since the previous ingestion is fetched (plus an overlap
+    to refresh engagement of recent posts); a channel never ingested gets
+    the whole retention window. All bookkeeping of the run is written in
+    one transaction at the end.
+    
+    Args:
+        channel_usernames: Channels to ingest
+        hours_back: Make sure at least this many hours are covered
+        spacing: Seconds to wait between channel fetches
+        
+    Returns:
+        Number of posts fetched
+    """
+    if not channel_usernames:
+        return 0
+    
+    now = datetime.now(timezone.utc)
+    states = await _load_ingest_states(channel_usernames)
+    all_stats = await _load_stats(channel_usernames)
+    
+    fetches = []
+    for i, channel_username in enumerate(channel_usernames):
+        if i and spacing:
+            await asyncio.sleep(spacing)
+        window = _ingest_window(states.get(channel_username), hours_back, now)
+        try:
+            result = await _fetch(channel_username, window, all_stats.get(channel_username))
+        except Exception as e:
+            print(f"Error ingesting {channel_username}: {e}")
+            # Recorded as a failed fetch, so the channel backs off
+            result = {'messages': [], 'scanned': 0, 'truncated': False, 'oldest': None,
+                      'error': str(e) or type(e).__name__}
+        else:
+            if result.get('error'):
+                print(f"⚠️ {channel_username}: ingestion stopped early ({result['error']}), will retry")
+        fetches.append({
+            'channel': channel_username,
+            'result': result,
+            'hours_back': window,
+            'window_start': now - timedelta(hours=window),
+        })
+    
+    await _save_run(fetches, now)
+    return sum(len(f['result']['messages']) for f in fetches)
+
+
+async def ingest_due_channels() -> int:
+    """
+    Ingest the part of the channel list that is due in this run.
+    
+    Runs every CHANNEL_INGEST_INTERVAL_MINUTES and takes just enough of the
+    least recently ingested channels to go through the whole list once per
+    CHANNEL_INGEST_SWEEP_MINUTES. Channels of a run are spaced out over half
+    the interval, so Telegram API calls stay evenly spread. Channels backing
+    off after errors are skipped until their retry time, and a failed
+    attempt counts like an ingestion when ordering, so they do not hold
+    the head of the queue.
+    
+    Returns:
+        Number of channels ingested
+    """
+    channels = [c.channel_username for c in await get_monitored_channels()]
+    if not channels:
+        return 0
+    
+    now = datetime.now(timezone.utc)
+    states = await _load_ingest_states(channels)
+    runs_per_sweep = max(1, CHANNEL_INGEST_SWEEP_MINUTES // CHANNEL_INGEST_INTERVAL_MINUTES)
+    batch = math.ceil(len(channels) / runs_per_sweep)
+    
+    epoch = datetime.min.replace(tzinfo=timezone.utc)
+    
+    def last_touched(channel_username: str) -> datetime:
+        state = states.get(channel_username)
+        if state is None:
+            return epoch
+        return max(_utc(state.last_ingested_at) or epoch, _utc(state.last_attempt_at) or epoch)
+    
+    channels = [c for c in channels if not _backing_off(states.get(c), now)]
+    if not channels:
+        return 0
+    channels.sort(key=last_touched)
+    due = channels[:batch]
+    
+    await ingest_channels(due, spacing=CHANNEL_INGEST_INTERVAL_MINUTES * 60 / 2 / len(due))
+    return len(due)
+
+
+async def _load_posts(channel_usernames: List[str], since: datetime) -> Dict[str, List[dict]]:
+    async with get_session() as db:
+        rows = await db.scalars(
+            select(ChannelPost).where(
+                ChannelPost.channel_username.in_(channel_usernames),
+                ChannelPost.date >= since
+            ).order_by(ChannelPost.date.desc())
+        )
+        rows = list(rows)
+    
+    posts: Dict[str, List[dict]] = {c: [] for c in channel_usernames}
+    for row in rows:
+        posts[row.channel_username].append({
+            'id': row.message_id,
+            'date': _utc(row.date),
+            'text': row.body,
+            'sender': row.channel_username.lstrip('@'),
+            'views': row.views or 0,
+            'forwards': row.forwards or 0,
+            'reactions': row.reactions or 0,
+        })
+    return posts
+
+
+async def get_all_monitored_messages(hours_back: int = 24, channels: Optional[List[str]] = None) -> dict:
+    """
+    Get messages from all monitored channels.
+    
+    Reads the local post store. Channels it does not cover yet (just added,
+    or ingestion fell behind) are ingested first, except those backing off
+    after errors: they are served from what the store has.
+    
+    Args:
+        hours_back: How many hours back to fetch messages
+        channels: Only these channel usernames (default: all monitored)
+    """
+    monitored = await get_monitored_channels()
+    if channels:
+        wanted = {c.lstrip('@').lower() for c in channels}
+        monitored = [c for c in monitored if c.channel_username.lstrip('@').lower() in wanted]
+    usernames = [c.channel_username for c in monitored]
+    
+    now = datetime.now(timezone.utc)
+    since = now - timedelta(hours=hours_back)
+    stale_before = now - timedelta(minutes=2 * CHANNEL_INGEST_SWEEP_MINUTES)
+    states = await _load_ingest_states(usernames)
+    behind = [
+        channel_username for channel_username in usernames
+        if channel_username not in states
+        or not _backing_off(states[channel_username], now) and (
+            states[channel_username].covered_from is None
+            or _utc(states[channel_username].covered_from) > since
+            or _utc(states[channel_username].last_ingested_at) < stale_before
+        )
+    ]
+    await ingest_channels(behind, hours_back)
+    
+    posts = await _load_posts(usernames, since)
+    all_messages = {}
+    for channel in monitored:
         all_messages[channel.channel_username] = {
             'title': channel.channel_title or channel.channel_username,
-            'messages': messages
+            'messages': posts[channel.channel_username]
         }
     
     return all_messages
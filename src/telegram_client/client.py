@@ -2,11 +2,22 @@
 from telethon import TelegramClient
 from telethon.tl.types import Message
 from datetime import datetime, timedelta, timezone
-from typing import List, Optional
+from typing import Dict, List, Optional
 import asyncio
 
 from src.config import TELEGRAM_API_ID, TELEGRAM_API_HASH, TELEGRAM_SESSION_NAME
 
+# Telegram returns at most 100 messages per history request
+MAX_PAGE_SIZE = 100
+
+
+def _count_reactions(message: Message) -> int:
+    """Total number of reactions on a message (0 if reactions are off)."""
+    reactions = getattr(message, 'reactions', None)
+    if not reactions or not getattr(reactions, 'results', None):
+        return 0
+    return sum(r.count for r in reactions.results)
+
 
 class TelegramClientManager:
     """Manages Telethon client for reading channels."""
@@ -52,7 +63,41 @@ class TelegramClientManager:
             limit: Maximum number of messages to fetch
             
         Returns:
-            List of message dicts with keys: id, date, text, sender
+            List of message dicts with keys: id, date, text, sender, views,
+            forwards, reactions
+        """
+        result = await self.fetch_channel_messages(channel_username, hours_back=hours_back, limit=limit)
+        return result['messages']
+    
+    async def fetch_channel_messages(
+        self,
+        channel_username: str,
+        hours_back: int = 24,
+        limit: int = 100,
+        page_size: int = 100
+    ) -> dict:
+        """
+        Fetch a time window of channel messages page by page.
+        
+        Pages are requested newest-first with ``offset_id`` until the window
+        start is reached or ``limit`` messages have been scanned.
+        
+        Args:
+            channel_username: Channel username (with or without @) or ID
+            hours_back: How many hours back to fetch messages
+            limit: Maximum number of messages to scan (text and media)
+            page_size: Messages per API request (Telegram caps it at 100)
+            
+        Returns:
+            Dict with keys:
+            - messages: list of text message dicts (id, date, text, sender,
+              views, forwards, reactions)
+            - scanned: number of messages inside the window that were scanned
+            - truncated: True if the window held more than ``limit`` messages
+            - oldest: date of the oldest scanned message (or None)
+            - error: why fetching stopped early (None if the window was
+              read to its start or to ``limit``); messages then hold only
+              what was read before the error
         """
         await self.connect()
         
@@ -62,29 +107,65 @@ class TelegramClientManager:
         
         # Calculate time threshold (with UTC timezone)
         time_threshold = datetime.now(timezone.utc) - timedelta(hours=hours_back)
+        page_size = max(1, min(page_size, MAX_PAGE_SIZE))
         
         messages = []
+        scanned = 0
+        truncated = False
+        oldest = None
+        offset_id = 0
+        error = None
         try:
-            async for message in self.client.iter_messages(
-                channel_username,
-                limit=limit,
-                offset_date=datetime.now(timezone.utc)
-            ):
-                if message.date < time_threshold:
+            while True:
+                page_limit = min(page_size, limit - scanned)
+                if page_limit <= 0:
+                    # Limit reached: peek one message to see if the window goes on
+                    peek = await self.client.get_messages(channel_username, limit=1, offset_id=offset_id)
+                    truncated = bool(peek) and peek[0].date >= time_threshold
+                    break
+                
+                batch = await self.client.get_messages(
+                    channel_username,
+                    limit=page_limit,
+                    offset_id=offset_id
+                )
+                if not batch:
                     break
                 
-                if message.text:  # Only text messages
-                    messages.append({
-                        'id': message.id,
-                        'date': message.date,
-                        'text': message.text,
-                        'sender': channel_username,
-                        'views': getattr(message, 'views', 0),
-                    })
+                window_done = False
+                for message in batch:
+                    if message.date < time_threshold:
+                        window_done = True
+                        break
+                    
+                    scanned += 1
+                    oldest = message.date
+                    if message.text:  # Only text messages
+                        messages.append({
+                            'id': message.id,
+                            'date': message.date,
+                            'text': message.text,
+                            'sender': channel_username,
+                            'views': getattr(message, 'views', 0) or 0,
+                            'forwards': getattr(message, 'forwards', 0) or 0,
+                            'reactions': _count_reactions(message),
+                        })
+                
+                if window_done or len(batch) < page_limit:
+                    break
+                offset_id = batch[-1].id
         except Exception as e:
+            # FloodWait, network drops etc.: the window was not read to its start
+            error = f"{type(e).__name__}: {e}"
             print(f"Error fetching messages from {channel_username}: {e}")
         
-        return messages
+        return {
+            'messages': messages,
+            'scanned': scanned,
+            'truncated': truncated,
+            'oldest': oldest,
+            'error': error,
+        }
     
     async def resolve_channel(self, channel_username: str) -> Optional[dict]:
         """
@@ -100,14 +181,46 @@ class TelegramClientManager:
         
         try:
             entity = await self.client.get_entity(channel_username)
-            return {
-                'id': entity.id,
-                'title': getattr(entity, 'title', ''),
-                'username': getattr(entity, 'username', ''),
-            }
+            return _entity_info(entity)
         except Exception as e:
             print(f"Error resolving channel {channel_username}: {e}")
             return None
+    
+    async def resolve_channels(self, channel_usernames: List[str]) -> Dict[str, Optional[dict]]:
+        """
+        Get info for many channels in one round of entity resolution.
+        
+        Args:
+            channel_usernames: Channel usernames or IDs
+            
+        Returns:
+            Dict channel_username -> channel info (None if not resolved)
+        """
+        if not channel_usernames:
+            return {}
+        await self.connect()
+        
+        try:
+            entities = await self.client.get_entity(list(channel_usernames))
+            return {
+                channel_username: _entity_info(entity)
+                for channel_username, entity in zip(channel_usernames, entities)
+            }
+        except Exception as e:
+            # One bad username fails the whole batch, fall back to one by one
+            print(f"Batch resolution failed ({e}), resolving channels one by one")
+            return {
+                channel_username: await self.resolve_channel(channel_username)
+                for channel_username in channel_usernames
+            }
+
+
+def _entity_info(entity) -> dict:
+    return {
+        'id': entity.id,
+        'title': getattr(entity, 'title', ''),
+        'username': getattr(entity, 'username', ''),
+    }
 
 
 # Singleton instance
@@ -1,11 +1,22 @@
 """Tools for LLM - web search, news aggregation, summarization."""
-from .web_search import search_web, search_news
+from .web_search import search_web, search_news, asearch_web, asearch_news, asearch_web_deep
+from .page_fetch import extract_main_text, get_page_fetcher, close_page_fetcher
 from .news_aggregator import aggregate_news
-from .summarizer import create_digest
+from .summarizer import create_digest, generate_digest, build_news_digest, build_brief_digest, expand_section
 
 __all__ = [
     "search_web",
     "search_news",
+    "asearch_web",
+    "asearch_news",
+    "asearch_web_deep",
+    "extract_main_text",
+    "get_page_fetcher",
+    "close_page_fetcher",
     "aggregate_news",
     "create_digest",
+    "generate_digest",
+    "build_news_digest",
+    "build_brief_digest",
+    "expand_section",
 ]
@@ -0,0 +1,153 @@
+"""Topic clustering of news posts (TF-IDF + incremental cosine clustering)."""
+import math
+import re
+from collections import Counter, defaultdict
+from typing import Dict, List
+
+from .dedup import tokenize
+from .ranking import score_messages
+
+# Minimum cosine similarity between a post and a topic centroid to join the topic
+CLUSTER_SIMILARITY = 0.3
+# Posts sent to the LLM per topic
+REPRESENTATIVES = 3
+# Terms kept per post vector (the rest carry little weight and slow the index down)
+MAX_TERMS_PER_POST = 30
+MIN_TERM_LENGTH = 3
+MAX_LABEL_CHARS = 80
+
+STOPWORDS = {
+    # ru
+    "это", "что", "как", "так", "его", "она", "они", "оно", "для", "при", "или", "уже",
+    "еще", "ещё", "был", "была", "было", "были", "будет", "быть", "все", "всё", "там",
+    "тут", "где", "когда", "который", "которая", "которые", "также", "только", "после",
+    "более", "если", "чтобы", "этот", "эта", "эти", "того", "этого", "свой", "своих",
+    "над", "под", "без", "про", "через", "между", "года", "году", "лет", "сегодня",
+    # en
+    "the", "and", "for", "with", "that", "this", "from", "are", "was", "were", "has",
+    "have", "will", "not", "but", "its", "about", "after", "into", "than",
+}
+
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?…])\s")
+
+
+def _terms(text: str) -> List[str]:
+    return [
+        t for t in tokenize(text)
+        if len(t) >= MIN_TERM_LENGTH and t not in STOPWORDS and not t.isdigit()
+    ]
+
+
+def tfidf_vectors(texts: List[str]) -> List[Dict[str, float]]:
+    """
+    Build L2-normalized sparse TF-IDF vectors (term -> weight).
+    
+    Args:
+        texts: Post texts
+    
+    Returns:
+        One vector per text (empty dict for texts without terms)
+    """
+    docs = [Counter(_terms(text)) for text in texts]
+    df = Counter()
+    for doc in docs:
+        df.update(doc.keys())
+    n = len(docs)
+    idf = {term: math.log((1 + n) / (1 + count)) + 1 for term, count in df.items()}
+    
+    vectors = []
+    for doc in docs:
+        weights = {term: (1 + math.log(tf)) * idf[term] for term, tf in doc.items()}
+        if len(weights) > MAX_TERMS_PER_POST:
+            top = sorted(weights.items(), key=lambda item: item[1], reverse=True)[:MAX_TERMS_PER_POST]
+            weights = dict(top)
+        norm = math.sqrt(sum(w * w for w in weights.values())) or 1.0
+        vectors.append({term: w / norm for term, w in weights.items()})
+    return vectors
+
+
+def _label(text: str) -> str:
+    """Short topic label: first line/sentence of the best post."""
+    first = text.strip().split("\n", 1)[0]
+    first = _SENTENCE_END_RE.split(first, 1)[0]
+    if len(first) > MAX_LABEL_CHARS:
+        first = first[:MAX_LABEL_CHARS].rsplit(" ", 1)[0] + "…"
+    return first
+
+
+def cluster_news(news_data: Dict, threshold: float = CLUSTER_SIMILARITY) -> List[Dict]:
+    """
+    Group posts from all channels into topics.
+    
+    Posts are visited from the most to the least important (see
+    ranking.score_messages) and each joins the most similar existing topic
+    centroid, or starts a new topic. Candidate topics are found through an
+    inverted term index, so only topics sharing terms with a post are scored.
+    
+    Args:
+        news_data: Output from aggregate_news()
+        threshold: Minimum cosine similarity to join a topic
+    
+    Returns:
+        Topics sorted by importance, each a dict with keys: label, score,
+        messages, channels (titles), representatives (best posts)
+    """
+    score_messages(news_data)
+    entries = [
+        (data['title'], msg)
+        for data in news_data['channels'].values()
+        for msg in data['messages']
+    ]
+    entries.sort(key=lambda entry: entry[1]['score'], reverse=True)
+    vectors = tfidf_vectors([msg['text'] for _, msg in entries])
+    
+    centroids: List[Dict[str, float]] = []
+    norms_sq: List[float] = []
+    members: List[List[int]] = []
+    index: Dict[str, set] = defaultdict(set)
+    
+    for i, vector in enumerate(vectors):
+        dots: Dict[int, float] = defaultdict(float)
+        for term, weight in vector.items():
+            for c in index.get(term, ()):
+                dots[c] += weight * centroids[c][term]
+        
+        best, best_sim = None, threshold
+        for c, dot in dots.items():
+            similarity = dot / math.sqrt(norms_sq[c])
+            if similarity >= best_sim:
+                best, best_sim = c, similarity
+        
+        if best is None:
+            best = len(centroids)
+            centroids.append({})
+            norms_sq.append(0.0)
+            members.append([])
+        
+        centroid = centroids[best]
+        for term, weight in vector.items():
+            old = centroid.get(term, 0.0)
+            centroid[term] = old + weight
+            norms_sq[best] += (old + weight) ** 2 - old ** 2
+            index[term].add(best)
+        members[best].append(i)
+    
+    topics = []
+    for indexes in members:
+        # Members are already in descending score order
+        topic_entries = [entries[i] for i in indexes]
+        channels = []
+        for title, msg in topic_entries:
+            for source in msg.get('sources') or [title]:
+                if source not in channels:
+                    channels.append(source)
+        topics.append({
+            'label': _label(topic_entries[0][1]['text']),
+            'score': sum(msg['score'] for _, msg in topic_entries),
+            'messages': [msg for _, msg in topic_entries],
+            'channels': channels,
+            'representatives': topic_entries[:REPRESENTATIVES],
+        })
+    
+    topics.sort(key=lambda topic: topic['score'], reverse=True)
+    return topics
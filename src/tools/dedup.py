@@ -0,0 +1,188 @@
+"""Cross-channel near-duplicate detection for news posts (MinHash + banded LSH)."""
+import hashlib
+import re
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+# One-permutation MinHash: each feature is hashed once and lands in one of
+# NUM_BINS bins, so a signature costs O(features) instead of O(features * k).
+NUM_BINS = 64
+LSH_BANDS = 16
+LSH_ROWS = NUM_BINS // LSH_BANDS
+# Estimated Jaccard similarity (of word unigrams + bigrams) to call a pair duplicates
+SIMILARITY_THRESHOLD = 0.7
+# Posts shorter than this are only collapsed on exact text match
+MIN_TOKENS = 5
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+_BIN_BITS = NUM_BINS.bit_length() - 1
+_EMPTY = 1 << 64
+_hash_cache: Dict[str, int] = {}
+_HASH_CACHE_LIMIT = 200_000
+
+
+def _feature_hash(feature: str) -> int:
+    """Return a stable 64-bit hash of a feature (memoized)."""
+    value = _hash_cache.get(feature)
+    if value is None:
+        digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+        value = int.from_bytes(digest, "little")
+        if len(_hash_cache) >= _HASH_CACHE_LIMIT:
+            _hash_cache.clear()
+        _hash_cache[feature] = value
+    return value
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens of a post."""
+    return _WORD_RE.findall(text.lower())
+
+
+def minhash(tokens: List[str]) -> List[int]:
+    """
+    Compute a one-permutation MinHash signature over word unigrams and bigrams.
+    
+    Empty bins are filled from the next non-empty bin (rotation
+    densification) so short posts still get comparable signatures.
+    
+    Args:
+        tokens: Word tokens of the post
+    
+    Returns:
+        Signature of NUM_BINS ints
+    """
+    features = set(tokens)
+    features.update(f"{a} {b}" for a, b in zip(tokens, tokens[1:]))
+    
+    signature = [_EMPTY] * NUM_BINS
+    for feature in features:
+        h = _feature_hash(feature)
+        b = h & (NUM_BINS - 1)
+        v = h >> _BIN_BITS
+        if v < signature[b]:
+            signature[b] = v
+    
+    if _EMPTY in signature and len(set(signature)) > 1:
+        for b in range(NUM_BINS):
+            if signature[b] != _EMPTY:
+                continue
+            for offset in range(1, NUM_BINS):
+                donor = signature[(b + offset) % NUM_BINS]
+                if donor != _EMPTY and donor < _EMPTY:
+                    signature[b] = donor + offset * _EMPTY
+                    break
+    return signature
+
+
+def _similarity(a: List[int], b: List[int]) -> float:
+    return sum(1 for x, y in zip(a, b) if x == y) / NUM_BINS
+
+
+def find_duplicate_groups(texts: List[str]) -> List[List[int]]:
+    """
+    Group near-duplicate texts.
+    
+    Args:
+        texts: Post texts
+    
+    Returns:
+        Groups of indexes into ``texts``; only groups with 2+ members
+    """
+    parent = list(range(len(texts)))
+    
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+    
+    def union(i: int, j: int):
+        ri, rj = find(i), find(j)
+        if ri != rj:
+            parent[max(ri, rj)] = min(ri, rj)
+    
+    exact: Dict[str, int] = {}
+    buckets: Dict[Tuple, List[int]] = defaultdict(list)
+    signatures: Dict[int, List[int]] = {}
+    
+    for i, text in enumerate(texts):
+        tokens = tokenize(text)
+        if not tokens:
+            # Emoji- or punctuation-only posts share the empty key but not the story
+            continue
+        key = " ".join(tokens)
+        if key in exact:
+            union(exact[key], i)
+            continue
+        exact[key] = i
+        if len(tokens) < MIN_TOKENS:
+            continue
+        
+        signature = minhash(tokens)
+        signatures[i] = signature
+        checked = set()
+        for band in range(LSH_BANDS):
+            rows = tuple(signature[band * LSH_ROWS:(band + 1) * LSH_ROWS])
+            bucket = buckets[(band, rows)]
+            for j in bucket:
+                if j in checked:
+                    continue
+                checked.add(j)
+                if _similarity(signature, signatures[j]) >= SIMILARITY_THRESHOLD:
+                    union(i, j)
+            bucket.append(i)
+    
+    groups: Dict[int, List[int]] = defaultdict(list)
+    for i in range(len(texts)):
+        groups[find(i)].append(i)
+    return [g for g in groups.values() if len(g) > 1]
+
+
+def deduplicate_news(news_data: Dict) -> Dict:
+    """
+    Collapse near-duplicate posts across all channels.
+    
+    The most viewed copy of each story is kept (longest text breaks ties).
+    It gets ``sources`` (titles of every channel that posted it),
+    ``duplicates`` (number of dropped copies) and combined ``views``,
+    ``forwards`` and ``reactions``.
+    
+    Args:
+        news_data: Output from aggregate_news()
+    
+    Returns:
+        The same dict with duplicates removed, ``total_messages`` updated
+        and ``duplicates_removed`` set
+    """
+    entries = []  # (channel_username, message)
+    for channel_username, data in news_data['channels'].items():
+        for msg in data['messages']:
+            entries.append((channel_username, msg))
+    
+    removed = set()
+    for group in find_duplicate_groups([msg['text'] for _, msg in entries]):
+        members = [entries[i] for i in group]
+        _, keep = max(
+            members,
+            key=lambda e: (e[1].get('views') or 0, len(e[1]['text']))
+        )
+        
+        sources = []
+        for channel_username, _ in members:
+            title = news_data['channels'][channel_username]['title']
+            if title not in sources:
+                sources.append(title)
+        
+        keep['sources'] = sources
+        keep['duplicates'] = len(members) - 1
+        for metric in ('views', 'forwards', 'reactions'):
+            keep[metric] = sum(msg.get(metric) or 0 for _, msg in members)
+        removed.update(id(msg) for _, msg in members if msg is not keep)
+    
+    if removed:
+        for data in news_data['channels'].values():
+            data['messages'] = [m for m in data['messages'] if id(m) not in removed]
+    
+    news_data['total_messages'] = sum(len(d['messages']) for d in news_data['channels'].values())
+    news_data['duplicates_removed'] = len(removed)
+    return news_data
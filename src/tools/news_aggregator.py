@@ -1,74 +1,277 @@
-"""Aggregate news from Telegram channels."""
-from typing import List, Dict
+"""Aggregate news from Telegram channels and RSS/Atom feeds."""
+from typing import List, Dict, Optional, Tuple
 from datetime import datetime
 import asyncio
 
+from src.llm.tokens import estimate_tokens, prompt_budget
 from src.telegram_client.channels import get_all_monitored_messages
+from src.feeds import get_feed_messages
+from .dedup import deduplicate_news
+from .normalizer import normalize_news
+from .ranking import select_messages
 
+# Tokens taken by the digest instructions around the news content
+# (the full digest prompt in summarizer.py is the longest one)
+DIGEST_TEMPLATE_TOKENS = 500
 
-async def aggregate_news(hours_back: int = 24) -> Dict[str, any]:
+
+async def aggregate_news(
+    hours_back: int = 24,
+    dedup: bool = True,
+    normalize: bool = True,
+    channels: Optional[List[str]] = None
+) -> Dict[str, any]:
     """
-    Aggregate news from all monitored Telegram channels.
+    Aggregate news from all monitored Telegram channels and feeds.
+    
+    Feed entries are read from the local store filled by feed polling and
+    appear under their feed URL next to the channels.
     
     Args:
         hours_back: How many hours back to fetch messages
+        channels: Only these monitored channels and feed URLs (default: all)
+        dedup: Collapse stories reposted by several channels into one item
+        normalize: Strip links, markup and channel boilerplate from posts
         
     Returns:
         Dict with aggregated news from all channels
     """
-    messages_by_channel = await get_all_monitored_messages(hours_back)
+    messages_by_channel = await get_all_monitored_messages(hours_back, channels)
+    messages_by_channel.update(await get_feed_messages(hours_back, channels))
     
     # Count total messages
     total_messages = sum(len(data['messages']) for data in messages_by_channel.values())
     
-    return {
+    news_data = {
         'channels': messages_by_channel,
         'total_messages': total_messages,
+        'collected_messages': total_messages,
+        'duplicates_removed': 0,
         'time_range_hours': hours_back,
         'collected_at': datetime.now().isoformat(),
     }
+    
+    if normalize and total_messages:
+        normalize_news(news_data)
+    if dedup and news_data['total_messages']:
+        deduplicate_news(news_data)
+    
+    return news_data
 
 
-def format_messages_for_llm(news_data: Dict, max_messages: int = 50, max_chars_per_message: int = 300) -> str:
+def format_message(msg: dict, max_chars: int = 300) -> str:
     """
-    Format aggregated news for LLM processing.
+    Format a single post as "[date] text" for LLM prompts.
+    
+    Args:
+        msg: Message dict from aggregate_news()
+        max_chars: Maximum characters of post text
+        
+    Returns:
+        Formatted post (with a sources line for merged duplicates)
+    """
+    # Format date
+    date_str = msg['date'].strftime('%d.%m %H:%M')
+    # Limit text length to avoid token limits
+    text = msg['text'][:max_chars]
+    if len(msg['text']) > max_chars:
+        text += "..."
+    line = f"[{date_str}] {text}"
+    if len(msg.get('sources', [])) > 1:
+        line += f"\nИсточники: {', '.join(msg['sources'])}"
+    return line
+
+
+def pack_messages(news_data: Dict, token_budget: int, max_chars_per_message: int = 300) -> Dict[str, List[dict]]:
+    """
+    Select posts that fit a prompt token budget.
+    
+    Posts are taken in priority order (see ranking.score_messages) and the
+    budget is shared fairly across channels.
     
     Args:
         news_data: Output from aggregate_news()
-        max_messages: Maximum number of messages to include (to avoid token limits)
+        token_budget: Tokens available for news content
         max_chars_per_message: Maximum characters per message
         
     Returns:
-        Formatted string ready for LLM
+        Dict channel_username -> selected posts, newest first
     """
-    if news_data['total_messages'] == 0:
-        return "Нет новых сообщений за указанный период."
-    
-    output = []
-    output.append(f"Собрано {news_data['total_messages']} сообщений за последние {news_data['time_range_hours']} часов:\n")
+    budget = token_budget - estimate_tokens(_header(news_data)) - estimate_tokens(_footer(0, 0))
+    return select_messages(
+        news_data,
+        budget,
+        cost=lambda msg: estimate_tokens(format_message(msg, max_chars_per_message)) + 1,
+        channel_cost=lambda title: estimate_tokens(f"\n### {title}\nСообщений: 000\n")
+    )
+
+
+def _header(news_data: Dict) -> str:
+    header = f"Собрано {news_data['total_messages']} сообщений за последние {news_data['time_range_hours']} часов"
+    if news_data.get('duplicates_removed'):
+        header += f" (объединено повторов: {news_data['duplicates_removed']})"
+    return header + ":\n"
+
+
+def _footer(shown: int, total: int) -> str:
+    return f"\n... (показаны {shown} самых важных сообщений из {total})"
+
+
+def render_messages(news_data: Dict, selected: Dict[str, List[dict]], max_chars_per_message: int = 300) -> str:
+    """
+    Render selected posts grouped by channel.
     
-    message_count = 0
+    Args:
+        news_data: Output from aggregate_news()
+        selected: Output from pack_messages() or ranking.select_messages()
+        max_chars_per_message: Maximum characters per message
+        
+    Returns:
+        Formatted string ready for LLM
+    """
+    output = [_header(news_data)]
+    shown = 0
     
     for channel_username, data in news_data['channels'].items():
-        if not data['messages'] or message_count >= max_messages:
+        messages = selected.get(channel_username)
+        if not messages:
             continue
         
         output.append(f"\n### {data['title']}")
         output.append(f"Сообщений: {len(data['messages'])}\n")
         
-        for msg in data['messages']:
-            if message_count >= max_messages:
-                output.append(f"\n... (показаны первые {max_messages} сообщений из {news_data['total_messages']})")
+        for msg in messages:
+            output.append(format_message(msg, max_chars_per_message))
+            output.append("")  # Empty line
+            shown += 1
+    
+    if shown < news_data['total_messages']:
+        output.append(_footer(shown, news_data['total_messages']))
+    
+    return "\n".join(output)
+
+
+def _topic_header(number: int, topic: Dict) -> str:
+    channels = ", ".join(topic['channels'][:5])
+    if len(topic['channels']) > 5:
+        channels += f" и еще {len(topic['channels']) - 5}"
+    return f"\n### Тема {number}: {topic['label']}\nСообщений: {len(topic['messages'])}; каналы: {channels}\n"
+
+
+def _format_representative(title: str, msg: dict, max_chars: int) -> str:
+    line = format_message(msg, max_chars)
+    if len(msg.get('sources', [])) <= 1:
+        line += f"\nИсточник: {title}"
+    return line
+
+
+def pack_topics(
+    news_data: Dict,
+    topics: List[Dict],
+    token_budget: int,
+    max_chars_per_message: int = 300
+) -> List[Tuple[Dict, List[Tuple[str, dict]]]]:
+    """
+    Select topics and their representative posts that fit a prompt token budget.
+    
+    Topics are taken from the most important down; each needs room for at
+    least one representative, further ones are added while they fit.
+    
+    Args:
+        news_data: Output from aggregate_news()
+        topics: Output from clustering.cluster_news()
+        token_budget: Tokens available for news content
+        max_chars_per_message: Maximum characters per message
+        
+    Returns:
+        List of (topic, representatives) pairs in importance order
+    """
+    remaining = token_budget - estimate_tokens(_header(news_data)) - estimate_tokens(_footer(0, 0))
+    packed = []
+    for topic in topics:
+        header_cost = estimate_tokens(_topic_header(len(packed) + 1, topic))
+        costs = [
+            estimate_tokens(_format_representative(title, msg, max_chars_per_message)) + 1
+            for title, msg in topic['representatives']
+        ]
+        if header_cost + costs[0] > remaining:
+            continue
+        
+        remaining -= header_cost
+        reps = []
+        for rep, cost in zip(topic['representatives'], costs):
+            if cost > remaining:
                 break
-            
-            # Format date
-            date_str = msg['date'].strftime('%d.%m %H:%M')
-            # Limit text length to avoid token limits
-            text = msg['text'][:max_chars_per_message]
-            if len(msg['text']) > max_chars_per_message:
-                text += "..."
-            output.append(f"[{date_str}] {text}")
+            reps.append(rep)
+            remaining -= cost
+        packed.append((topic, reps))
+    return packed
+
+
+def render_topics(
+    news_data: Dict,
+    packed: List[Tuple[Dict, List[Tuple[str, dict]]]],
+    total_topics: int,
+    max_chars_per_message: int = 300
+) -> str:
+    """
+    Render topics with their representative posts.
+    
+    Args:
+        news_data: Output from aggregate_news()
+        packed: Output from pack_topics()
+        total_topics: Number of topics found (to note omitted ones)
+        max_chars_per_message: Maximum characters per message
+        
+    Returns:
+        Formatted string ready for LLM
+    """
+    output = [_header(news_data)]
+    for number, (topic, reps) in enumerate(packed, 1):
+        output.append(_topic_header(number, topic))
+        for title, msg in reps:
+            output.append(_format_representative(title, msg, max_chars_per_message))
             output.append("")  # Empty line
-            message_count += 1
+    
+    if len(packed) < total_topics:
+        output.append(f"\n... (показаны {len(packed)} самых важных тем из {total_topics})")
     
     return "\n".join(output)
+
+
+def format_messages_for_llm(
+    news_data: Dict,
+    max_messages: Optional[int] = None,
+    max_chars_per_message: int = 300,
+    token_budget: Optional[int] = None
+) -> str:
+    """
+    Format aggregated news for LLM processing.
+    
+    By default the content is packed into the token budget of a digest
+    prompt in one pass. Passing only ``max_messages`` selects by post count.
+    
+    Args:
+        news_data: Output from aggregate_news()
+        max_messages: Maximum number of messages to include (count budget)
+        max_chars_per_message: Maximum characters per message
+        token_budget: Tokens available for the content (default: digest prompt budget)
+        
+    Returns:
+        Formatted string ready for LLM
+    """
+    if news_data['total_messages'] == 0:
+        return "Нет новых сообщений за указанный период."
+    
+    if max_messages is not None and token_budget is None:
+        selected = select_messages(news_data, max_messages)
+    else:
+        if token_budget is None:
+            token_budget = prompt_budget(reserved_tokens=DIGEST_TEMPLATE_TOKENS)
+        selected = pack_messages(news_data, token_budget, max_chars_per_message)
+        if max_messages is not None and sum(len(m) for m in selected.values()) > max_messages:
+            top = sorted((m for msgs in selected.values() for m in msgs), key=lambda m: m['score'], reverse=True)
+            keep = {id(m) for m in top[:max_messages]}
+            selected = {ch: [m for m in msgs if id(m) in keep] for ch, msgs in selected.items()}
+    
+    return render_messages(news_data, selected, max_chars_per_message)
@@ -0,0 +1,161 @@
+"""Text normalization of channel posts before they reach the LLM."""
+import re
+from collections import Counter, OrderedDict, defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Set
+
+from src.llm.tokens import estimate_tokens
+
+# A trailing line is a signature when it repeats verbatim in this share of a channel's posts
+BOILERPLATE_MIN_SHARE = 0.3
+BOILERPLATE_MIN_POSTS = 3
+# Trailing lines of a post checked for signatures
+SIGNATURE_LINES = 2
+# Lines longer than this are never treated as footers or signatures
+MAX_FOOTER_LINE_CHARS = 150
+# Learned signatures kept per channel between runs; each expires when not
+# seen repeating again within SIGNATURE_TTL
+MAX_LEARNED_PER_CHANNEL = 50
+SIGNATURE_TTL = timedelta(days=7)
+
+_MD_LINK_RE = re.compile(r"\[([^\]]*)\]\((?:[^()\s]|\([^()\s]*\))+\)")
+_URL_RE = re.compile(r"(?:https?://|www\.|t\.me/)\S+", re.IGNORECASE)
+_MD_MARKUP_RE = re.compile(r"(\*\*|__|~~|`{1,3}|\|\|)")
+_TRAILING_HASHTAGS_RE = re.compile(r"(?:\s*#\w+)+\s*$")
+_HASHTAG_RE = re.compile(r"#(\w+)")
+_EMOJI = "\U0001F000-\U0001FAFF\u2600-\u27BF\u2B00-\u2BFF\uFE0F\u200D"
+_EMOJI_RUN_RE = re.compile(f"([{_EMOJI}])[{_EMOJI}\\s]*[{_EMOJI}]")
+_FOOTER_RE = re.compile(
+    r"подпис(аться|ывайтесь|ка)|subscribe|наш канал|присоединяйтесь|читайте нас|"
+    r"поддержать канал|предложить новость|прислать новость|erid|^реклама\b",
+    re.IGNORECASE
+)
+_SPACES_RE = re.compile("[ \t\u00A0]+")
+_BLANK_LINES_RE = re.compile(r"\n{3,}")
+
+# channel_username -> signature key -> when it last repeated (oldest first)
+_learned: Dict[str, "OrderedDict[str, datetime]"] = defaultdict(OrderedDict)
+
+
+def strip_markup(text: str) -> str:
+    """
+    Remove links, URLs, markdown, trailing hashtag runs and emoji runs.
+    
+    Args:
+        text: Raw post text (Telethon markdown)
+    
+    Returns:
+        Cleaned text
+    """
+    text = _MD_LINK_RE.sub(r"\1", text)
+    text = _URL_RE.sub("", text)
+    text = _MD_MARKUP_RE.sub("", text)
+    text = _EMOJI_RUN_RE.sub(r"\1", text)
+    text = _SPACES_RE.sub(" ", text)
+    lines = [line.strip() for line in text.split("\n")]
+    text = "\n".join(line for line in lines if not (line and _is_footer(line)))
+    text = _TRAILING_HASHTAGS_RE.sub("", text.strip())
+    text = _HASHTAG_RE.sub(r"\1", text)
+    return _BLANK_LINES_RE.sub("\n\n", text).strip()
+
+
+def _is_footer(line: str) -> bool:
+    return len(line) <= MAX_FOOTER_LINE_CHARS and bool(_FOOTER_RE.search(line))
+
+
+def _signature_key(line: str) -> str:
+    """Line key that only ignores case and spacing (digits and links are content)."""
+    return " ".join(line.lower().split())
+
+
+def learn_boilerplate(channel_username: str, texts: List[str], now: Optional[datetime] = None) -> Set[str]:
+    """
+    Learn signatures of a channel: trailing lines repeated verbatim.
+    
+    Only the last lines are looked at, since headers often carry the news
+    itself ("Курс доллара 92,5 руб"), and a line must repeat exactly, so
+    lines that differ in numbers or links stay. A signature is kept while
+    it keeps repeating and expires SIGNATURE_TTL after it was last seen
+    above the threshold.
+    
+    Args:
+        channel_username: Channel the posts come from
+        texts: Markup-stripped post texts
+        now: Current time (default: now, UTC)
+    
+    Returns:
+        Signature keys known for the channel (learned now or earlier)
+    """
+    now = now or datetime.now(timezone.utc)
+    tails = Counter()
+    for text in texts:
+        lines = [line for line in text.split("\n") if line.strip()]
+        # The first line is never a signature, even in short posts
+        tails.update({
+            _signature_key(line)
+            for line in lines[max(1, len(lines) - SIGNATURE_LINES):]
+            if len(line) <= MAX_FOOTER_LINE_CHARS
+        })
+    
+    learned = _learned[channel_username]
+    threshold = max(BOILERPLATE_MIN_POSTS, BOILERPLATE_MIN_SHARE * len(texts))
+    for key, count in tails.items():
+        if count >= threshold:
+            learned[key] = now
+            learned.move_to_end(key)
+    while learned and (len(learned) > MAX_LEARNED_PER_CHANNEL or now - next(iter(learned.values())) > SIGNATURE_TTL):
+        learned.popitem(last=False)
+    return set(learned)
+
+
+def strip_boilerplate(text: str, signatures: Set[str]) -> str:
+    """
+    Drop trailing lines that match learned signatures.
+    
+    A post made only of signature lines is returned unchanged.
+    """
+    lines = text.split("\n")
+    while lines and (not lines[-1].strip() or _signature_key(lines[-1]) in signatures):
+        lines.pop()
+    stripped = "\n".join(lines).strip()
+    return stripped or text
+
+
+def normalize_news(news_data: Dict) -> Dict:
+    """
+    Normalize every post in place and report the token savings.
+    
+    Posts left without text (e.g. a bare link) are dropped.
+    
+    Args:
+        news_data: Output from aggregate_news()
+    
+    Returns:
+        The same dict with ``normalization`` stats (tokens_before,
+        tokens_after, tokens_saved) and ``total_messages`` updated
+    """
+    tokens_before = 0
+    tokens_after = 0
+    
+    for channel_username, data in news_data['channels'].items():
+        cleaned = [strip_markup(msg['text']) for msg in data['messages']]
+        signatures = learn_boilerplate(channel_username, cleaned)
+        
+        kept = []
+        for msg, text in zip(data['messages'], cleaned):
+            tokens_before += estimate_tokens(msg['text'])
+            text = strip_boilerplate(text, signatures)
+            if not text:
+                continue
+            msg['text'] = text
+            tokens_after += estimate_tokens(text)
+            kept.append(msg)
+        data['messages'] = kept
+    
+    news_data['total_messages'] = sum(len(d['messages']) for d in news_data['channels'].values())
+    news_data['normalization'] = {
+        'tokens_before': tokens_before,
+        'tokens_after': tokens_after,
+        'tokens_saved': tokens_before - tokens_after,
+    }
+    return news_data
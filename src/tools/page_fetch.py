@@ -0,0 +1,231 @@
+"""Fetching web pages and extracting their main text (deep search)."""
+import asyncio
+import re
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+from bs4 import BeautifulSoup
+from sqlalchemy import select
+
+from src.config import (
+    PAGE_FETCH_CONCURRENCY,
+    PAGE_FETCH_TIMEOUT,
+    PAGE_MAX_BYTES,
+    PAGE_TEXT_MAX_CHARS,
+    PAGE_EXTRACT_WORKERS,
+    PAGE_CACHE_FRESH_MINUTES,
+)
+from src.database import get_session, PageCache
+from src.database.compression import compress_text
+from src.singleflight import single_flight
+
+USER_AGENT = "Mozilla/5.0 (compatible; JarvisBot/1.0)"
+HTML_TYPES = ("text/html", "application/xhtml+xml", "text/plain")
+# Page chrome that never holds the main text
+NOISE_TAGS = ["script", "style", "noscript", "template", "svg", "iframe", "form",
+              "nav", "header", "footer", "aside", "button"]
+TEXT_TAGS = ["h1", "h2", "h3", "h4", "p", "li", "blockquote", "pre", "td"]
+# Blocks shorter than this are menus, captions and buttons
+MIN_BLOCK_CHARS = 40
+
+
+def extract_main_text(html: bytes, max_chars: int = PAGE_TEXT_MAX_CHARS) -> str:
+    """
+    Extract readable main text from an HTML page (CPU-bound, run in a worker).
+    
+    Scripts, navigation and other chrome are dropped; text is taken from
+    <article> or <main> when the page has one, otherwise from <body>.
+    
+    Args:
+        html: Raw page bytes (encoding is detected from the markup)
+        max_chars: Maximum length of the result
+    
+    Returns:
+        Paragraphs separated by blank lines
+    """
+    soup = BeautifulSoup(html, "html.parser")
+    for tag in soup(NOISE_TAGS):
+        tag.decompose()
+    
+    root = soup.find("article") or soup.find("main") or soup.body or soup
+    blocks = []
+    size = 0
+    for node in root.find_all(TEXT_TAGS):
+        # Nested blocks (p inside li/td) are taken once, from the innermost tag
+        if node.find(TEXT_TAGS):
+            continue
+        block = re.sub(r"\s+", " ", node.get_text(" ", strip=True))
+        if len(block) < MIN_BLOCK_CHARS and not node.name.startswith("h"):
+            continue
+        blocks.append(block)
+        size += len(block) + 2
+        if size >= max_chars:
+            break
+    
+    if not blocks:
+        # Pages without block markup: fall back to all visible text
+        blocks = [re.sub(r"\s+", " ", root.get_text(" ", strip=True))]
+    return "\n\n".join(blocks)[:max_chars]
+
+
+class PageFetcher:
+    """
+    Concurrent page fetching with a bounded HTTP pool and a validated cache.
+    
+    One httpx client (keep-alive connections) serves all fetches; at most
+    ``concurrency`` pages download at once, each with a timeout and a size
+    cap. HTML is parsed in a small thread pool so the event loop stays free.
+    Extracted text is cached by URL: within PAGE_CACHE_FRESH_MINUTES it is
+    used as is, after that the page is revalidated with If-None-Match /
+    If-Modified-Since and a 304 reuses the stored text.
+    """
+    
+    def __init__(self, concurrency: int = PAGE_FETCH_CONCURRENCY):
+        self.concurrency = concurrency
+        self._client: Optional[httpx.AsyncClient] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._workers = ThreadPoolExecutor(max_workers=PAGE_EXTRACT_WORKERS, thread_name_prefix="page-extract")
+        self.stats = {'fresh_hits': 0, 'revalidated': 0, 'fetched': 0, 'failed': 0}
+    
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(PAGE_FETCH_TIMEOUT),
+                limits=httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency),
+                headers={"User-Agent": USER_AGENT, "Accept": "text/html,application/xhtml+xml;q=0.9,*/*;q=0.5"},
+                follow_redirects=True,
+            )
+            self._slots = asyncio.Semaphore(self.concurrency)
+        return self._client
+    
+    async def _get(self, url: str, headers: Dict[str, str]) -> Tuple[int, Optional[bytes], httpx.Headers]:
+        async with self._get_client().stream("GET", url, headers=headers) as response:
+            if response.status_code != 200:
+                return response.status_code, None, response.headers
+            content_type = response.headers.get("content-type", "").split(";")[0].strip().lower()
+            if content_type and content_type not in HTML_TYPES:
+                return 415, None, response.headers
+            
+            chunks = []
+            size = 0
+            async for chunk in response.aiter_bytes():
+                chunks.append(chunk)
+                size += len(chunk)
+                if size >= PAGE_MAX_BYTES:
+                    # Keep the beginning: the main text is rarely at the very end
+                    break
+            return 200, b"".join(chunks)[:PAGE_MAX_BYTES], response.headers
+    
+    async def _download(self, url: str, cached: Optional[PageCache]) -> Tuple[int, Optional[bytes], httpx.Headers]:
+        """GET a page (conditionally when cached), reading at most PAGE_MAX_BYTES."""
+        headers = {}
+        if cached is not None:
+            if cached.etag:
+                headers["If-None-Match"] = cached.etag
+            if cached.last_modified:
+                headers["If-Modified-Since"] = cached.last_modified
+        
+        self._get_client()
+        async with self._slots:
+            # The client timeout applies per read; this one bounds the whole download
+            return await asyncio.wait_for(self._get(url, headers), PAGE_FETCH_TIMEOUT)
+    
+    @staticmethod
+    async def _load(url: str) -> Optional[PageCache]:
+        async with get_session() as db:
+            return await db.scalar(select(PageCache).where(PageCache.url == url))
+    
+    @staticmethod
+    async def _store(url: str, text: Optional[str], headers: Optional[httpx.Headers], now: datetime):
+        """Save fetched text and validators, or only mark a revalidated row as checked."""
+        async with get_session() as db:
+            row = await db.scalar(select(PageCache).where(PageCache.url == url))
+            if row is None:
+                row = PageCache(url=url)
+                db.add(row)
+            if text is not None:
+                row.content_compressed = compress_text(text)
+            if headers is not None:
+                row.etag = headers.get("etag") or row.etag
+                row.last_modified = headers.get("last-modified") or row.last_modified
+            row.checked_at = now
+            await db.commit()
+    
+    async def _page_text(self, url: str) -> Optional[str]:
+        now = datetime.now(timezone.utc)
+        cached = await self._load(url)
+        if cached is not None:
+            checked = cached.checked_at if cached.checked_at.tzinfo else cached.checked_at.replace(tzinfo=timezone.utc)
+            if now - checked < timedelta(minutes=PAGE_CACHE_FRESH_MINUTES):
+                self.stats['fresh_hits'] += 1
+                return cached.body
+        
+        try:
+            status, html, headers = await self._download(url, cached)
+        except (httpx.HTTPError, asyncio.TimeoutError) as e:
+            print(f"Page fetch error {url}: {e}")
+            self.stats['failed'] += 1
+            # A stale copy is better than nothing
+            return cached.body if cached is not None else None
+        
+        if status == 304 and cached is not None:
+            self.stats['revalidated'] += 1
+            await self._store(url, None, headers, now)
+            return cached.body
+        if html is None:
+            self.stats['failed'] += 1
+            return None
+        
+        loop = asyncio.get_running_loop()
+        text = await loop.run_in_executor(self._workers, extract_main_text, html, PAGE_TEXT_MAX_CHARS)
+        self.stats['fetched'] += 1
+        if text:
+            await self._store(url, text, headers, now)
+        return text or None
+    
+    async def fetch_text(self, url: str) -> Optional[str]:
+        """
+        Main text of a page, from the cache when it is still valid.
+        
+        Returns:
+            Extracted text, or None if the page could not be fetched
+        """
+        if not url.startswith(("http://", "https://")):
+            return None
+        return await single_flight(('page', url), lambda: self._page_text(url))
+    
+    async def fetch_many(self, urls: List[str]) -> Dict[str, Optional[str]]:
+        """Fetch several pages concurrently; failed pages map to None."""
+        texts = await asyncio.gather(*(self.fetch_text(url) for url in urls), return_exceptions=True)
+        return {
+            url: None if isinstance(text, BaseException) else text
+            for url, text in zip(urls, texts)
+        }
+    
+    async def close(self):
+        """Close pooled connections and stop extraction workers."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        self._workers.shutdown(wait=False)
+
+
+_page_fetcher: Optional[PageFetcher] = None
+
+
+def get_page_fetcher() -> PageFetcher:
+    """Get or create the shared PageFetcher."""
+    global _page_fetcher
+    if _page_fetcher is None:
+        _page_fetcher = PageFetcher()
+    return _page_fetcher
+
+
+async def close_page_fetcher():
+    """Close the shared PageFetcher, if it was used."""
+    global _page_fetcher
+    if _page_fetcher is not None:
+        await _page_fetcher.close()
+        _page_fetcher = None
@@ -0,0 +1,154 @@
+"""Engagement-based importance ranking of news posts."""
+import math
+from datetime import datetime, timezone
+from statistics import median
+from typing import Callable, Dict, List, Optional
+
+# Relative weight of each engagement signal (forwards and reactions are rarer, so stronger)
+ENGAGEMENT_WEIGHTS = {'views': 1.0, 'forwards': 2.0, 'reactions': 1.5}
+# Score halves every RECENCY_HALF_LIFE_HOURS hours
+RECENCY_HALF_LIFE_HOURS = 6.0
+# Extra weight per additional channel that reposted the story (see dedup.py)
+DUPLICATE_BOOST = 0.5
+# Engagement is compared to the channel baseline in log space and clamped
+MAX_LOG_RATIO = 3.0
+
+
+def score_messages(news_data: Dict, now: Optional[datetime] = None) -> Dict:
+    """
+    Score every post by engagement relative to its channel and by recency.
+    
+    Each metric is compared to the channel's median in log space, so a post
+    with twice the usual views of a small channel ranks like one with twice
+    the usual views of a big one. Scores are stored in ``msg['score']``.
+    
+    Args:
+        news_data: Output from aggregate_news()
+        now: Reference time for recency (default: current UTC time)
+    
+    Returns:
+        The same dict (messages updated in place)
+    """
+    now = now or datetime.now(timezone.utc)
+    total_weight = sum(ENGAGEMENT_WEIGHTS.values())
+    decay = math.log(2) / RECENCY_HALF_LIFE_HOURS
+    
+    for data in news_data['channels'].values():
+        messages = data['messages']
+        if not messages:
+            continue
+        
+        logs = {
+            metric: [math.log1p(msg.get(metric) or 0) for msg in messages]
+            for metric in ENGAGEMENT_WEIGHTS
+        }
+        baselines = {metric: median(values) for metric, values in logs.items()}
+        
+        for i, msg in enumerate(messages):
+            engagement = sum(
+                weight * (logs[metric][i] - baselines[metric])
+                for metric, weight in ENGAGEMENT_WEIGHTS.items()
+            ) / total_weight
+            engagement = max(-MAX_LOG_RATIO, min(MAX_LOG_RATIO, engagement))
+            
+            age_hours = max((now - msg['date']).total_seconds() / 3600, 0.0)
+            msg['score'] = (
+                math.exp(engagement)
+                * math.exp(-decay * age_hours)
+                * (1 + DUPLICATE_BOOST * (msg.get('duplicates') or 0))
+            )
+    
+    return news_data
+
+
+def _fair_allowances(demands: Dict[str, int], budget: int) -> Dict[str, float]:
+    """
+    Split a budget across channels by water-filling.
+    
+    Channels that need less than an equal share get what they need; the
+    rest of the budget is shared equally among the others.
+    """
+    allowances: Dict[str, float] = {}
+    remaining = float(budget)
+    pending = dict(demands)
+    while pending:
+        share = remaining / len(pending)
+        satisfied = {ch: d for ch, d in pending.items() if d <= share}
+        if not satisfied:
+            allowances.update((ch, share) for ch in pending)
+            break
+        for ch, demand in satisfied.items():
+            allowances[ch] = demand
+            remaining -= demand
+            del pending[ch]
+    return allowances
+
+
+def select_messages(
+    news_data: Dict,
+    budget: int,
+    cost: Callable[[dict], int] = lambda msg: 1,
+    channel_cost: Callable[[str], int] = lambda title: 0
+) -> Dict[str, List[dict]]:
+    """
+    Pick the most important posts under a fixed budget with per-channel fairness.
+    
+    The budget is split across channels by water-filling, each channel
+    fills its part with its best posts, and whatever is left goes to the
+    highest scores overall. With the default costs the budget is a number
+    of posts; pass token costs to pack a prompt.
+    
+    Args:
+        news_data: Output from aggregate_news()
+        budget: Total budget (posts or tokens)
+        cost: Cost of including a post
+        channel_cost: Cost of a channel section header (paid once per channel)
+    
+    Returns:
+        Dict channel_username -> selected posts, newest first
+    """
+    score_messages(news_data)
+    
+    ranked = {
+        channel_username: sorted(data['messages'], key=lambda m: m['score'], reverse=True)
+        for channel_username, data in news_data['channels'].items()
+        if data['messages']
+    }
+    if not ranked or budget <= 0:
+        return {}
+    
+    costs = {id(msg): cost(msg) for msgs in ranked.values() for msg in msgs}
+    headers = {ch: channel_cost(news_data['channels'][ch]['title']) for ch in ranked}
+    demands = {ch: headers[ch] + sum(costs[id(m)] for m in msgs) for ch, msgs in ranked.items()}
+    allowances = _fair_allowances(demands, budget)
+    
+    selected: Dict[str, List[dict]] = {}
+    picked = set()
+    used = 0
+    for channel_username, msgs in ranked.items():
+        spent = headers[channel_username]
+        for msg in msgs:
+            if spent + costs[id(msg)] > allowances[channel_username]:
+                continue
+            spent += costs[id(msg)]
+            selected.setdefault(channel_username, []).append(msg)
+            picked.add(id(msg))
+        if channel_username in selected:
+            used += spent
+    
+    # Hand out what fair shares left unused, best posts first
+    leftovers = sorted(
+        ((msg['score'], ch, msg) for ch, msgs in ranked.items() for msg in msgs if id(msg) not in picked),
+        key=lambda item: item[0],
+        reverse=True
+    )
+    for _, channel_username, msg in leftovers:
+        extra = costs[id(msg)] + (0 if channel_username in selected else headers[channel_username])
+        if used + extra <= budget:
+            selected.setdefault(channel_username, []).append(msg)
+            used += extra
+    
+    return {
+        channel_username: sorted(msgs, key=lambda m: m['date'], reverse=True)
+        for channel_username, msgs in selected.items()
+    }
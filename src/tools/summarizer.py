@@ -1,9 +1,28 @@
 """Create news digests using LLM."""
-from typing import Literal
-from datetime import datetime, timezone
+import asyncio
+import hashlib
+import re
+from typing import Dict, List, Literal, Optional, Tuple
+from datetime import datetime, timedelta, timezone
 
+from sqlalchemy import delete, select, update
+
+from src.config import (
+    DIGEST_MODE,
+    DIGEST_MAX_MESSAGES,
+    DIGEST_MAP_CONCURRENCY,
+    DIGEST_GROUP_BY,
+    DIGEST_BUCKET_HOURS,
+    DIGEST_CACHE_TTL_HOURS,
+    DIGEST_SECTIONS,
+)
 from src.llm import LLMClient
-from src.database import SessionLocal, NewsDigest
+from src.llm.tokens import estimate_tokens, prompt_budget, truncate_to_tokens
+from src.database import get_session, NewsDigest, PartialSummary, DigestSection
+from src.singleflight import single_flight
+from .news_aggregator import aggregate_news, format_message, pack_messages, render_messages, pack_topics, render_topics
+from .clustering import cluster_news
+from .ranking import score_messages
 
 
 BRIEF_DIGEST_PROMPT = """Ты - ассистент новостей. Создай КРАТКУЮ сводку новостей.
@@ -52,11 +71,85 @@ FULL_DIGEST_PROMPT = """Ты - ассистент новостей. Создай
 Подробная сводка:"""
 
 
-def create_digest(
+MAP_PROMPT = """Ты - ассистент новостей. Ниже часть новостной ленты из Telegram каналов.
+Выпиши ключевые факты и события из этих сообщений.
+
+Требования:
+- Один пункт - одно событие, 1-2 предложения
+- Сообщения об одном событии объединяй в один пункт
+- Сохраняй цифры, имена и названия
+- В конце пункта укажи канал-источник в скобках
+- Ничего не добавляй от себя
+- Сообщения разбиты на блоки с заголовками вида "### [N] Канал". Выпиши факты
+  каждого блока отдельно, под строкой "### [N]" с тем же номером, блоки не смешивай
+
+Сообщения:
+{news_content}
+
+Ключевые факты:"""
+
+
+MERGE_PROMPT = """Ты - ассистент новостей. Ниже несколько списков ключевых фактов из разных частей новостной ленты.
+Объедини их в один список.
+
+Требования:
+- Убери повторы, одинаковые события объедини в один пункт
+- Сохраняй цифры, имена, названия и источники в скобках
+- Ничего не добавляй от себя
+
+Списки:
+{news_content}
+
+Объединенный список фактов:"""
+
+
+SECTION_PROMPT = """Ты - ассистент новостей. Ниже сообщения Telegram каналов по одной теме: {label}
+Напиши подробный раздел сводки по этой теме.
+
+Требования:
+- 1-3 абзаца: что произошло, подробности, цифры, контекст
+- Если источники расходятся - укажи это
+- В конце перечисли источники
+- Ничего не добавляй от себя
+
+Сообщения:
+{news_content}
+
+Подробно:"""
+
+
+# Longest post text passed to the map stage
+MAP_MAX_CHARS_PER_MESSAGE = 1000
+# Longest post text in a single-prompt digest
+SINGLE_MAX_CHARS_PER_MESSAGE = 300
+# Posts kept per digest section for its detailed version
+SECTION_MAX_POSTS = 8
+SECTION_MAX_CHARS_PER_MESSAGE = 800
+# Block header in map prompts and responses: "### [N] ..."
+MAP_BLOCK_HEADER = re.compile(r"^\s*#{2,4}\s*\[(\d+)\][^\n]*$", re.MULTILINE)
+
+
+async def _save_digest(digest: str, digest_type: str, is_scheduled: bool, message_count: int) -> int:
+    """Store a generated digest in history and return its id."""
+    async with get_session() as db:
+        news_digest = NewsDigest(
+            digest_type=digest_type,
+            is_scheduled=is_scheduled,
+            content=digest,
+            message_count=message_count,
+            created_at=datetime.now(timezone.utc)
+        )
+        db.add(news_digest)
+        await db.commit()
+        return news_digest.id
+
+
+async def create_digest(
     news_content: str,
     digest_type: Literal['brief', 'full'],
     llm_client: LLMClient,
-    is_scheduled: bool = False
+    is_scheduled: bool = False,
+    save: bool = True
 ) -> str:
     """
     Create a news digest using LLM.
@@ -66,7 +159,8 @@ def create_digest(
         digest_type: 'brief' for краткая or 'full' for полная
         llm_client: LLM client instance
         is_scheduled: Whether this is a scheduled digest
-        
+        save: Store the digest in history
+    
     Returns:
         Generated digest text
     """
@@ -75,24 +169,546 @@ def create_digest(
     prompt = prompt_template.format(news_content=news_content)
     
     # Generate digest (without history for cleaner output)
-    digest = llm_client.call_without_history(prompt, temperature=0.3)
+    digest = await llm_client.acall_without_history(prompt, temperature=0.3)
     
-    # Save to database
-    db = SessionLocal()
-    try:
-        # Count messages (rough estimate)
+    # Save to database (message count is a rough estimate)
+    if save:
         message_count = news_content.count('[')  # Each message starts with [date]
+        await _save_digest(digest, digest_type, is_scheduled, message_count)
+    
+    return digest
+
+
+def _pack_chunks(blocks: List[str], budget: int) -> List[str]:
+    """Greedily pack text blocks into chunks of at most ``budget`` tokens."""
+    chunks = []
+    current: List[str] = []
+    current_tokens = 0
+    for block in blocks:
+        tokens = estimate_tokens(block)
+        if current and current_tokens + tokens > budget:
+            chunks.append("\n\n".join(current))
+            current, current_tokens = [], 0
+        if tokens > budget:
+            # A single oversized block is cut to fit
+            block = truncate_to_tokens(block, budget)
+            tokens = budget
+        current.append(block)
+        current_tokens += tokens
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+def _bucket_start(date: datetime) -> datetime:
+    """Start of the DIGEST_BUCKET_HOURS-long UTC bucket containing ``date`` (naive UTC)."""
+    size = DIGEST_BUCKET_HOURS * 3600
+    epoch = int(date.timestamp())
+    return datetime.fromtimestamp(epoch - epoch % size, tz=timezone.utc).replace(tzinfo=None)
+
+
+def build_map_units(news_data: Dict, max_messages: int = DIGEST_MAX_MESSAGES) -> List[Dict]:
+    """
+    Group posts into per-channel, per-time-bucket map units.
+    
+    Units are whole buckets so their post-id sets stay stable between
+    digests and their summaries can be cached. When the window holds more
+    than ``max_messages`` posts, the buckets with the highest total score
+    are kept.
+    
+    Args:
+        news_data: Output from aggregate_news()
+        max_messages: Maximum number of posts to summarize
+    
+    Returns:
+        List of units with keys: channel, title, bucket_start, messages,
+        post_ids, post_ids_hash
+    """
+    score_messages(news_data)
+    
+    units = []
+    for channel_username, data in news_data['channels'].items():
+        buckets: Dict[datetime, List[dict]] = {}
+        for msg in data['messages']:
+            buckets.setdefault(_bucket_start(msg['date']), []).append(msg)
         
-        news_digest = NewsDigest(
-            digest_type=digest_type,
-            is_scheduled=is_scheduled,
-            content=digest,
-            message_count=message_count,
-            created_at=datetime.now(timezone.utc)
+        for bucket_start, messages in buckets.items():
+            post_ids = ",".join(str(i) for i in sorted(msg['id'] for msg in messages))
+            units.append({
+                'channel': channel_username,
+                'title': data['title'],
+                'bucket_start': bucket_start,
+                'messages': sorted(messages, key=lambda m: m['date']),
+                'post_ids': post_ids,
+                'post_ids_hash': hashlib.sha1(post_ids.encode()).hexdigest(),
+            })
+    
+    if sum(len(u['messages']) for u in units) > max_messages:
+        units.sort(key=lambda u: sum(m['score'] for m in u['messages']), reverse=True)
+        kept, count = [], 0
+        for unit in units:
+            if count + len(unit['messages']) > max_messages and kept:
+                continue
+            kept.append(unit)
+            count += len(unit['messages'])
+        units = kept
+    
+    units.sort(key=lambda u: (u['channel'], u['bucket_start']))
+    return units
+
+
+def _format_unit(unit: Dict, budget: int) -> str:
+    """Format the posts of a map unit, shortening them so the unit fits into ``budget`` tokens."""
+    max_chars = MAP_MAX_CHARS_PER_MESSAGE
+    while True:
+        content = "\n\n".join(format_message(msg, max_chars) for msg in unit['messages'])
+        if estimate_tokens(content) <= budget or max_chars <= 50:
+            return truncate_to_tokens(content, budget)
+        max_chars //= 2
+
+
+def _pack_units(units: List[Dict], budget: int) -> List[List[Tuple[Dict, str]]]:
+    """
+    Greedily pack map units into prompts of at most ``budget`` tokens.
+    
+    Returns:
+        Packs of (unit, formatted block) pairs; blocks carry a "### [N]"
+        header numbered within their pack
+    """
+    packs: List[List[Tuple[Dict, str]]] = []
+    current: List[Tuple[Dict, str]] = []
+    current_tokens = 0
+    for unit in units:
+        header = f"### [{len(current) + 1}] {unit['title']}"
+        body = _format_unit(unit, budget - estimate_tokens(header) - 8)
+        tokens = estimate_tokens(header) + estimate_tokens(body) + 2
+        if current and current_tokens + tokens > budget:
+            packs.append(current)
+            current, current_tokens = [], 0
+            header = f"### [1] {unit['title']}"
+        current.append((unit, f"{header}\n{body}"))
+        current_tokens += tokens
+    if current:
+        packs.append(current)
+    return packs
+
+
+def _split_pack_summary(summary: str, count: int) -> Dict[int, str]:
+    """Split a map response into per-block facts by its "### [N]" headers."""
+    sections = {}
+    matches = list(MAP_BLOCK_HEADER.finditer(summary))
+    for match, following in zip(matches, matches[1:] + [None]):
+        number = int(match.group(1))
+        end = following.start() if following else len(summary)
+        text = summary[match.end():end].strip()
+        if 1 <= number <= count and text:
+            sections[number] = text
+    return sections
+
+
+async def _load_cached_summaries(units: List[Dict]) -> Dict[tuple, str]:
+    """
+    Fetch cached summaries that cover every post of their unit.
+    
+    Besides exact post-id matches a summary is reused when the unit's posts
+    are a subset of the cached ones: deduplication may keep another copy of
+    a repost or drop one, which changes the id set but not the facts.
+    """
+    if not units:
+        return {}
+    
+    async with get_session() as db:
+        rows = await db.scalars(
+            select(PartialSummary).where(
+                PartialSummary.channel_username.in_({u['channel'] for u in units}),
+                PartialSummary.bucket_start >= min(u['bucket_start'] for u in units)
+            )
         )
-        db.add(news_digest)
-        db.commit()
-    finally:
-        db.close()
+        cached = {(row.channel_username, row.bucket_start): row for row in rows}
+    
+    hits = {}
+    for unit in units:
+        key = (unit['channel'], unit['bucket_start'])
+        row = cached.get(key)
+        if row is None:
+            continue
+        if row.post_ids_hash == unit['post_ids_hash'] or set(unit['post_ids'].split(",")) <= set(row.post_ids.split(",")):
+            hits[key] = row.summary
+    return hits
+
+
+async def _store_summaries(items: List[tuple]):
+    """Upsert (unit, summary) pairs into the cache and drop expired entries."""
+    now = datetime.now(timezone.utc)
+    async with get_session() as db:
+        for unit, summary in items:
+            row = await db.scalar(
+                select(PartialSummary).where(
+                    PartialSummary.channel_username == unit['channel'],
+                    PartialSummary.bucket_start == unit['bucket_start']
+                )
+            )
+            if row is None:
+                row = PartialSummary(channel_username=unit['channel'], bucket_start=unit['bucket_start'])
+                db.add(row)
+            row.post_ids = unit['post_ids']
+            row.post_ids_hash = unit['post_ids_hash']
+            row.summary = summary
+            row.created_at = now
+        
+        expired_before = (now - timedelta(hours=DIGEST_CACHE_TTL_HOURS)).replace(tzinfo=None)
+        await db.execute(delete(PartialSummary).where(PartialSummary.bucket_start < expired_before))
+        await db.commit()
+
+
+async def summarize_units(units: List[Dict], llm_client: LLMClient) -> List[str]:
+    """
+    Map stage: summarize every unit, reusing cached summaries where the posts are unchanged.
+    
+    Units that are not cached are packed together into prompts filled up to
+    the token budget, so the number of LLM calls follows the amount of new
+    text rather than the number of channel buckets. The model answers per
+    block and each block's facts are cached for its unit; a response that
+    cannot be split back is used as is and not cached.
+    
+    Args:
+        units: Output from build_map_units()
+        llm_client: LLM client instance
+    
+    Returns:
+        Partial summaries in unit order (failed units are skipped)
+    """
+    cached = await _load_cached_summaries(units)
+    missing = [u for u in units if (u['channel'], u['bucket_start']) not in cached]
+    
+    packs = _pack_units(missing, prompt_budget(MAP_PROMPT))
+    results = await _run_prompts(MAP_PROMPT, ["\n\n".join(block for _, block in pack) for pack in packs], llm_client)
+    fresh = []
+    unsplit = []
+    for pack, summary in zip(packs, results):
+        if summary is None:
+            continue
+        sections = _split_pack_summary(summary, len(pack))
+        if len(sections) == len(pack):
+            fresh.extend((unit, sections[number]) for number, (unit, _) in enumerate(pack, 1))
+        else:
+            unsplit.append((pack, MAP_BLOCK_HEADER.sub("", summary).strip()))
+    if fresh:
+        await _store_summaries(fresh)
+    failed = sum(len(pack) for pack, summary in zip(packs, results) if summary is None)
+    print(f"Digest map stage: {len(units) - len(missing)} cached, {len(missing) - failed} generated "
+          f"in {len(packs)} calls ({sum(len(p) for p, _ in unsplit)} not cacheable), {failed} failed")
+    
+    summaries = dict(cached)
+    summaries.update(((u['channel'], u['bucket_start']), summary) for u, summary in fresh)
+    
+    partials = []
+    for unit in units:
+        summary = summaries.get((unit['channel'], unit['bucket_start']))
+        if summary:
+            start = unit['bucket_start'].replace(tzinfo=timezone.utc).astimezone()
+            partials.append(f"### {unit['title']} ({start.strftime('%d.%m %H:%M')})\n{summary}")
+    for pack, summary in unsplit:
+        titles = ", ".join(dict.fromkeys(unit['title'] for unit, _ in pack))
+        partials.append(f"### {titles}\n{summary}")
+    if not partials:
+        raise Exception("LLM request failed for all digest chunks")
+    return partials
+
+
+async def _run_prompts(template: str, contents: List[str], llm_client: LLMClient) -> List[Optional[str]]:
+    """Run ``template`` over every content chunk with bounded parallelism (None for failures)."""
+    semaphore = asyncio.Semaphore(DIGEST_MAP_CONCURRENCY)
+    
+    async def run(content: str) -> str:
+        async with semaphore:
+            return await llm_client.acall_without_history(
+                template.format(news_content=content),
+                temperature=0.2
+            )
     
+    results = await asyncio.gather(*(run(c) for c in contents), return_exceptions=True)
+    outputs = []
+    for result in results:
+        if isinstance(result, Exception):
+            print(f"Digest chunk failed: {result}")
+            outputs.append(None)
+        else:
+            outputs.append(result)
+    return outputs
+
+
+async def reduce_partials(partials: List[str], llm_client: LLMClient) -> List[str]:
+    """
+    Merge partial summaries until they fit into a single digest prompt.
+    
+    Args:
+        partials: Partial summaries (lists of facts)
+        llm_client: LLM client instance
+    
+    Returns:
+        Partial summaries whose combined size fits the final prompt
+    """
+    final_budget = prompt_budget(FULL_DIGEST_PROMPT)
+    merge_budget = prompt_budget(MERGE_PROMPT)
+    
+    while len(partials) > 1 and estimate_tokens("\n\n".join(partials)) > final_budget:
+        groups = _pack_chunks(partials, merge_budget)
+        if len(groups) >= len(partials):
+            # Every partial fills a prompt on its own, merging cannot shrink them further
+            break
+        merged = await _run_prompts(MERGE_PROMPT, groups, llm_client)
+        partials = [m if m is not None else g for m, g in zip(merged, groups)]
+    
+    return partials
+
+
+async def create_digest_map_reduce(
+    news_data: Dict,
+    digest_type: Literal['brief', 'full'],
+    llm_client: LLMClient,
+    is_scheduled: bool = False,
+    max_messages: int = DIGEST_MAX_MESSAGES,
+    save: bool = True
+) -> str:
+    """
+    Create a news digest in map-reduce mode.
+    
+    Map: per-channel, per-time-bucket groups of posts are packed into
+    budget-sized prompts and summarized into lists of facts in parallel;
+    summaries of buckets whose posts did not change since an earlier digest
+    are taken from the cache.
+    Reduce: the lists are merged (hierarchically if needed) and turned into
+    the final brief or full digest.
+    
+    Args:
+        news_data: Output from aggregate_news()
+        digest_type: 'brief' for краткая or 'full' for полная
+        llm_client: LLM client instance
+        is_scheduled: Whether this is a scheduled digest
+        max_messages: Maximum number of posts to summarize
+        save: Store the digest in history
+    
+    Returns:
+        Generated digest text
+    """
+    units = build_map_units(news_data, max_messages)
+    partials = await summarize_units(units, llm_client)
+    partials = await reduce_partials(partials, llm_client)
+    
+    prompt_template = FULL_DIGEST_PROMPT if digest_type == 'full' else BRIEF_DIGEST_PROMPT
+    news_content = truncate_to_tokens("\n\n".join(partials), prompt_budget(prompt_template))
+    digest = await llm_client.acall_without_history(
+        prompt_template.format(news_content=news_content),
+        temperature=0.3
+    )
+    
+    if save:
+        message_count = sum(len(u['messages']) for u in units)
+        await _save_digest(digest, digest_type, is_scheduled, message_count)
     return digest
+
+
+async def generate_digest(
+    news_data: Dict,
+    digest_type: Literal['brief', 'full'],
+    llm_client: LLMClient,
+    is_scheduled: bool = False,
+    mode: str = DIGEST_MODE,
+    group_by: str = DIGEST_GROUP_BY,
+    save: bool = True
+) -> str:
+    """
+    Create a digest from aggregated news, picking single-prompt or map-reduce mode.
+    
+    In 'auto' mode a single prompt is used while all posts fit into the
+    model context, map-reduce otherwise. 'single' packs the most important
+    posts into one prompt and drops the rest. With topic grouping "fits"
+    means every topic fits with at least one representative post.
+    
+    Args:
+        news_data: Output from aggregate_news()
+        digest_type: 'brief' for краткая or 'full' for полная
+        llm_client: LLM client instance
+        is_scheduled: Whether this is a scheduled digest
+        mode: 'auto', 'single' or 'map_reduce'
+        group_by: 'topic' to send clustered topics with their best posts,
+            'channel' to send posts grouped by channel (single-prompt mode)
+        save: Store the digest in history
+    
+    Returns:
+        Generated digest text
+    """
+    stats = news_data.get('normalization')
+    if stats:
+        print(f"🧹 Digest normalization saved {stats['tokens_saved']} of {stats['tokens_before']} tokens")
+    
+    prompt_template = FULL_DIGEST_PROMPT if digest_type == 'full' else BRIEF_DIGEST_PROMPT
+    budget = prompt_budget(prompt_template)
+    news_content = None
+    if mode != 'map_reduce':
+        # One packing pass: either everything fits, or we know map-reduce is needed
+        if group_by == 'topic':
+            topics = cluster_news(news_data)
+            packed = pack_topics(news_data, topics, budget, SINGLE_MAX_CHARS_PER_MESSAGE)
+            fits = len(packed) == len(topics)
+            news_content = render_topics(news_data, packed, len(topics), SINGLE_MAX_CHARS_PER_MESSAGE)
+            print(f"🗂 Digest topics: {len(topics)} from {news_data['total_messages']} posts")
+        else:
+            selected = pack_messages(news_data, budget, SINGLE_MAX_CHARS_PER_MESSAGE)
+            fits = sum(len(msgs) for msgs in selected.values()) == news_data['total_messages']
+            news_content = render_messages(news_data, selected, SINGLE_MAX_CHARS_PER_MESSAGE)
+        if mode == 'auto' and not fits:
+            mode = 'map_reduce'
+    
+    if mode == 'map_reduce':
+        return await create_digest_map_reduce(news_data, digest_type, llm_client, is_scheduled, save=save)
+    
+    return await create_digest(news_content, digest_type, llm_client, is_scheduled, save)
+
+
+async def build_news_digest(
+    digest_type: Literal['brief', 'full'],
+    llm_client: LLMClient,
+    hours_back: int = 24
+) -> Optional[Tuple[str, int]]:
+    """
+    Aggregate the monitored channels and create an on-demand digest.
+    
+    Concurrent requests for the same digest type and window share one run
+    of the aggregation and LLM pipeline.
+    
+    Args:
+        digest_type: 'brief' or 'full'
+        llm_client: LLM client instance (the first caller's is used)
+        hours_back: Window in hours
+    
+    Returns:
+        Tuple of (digest text, number of posts), or None if there are no posts
+    """
+    async def run() -> Optional[Tuple[str, int]]:
+        news_data = await aggregate_news(hours_back=hours_back)
+        if news_data['total_messages'] == 0:
+            return None
+        # Map-reduce kicks in when the news do not fit one prompt
+        digest = await generate_digest(
+            news_data=news_data,
+            digest_type=digest_type,
+            llm_client=llm_client,
+            is_scheduled=False
+        )
+        return digest, news_data['total_messages']
+    
+    return await single_flight(('news_digest', digest_type, hours_back), run)
+
+
+def _digest_sections(news_data: Dict, group_by: str = DIGEST_GROUP_BY, limit: int = DIGEST_SECTIONS) -> List[Dict]:
+    """
+    Split aggregated news into sections for the "more" buttons of a brief digest.
+    
+    Returns:
+        Sections by importance, each a dict with keys: label, channels, source
+    """
+    if group_by == 'topic':
+        groups = [(topic['label'], topic['channels'], topic['messages']) for topic in cluster_news(news_data)]
+    else:
+        score_messages(news_data)
+        groups = [
+            (data['title'], [data['title']], sorted(data['messages'], key=lambda m: m['score'], reverse=True))
+            for data in news_data['channels'].values() if data['messages']
+        ]
+        groups.sort(key=lambda group: sum(m['score'] for m in group[2]), reverse=True)
+    
+    sections = []
+    for label, channels, messages in groups[:limit]:
+        posts = [format_message(msg, SECTION_MAX_CHARS_PER_MESSAGE) for msg in messages[:SECTION_MAX_POSTS]]
+        sections.append({
+            'label': label,
+            'channels': channels,
+            'source': f"Каналы: {', '.join(channels)}\n\n" + "\n\n".join(posts),
+        })
+    return sections
+
+
+async def _store_sections(digest_id: int, sections: List[Dict]) -> List[Tuple[int, str]]:
+    async with get_session() as db:
+        rows = [
+            DigestSection(
+                digest_id=digest_id,
+                position=position,
+                label=section['label'],
+                channels=",".join(section['channels']),
+                source=section['source'],
+                created_at=datetime.now(timezone.utc)
+            )
+            for position, section in enumerate(sections)
+        ]
+        db.add_all(rows)
+        await db.commit()
+        return [(row.id, row.label) for row in rows]
+
+
+async def build_brief_digest(llm_client: LLMClient, hours_back: int = 24) -> Optional[Dict]:
+    """
+    Create an on-demand brief digest with sections that can be expanded later.
+    
+    Only the brief digest is generated now; each section keeps its posts so
+    expand_section() can write the detailed version when it is asked for.
+    Concurrent requests for the same window share one run.
+    
+    Args:
+        llm_client: LLM client instance (the first caller's is used)
+        hours_back: Window in hours
+    
+    Returns:
+        Dict with keys digest, total_messages, sections (list of (id, label)),
+        or None if there are no posts
+    """
+    async def run() -> Optional[Dict]:
+        news_data = await aggregate_news(hours_back=hours_back)
+        if news_data['total_messages'] == 0:
+            return None
+        digest = await generate_digest(news_data, 'brief', llm_client, is_scheduled=False, save=False)
+        digest_id = await _save_digest(digest, 'brief', False, news_data['total_messages'])
+        sections = await _store_sections(digest_id, _digest_sections(news_data))
+        return {'digest': digest, 'total_messages': news_data['total_messages'], 'sections': sections}
+    
+    return await single_flight(('news_brief', hours_back), run)
+
+
+async def expand_section(section_id: int, llm_client: LLMClient) -> Optional[Tuple[str, str]]:
+    """
+    Get the detailed version of a digest section, generating it on first request.
+    
+    Args:
+        section_id: DigestSection id
+        llm_client: LLM client instance
+    
+    Returns:
+        Tuple of (label, detailed text), or None if the section is gone
+    """
+    async def run() -> Optional[Tuple[str, str]]:
+        async with get_session() as db:
+            section = await db.get(DigestSection, section_id)
+        if section is None:
+            return None
+        if section.detail:
+            return section.label, section.detail
+        
+        budget = prompt_budget(SECTION_PROMPT)
+        prompt = SECTION_PROMPT.format(
+            label=section.label,
+            news_content=truncate_to_tokens(section.source or "", budget)
+        )
+        detail = await llm_client.acall_without_history(prompt, temperature=0.3)
+        
+        async with get_session() as db:
+            await db.execute(
+                update(DigestSection)
+                .where(DigestSection.id == section_id)
+                .values(detail=detail, expanded_at=datetime.now(timezone.utc))
+            )
+            await db.commit()
+        return section.label, detail
+    
+    return await single_flight(('digest_section', section_id), run)
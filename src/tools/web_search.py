@@ -1,78 +1,237 @@
 """Web search using DuckDuckGo."""
-from typing import List, Dict
+import asyncio
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import List, Dict, Optional, Tuple
+
 from duckduckgo_search import DDGS
+from sqlalchemy import select
+
+from src.config import (
+    SEARCH_WEB_CACHE_TTL_MINUTES,
+    SEARCH_NEWS_CACHE_TTL_MINUTES,
+    SEARCH_CACHE_MAX_ENTRIES,
+    SEARCH_CONCURRENCY,
+    SEARCH_DEEP_PAGES,
+)
+from src.database import get_session, SearchCache
+from src.singleflight import single_flight
+from .page_fetch import get_page_fetcher
+
+# Cache lifetime per search kind (news get stale much faster)
+CACHE_TTL_MINUTES = {'web': SEARCH_WEB_CACHE_TTL_MINUTES, 'news': SEARCH_NEWS_CACHE_TTL_MINUTES}
+
+
+def _query_key(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+def _web_result(result: dict) -> Dict[str, str]:
+    return {
+        'title': result.get('title', ''),
+        'url': result.get('href', ''),
+        'body': result.get('body', ''),
+    }
+
+
+def _news_result(result: dict) -> Dict[str, str]:
+    return {
+        'title': result.get('title', ''),
+        'url': result.get('url', ''),
+        'body': result.get('body', ''),
+        'date': result.get('date', ''),
+        'source': result.get('source', ''),
+    }
+
+
+class SearchClient:
+    """
+    DuckDuckGo search with pooled sessions, a TTL cache and request coalescing.
+    
+    Searches run in a pool of ``concurrency`` worker threads, each with its
+    own DDGS session (connection pool, cookies) reused across requests, so
+    up to ``concurrency`` searches run at once and the rest wait in the
+    pool's queue without holding a thread. Results are cached by kind, normalized query, result count and region in
+    an in-memory LRU and in the database, so /search and agent tools share
+    them and they survive restarts. Concurrent identical searches share one
+    request.
+    """
+    
+    def __init__(self, max_entries: int = SEARCH_CACHE_MAX_ENTRIES, concurrency: int = SEARCH_CONCURRENCY):
+        self.max_entries = max_entries
+        # DDGS is not thread-safe: every thread gets its own session
+        self._local = threading.local()
+        self._workers = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="search")
+        self._memory: "OrderedDict[str, Tuple[float, List[Dict[str, str]]]]" = OrderedDict()
+        self.stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0}
+    
+    def fetch(self, kind: str, query: str, max_results: int, region: str) -> List[Dict[str, str]]:
+        """
+        Run a search on the calling thread's session, bypassing the cache (blocking).
+        
+        Returns:
+            Parsed results (empty list on error)
+        """
+        try:
+            ddgs = getattr(self._local, 'ddgs', None)
+            if ddgs is None:
+                ddgs = self._local.ddgs = DDGS()
+            if kind == 'news':
+                raw = ddgs.news(query, region=region, safesearch='moderate', max_results=max_results)
+                return [_news_result(r) for r in raw]
+            # Use region parameter for better localized results
+            raw = ddgs.text(query, region=region, safesearch='moderate', max_results=max_results)
+            return [_web_result(r) for r in raw]
+        except Exception as e:
+            # Start over with a fresh session next time
+            self._local.ddgs = None
+            print(f"{'News' if kind == 'news' else 'Web'} search error: {e}")
+            print(f"Query was: {query}")
+            return []
+    
+    def _remember(self, key: str, created: float, results: List[Dict[str, str]]):
+        self._memory[key] = (created, results)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+    
+    @staticmethod
+    async def _load(key: str, fresh_after: datetime) -> Optional[SearchCache]:
+        async with get_session() as db:
+            return await db.scalar(
+                select(SearchCache).where(SearchCache.key == key, SearchCache.created_at >= fresh_after)
+            )
+    
+    @staticmethod
+    async def _store(key: str, kind: str, query: str, results: List[Dict[str, str]], created_at: datetime):
+        async with get_session() as db:
+            row = await db.scalar(select(SearchCache).where(SearchCache.key == key))
+            if row is None:
+                row = SearchCache(key=key, kind=kind)
+                db.add(row)
+            row.query = query
+            row.results = json.dumps(results, ensure_ascii=False)
+            row.created_at = created_at
+            await db.commit()
+    
+    async def search(self, kind: str, query: str, max_results: int = 5, region: str = "ru-ru") -> List[Dict[str, str]]:
+        """
+        Search with caching and coalescing.
+        
+        Args:
+            kind: 'web' or 'news'
+            query: Search query
+            max_results: Maximum number of results
+            region: Region for search
+        
+        Returns:
+            List of result dicts (see search_web / search_news)
+        """
+        key = f"{kind}:{region}:{max_results}:{_query_key(query)}"
+        ttl = CACHE_TTL_MINUTES[kind] * 60
+        
+        cached = self._memory.get(key)
+        if cached is not None and time.time() - cached[0] < ttl:
+            self._memory.move_to_end(key)
+            self.stats['memory_hits'] += 1
+            return cached[1]
+        
+        async def lookup() -> List[Dict[str, str]]:
+            now = datetime.now(timezone.utc)
+            row = await self._load(key, now - timedelta(seconds=ttl))
+            if row is not None:
+                self.stats['disk_hits'] += 1
+                created = row.created_at.replace(tzinfo=timezone.utc) if row.created_at.tzinfo is None else row.created_at
+                results = json.loads(row.results)
+                self._remember(key, created.timestamp(), results)
+                return results
+            
+            self.stats['misses'] += 1
+            loop = asyncio.get_running_loop()
+            results = await loop.run_in_executor(self._workers, self.fetch, kind, query, max_results, region)
+            if results:
+                # Errors come back empty, do not cache them
+                self._remember(key, now.timestamp(), results)
+                await self._store(key, kind, query, results, now)
+            return results
+        
+        return await single_flight(('search', key), lookup)
+
+
+_search_client: Optional[SearchClient] = None
+
+
+def get_search_client() -> SearchClient:
+    """Get or create the shared SearchClient."""
+    global _search_client
+    if _search_client is None:
+        _search_client = SearchClient()
+    return _search_client
 
 
 def search_web(query: str, max_results: int = 5, region: str = "ru-ru") -> List[Dict[str, str]]:
     """
-    Search the web using DuckDuckGo.
+    Search the web using DuckDuckGo (blocking, uncached; prefer asearch_web).
     
     Args:
         query: Search query
         max_results: Maximum number of results to return
         region: Region for search (default: ru-ru for Russian results)
-        
+    
     Returns:
         List of dicts with keys: title, url, body (snippet)
     """
-    try:
-        with DDGS() as ddgs:
-            results = []
-            # Use region parameter for better localized results
-            search_results = ddgs.text(
-                query,
-                region=region,
-                safesearch='moderate',
-                max_results=max_results
-            )
-            
-            for result in search_results:
-                results.append({
-                    'title': result.get('title', ''),
-                    'url': result.get('href', ''),
-                    'body': result.get('body', ''),
-                })
-            
-            return results
-    except Exception as e:
-        print(f"Web search error: {e}")
-        print(f"Query was: {query}")
-        return []
+    return get_search_client().fetch('web', query, max_results, region)
 
 
 def search_news(query: str, max_results: int = 5, region: str = "ru-ru") -> List[Dict[str, str]]:
     """
-    Search news using DuckDuckGo News.
+    Search news using DuckDuckGo News (blocking, uncached; prefer asearch_news).
     
     Args:
         query: Search query
         max_results: Maximum number of results
         region: Region for search (default: ru-ru)
-        
+    
     Returns:
         List of news articles
     """
-    try:
-        with DDGS() as ddgs:
-            results = []
-            search_results = ddgs.news(
-                query,
-                region=region,
-                safesearch='moderate',
-                max_results=max_results
-            )
-            
-            for result in search_results:
-                results.append({
-                    'title': result.get('title', ''),
-                    'url': result.get('url', ''),
-                    'body': result.get('body', ''),
-                    'date': result.get('date', ''),
-                    'source': result.get('source', ''),
-                })
-            
-            return results
-    except Exception as e:
-        print(f"News search error: {e}")
-        print(f"Query was: {query}")
-        return []
+    return get_search_client().fetch('news', query, max_results, region)
+
+
+async def asearch_web(query: str, max_results: int = 5, region: str = "ru-ru") -> List[Dict[str, str]]:
+    """Async cached web search; concurrent identical searches share one request."""
+    return await get_search_client().search('web', query, max_results, region)
+
+
+async def asearch_news(query: str, max_results: int = 5, region: str = "ru-ru") -> List[Dict[str, str]]:
+    """Async cached news search; concurrent identical searches share one request."""
+    return await get_search_client().search('news', query, max_results, region)
+
+
+async def asearch_web_deep(
+    query: str, max_results: int = 5, pages: int = SEARCH_DEEP_PAGES, region: str = "ru-ru"
+) -> List[Dict[str, str]]:
+    """
+    Web search that also reads the top result pages.
+    
+    The first ``pages`` results are fetched concurrently and get a
+    'content' key with the page's main text (missing when the page could
+    not be fetched); the rest keep only their snippets.
+    
+    Returns:
+        List of result dicts (see search_web)
+    """
+    results = await asearch_web(query, max_results, region)
+    urls = [r['url'] for r in results[:pages] if r['url']]
+    texts = await get_page_fetcher().fetch_many(urls)
+    # Cached results are shared: copy before adding page text
+    deep = []
+    for result in results:
+        text = texts.get(result['url'])
+        deep.append({**result, 'content': text} if text else result)
+    return deep
@@ -0,0 +1,36 @@
+"""Shared pytest setup: settings src.config requires at import time and a test database."""
+import asyncio
+import os
+import tempfile
+
+import pytest
+
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "test-token")
+# Never touch jarvis.db in the working directory
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="jarvis-tests-"), "jarvis.db"))
+
+# Manual Gmail API connection check (python tests/test_gmail.py), needs real credentials
+collect_ignore = ["test_gmail.py"]
+
+
+@pytest.fixture(scope="session")
+def database():
+    """Create the schema in the temporary test database once."""
+    from src.database import init_db
+    
+    init_db()
+
+
+@pytest.fixture
+def run(database):
+    """Run a coroutine on a fresh event loop; pooled connections are closed afterwards."""
+    from src.database.session import async_engine
+    
+    def run(coro):
+        async def main():
+            try:
+                return await coro
+            finally:
+                await async_engine.dispose()
+        return asyncio.run(main())
+    return run
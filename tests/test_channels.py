@@ -0,0 +1,164 @@
+"""Tests for channel ingestion bookkeeping."""
+from datetime import datetime, timedelta, timezone
+from itertools import count
+
+import pytest
+from sqlalchemy import select
+
+from src.database import get_session, ChannelIngestState, ChannelPost
+from src.telegram_client import channels
+from src.telegram_client.channels import ChannelRecord, _upsert_posts, _utc
+
+NOW = datetime.now(timezone.utc).replace(microsecond=0)
+_names = count()
+
+
+@pytest.fixture
+def channel():
+    """A channel name no other test uses (the test database is shared)."""
+    return f"@test_channel_{next(_names)}"
+
+
+def _fetch(channel_username, window_start, messages=(), error=None, truncated=False, oldest=None):
+    return {
+        'channel': channel_username,
+        'window_start': window_start,
+        'hours_back': (NOW - window_start).total_seconds() / 3600,
+        'result': {
+            'messages': [{'id': i, 'date': NOW - timedelta(minutes=i), 'text': f"post {i}"} for i in messages],
+            'scanned': len(messages),
+            'truncated': truncated,
+            'oldest': oldest,
+            'error': error,
+        },
+    }
+
+
+async def _upsert(*fetches, now=NOW):
+    async with get_session() as db:
+        await _upsert_posts(db, list(fetches), now)
+        await db.commit()
+
+
+async def _state(channel_username):
+    async with get_session() as db:
+        return await db.scalar(select(ChannelIngestState).where(ChannelIngestState.channel_username == channel_username))
+
+
+async def _post_ids(channel_username):
+    async with get_session() as db:
+        return set(await db.scalars(select(ChannelPost.message_id).where(ChannelPost.channel_username == channel_username)))
+
+
+def test_successful_fetch_covers_window(run, channel):
+    async def scenario():
+        await _upsert(_fetch(channel, NOW - timedelta(hours=24), messages=[1, 2]))
+        return await _state(channel), await _post_ids(channel)
+    
+    state, posts = run(scenario())
+    assert _utc(state.covered_from) == NOW - timedelta(hours=24)
+    assert _utc(state.last_ingested_at) == NOW
+    assert state.error_count == 0 and state.retry_after is None
+    assert posts == {1, 2}
+
+
+def test_failed_fetch_keeps_posts_but_not_coverage(run, channel):
+    async def scenario():
+        await _upsert(_fetch(channel, NOW - timedelta(hours=24), messages=[1]), now=NOW - timedelta(hours=1))
+        await _upsert(_fetch(channel, NOW - timedelta(hours=3), messages=[2], error="FloodWait"))
+        return await _state(channel), await _post_ids(channel)
+    
+    state, posts = run(scenario())
+    assert posts == {1, 2}
+    assert _utc(state.covered_from) == NOW - timedelta(hours=24)
+    assert _utc(state.last_ingested_at) == NOW - timedelta(hours=1)
+    assert _utc(state.last_attempt_at) == NOW
+    assert state.error_count == 1
+    assert _utc(state.retry_after) > NOW
+
+
+def test_truncated_fetch_covers_only_scanned_part(run, channel):
+    oldest = NOW - timedelta(hours=5)
+    
+    async def scenario():
+        await _upsert(_fetch(channel, NOW - timedelta(hours=24), messages=[1], truncated=True, oldest=oldest))
+        return await _state(channel)
+    
+    assert _utc(run(scenario()).covered_from) == oldest
+
+
+def test_overlapping_window_extends_coverage(run, channel):
+    async def scenario():
+        await _upsert(_fetch(channel, NOW - timedelta(hours=4)), now=NOW - timedelta(hours=1))
+        await _upsert(_fetch(channel, NOW - timedelta(hours=3)))
+        return await _state(channel)
+    
+    assert _utc(run(scenario()).covered_from) == NOW - timedelta(hours=4)
+
+
+def test_gap_restarts_coverage(run, channel):
+    async def scenario():
+        await _upsert(_fetch(channel, NOW - timedelta(hours=10)), now=NOW - timedelta(hours=8))
+        await _upsert(_fetch(channel, NOW - timedelta(hours=2)))
+        return await _state(channel)
+    
+    assert _utc(run(scenario()).covered_from) == NOW - timedelta(hours=2)
+
+
+def test_success_clears_backoff(run, channel):
+    async def scenario():
+        await _upsert(_fetch(channel, NOW - timedelta(hours=2), error="timeout"), now=NOW - timedelta(hours=1))
+        await _upsert(_fetch(channel, NOW - timedelta(hours=2)))
+        return await _state(channel)
+    
+    state = run(scenario())
+    assert state.error_count == 0 and state.retry_after is None
+
+
+def test_backoff_grows_and_is_capped():
+    assert channels._ingest_backoff(1) == channels.CHANNEL_INGEST_INTERVAL_MINUTES
+    assert channels._ingest_backoff(2) == 2 * channels.CHANNEL_INGEST_INTERVAL_MINUTES
+    assert channels._ingest_backoff(50) == channels.INGEST_BACKOFF_MAX_MINUTES
+
+
+def _monitored(monkeypatch, names):
+    records = [ChannelRecord(i, name, name, None) for i, name in enumerate(names)]
+    
+    async def get_monitored_channels():
+        return records
+    monkeypatch.setattr(channels, "get_monitored_channels", get_monitored_channels)
+    
+    ingested = []
+    
+    async def ingest_channels(channel_usernames, hours_back=None, spacing=0.0):
+        ingested.append(list(channel_usernames))
+        return 0
+    monkeypatch.setattr(channels, "ingest_channels", ingest_channels)
+    return ingested
+
+
+def test_due_channels_skip_failing_ones(run, monkeypatch):
+    failing, healthy = f"@test_channel_{next(_names)}", f"@test_channel_{next(_names)}"
+    ingested = _monitored(monkeypatch, [failing, healthy])
+    monkeypatch.setattr(channels, "CHANNEL_INGEST_SWEEP_MINUTES", channels.CHANNEL_INGEST_INTERVAL_MINUTES)
+    
+    async def scenario():
+        await _upsert(_fetch(healthy, NOW - timedelta(hours=2)), now=NOW - timedelta(hours=1))
+        # Never ingested successfully, so it would sort first without backoff
+        await _upsert(_fetch(failing, NOW - timedelta(hours=2), error="ChannelPrivateError"))
+        return await channels.ingest_due_channels()
+    
+    assert run(scenario()) == 1
+    assert ingested == [[healthy]]
+
+
+def test_no_inline_ingest_while_backing_off(run, monkeypatch):
+    failing, healthy = f"@test_channel_{next(_names)}", f"@test_channel_{next(_names)}"
+    ingested = _monitored(monkeypatch, [failing, healthy])
+    
+    async def scenario():
+        await _upsert(_fetch(failing, NOW - timedelta(hours=2), error="timeout"))
+        await channels.get_all_monitored_messages(hours_back=24)
+    
+    run(scenario())
+    assert ingested == [[healthy]]
@@ -0,0 +1,55 @@
+"""Tests for topic clustering of posts."""
+from datetime import datetime, timedelta, timezone
+
+from src.tools.clustering import cluster_news
+
+RATE = ["Центробанк повысил ключевую ставку до шестнадцати процентов",
+        "Центробанк неожиданно повысил ключевую ставку, аналитики ждали паузы",
+        "Аналитики обсуждают, почему центробанк повысил ключевую ставку"]
+FOOTBALL = ["Футбольный клуб подписал контракт с новым тренером",
+            "Клуб подписал контракт с тренером на три сезона"]
+
+
+def _news(**channels):
+    now = datetime.now(timezone.utc)
+    return {
+        'channels': {
+            name: {
+                'title': name.upper(),
+                'messages': [
+                    {'id': i, 'date': now - timedelta(minutes=i), 'text': text, 'views': views, 'forwards': 0, 'reactions': 0}
+                    for i, (text, views) in enumerate(messages)
+                ],
+            }
+            for name, messages in channels.items()
+        },
+    }
+
+
+def test_groups_posts_by_topic():
+    news_data = _news(
+        a=[(RATE[0], 100), (FOOTBALL[0], 100)],
+        b=[(RATE[1], 100), (FOOTBALL[1], 100)],
+        c=[(RATE[2], 100)],
+    )
+    topics = cluster_news(news_data)
+    
+    assert sorted(len(topic['messages']) for topic in topics) == [2, 3]
+    rate = next(topic for topic in topics if len(topic['messages']) == 3)
+    assert {msg['text'] for msg in rate['messages']} == set(RATE)
+    assert sorted(rate['channels']) == ['A', 'B', 'C']
+
+
+def test_topics_sorted_by_importance():
+    news_data = _news(a=[(RATE[0], 10), (RATE[1], 10), (FOOTBALL[0], 10)])
+    topics = cluster_news(news_data)
+    
+    assert [len(topic['messages']) for topic in topics] == [2, 1]
+    assert topics[0]['score'] >= topics[1]['score']
+    assert topics[0]['representatives'][0][1] is topics[0]['messages'][0]
+
+
+def test_unrelated_posts_stay_apart():
+    news_data = _news(a=[(RATE[0], 10), (FOOTBALL[0], 10)])
+    
+    assert len(cluster_news(news_data)) == 2
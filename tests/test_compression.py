@@ -0,0 +1,41 @@
+"""Tests for archived text compression."""
+import zlib
+
+import pytest
+
+from src.database.compression import CURRENT_VERSION, DICTIONARIES, compress_text, decompress_text
+
+
+@pytest.mark.parametrize("text", [
+    "",
+    "Короткий пост",
+    "📰 Дайджест новостей\n\n🔥 Главное\n\n• Правительство заявило о росте рынка на 3 процента",
+    "Mixed текст with emoji 🚀 and\nnewlines\ttabs",
+    "длинный текст " * 2000,
+])
+def test_round_trip(text):
+    assert decompress_text(compress_text(text)) == text
+
+
+def test_none_stays_none():
+    assert decompress_text(None) is None
+
+
+def test_version_byte_comes_first():
+    data = compress_text("Новости")
+    assert data[0] == CURRENT_VERSION
+
+
+def test_dictionary_is_required():
+    data = compress_text("Президент заявил, что компания получит млрд рублей")
+    with pytest.raises(zlib.error):
+        zlib.decompress(data[1:])
+    
+    decompressor = zlib.decompressobj(zdict=DICTIONARIES[data[0]])
+    assert decompressor.decompress(data[1:]).decode("utf-8").startswith("Президент")
+
+
+def test_dictionary_helps_short_texts():
+    text = "Сегодня правительство России сообщает, что рынок рублей вырос на 2 процента после заявления министра"
+    plain = zlib.compress(text.encode("utf-8"), 9)
+    assert len(compress_text(text)) < len(plain)
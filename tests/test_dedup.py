@@ -0,0 +1,68 @@
+"""Tests for near-duplicate detection of posts."""
+from datetime import datetime, timezone
+
+from src.tools.dedup import NUM_BINS, deduplicate_news, find_duplicate_groups, minhash, tokenize
+
+STORY = ("Центральный банк сегодня повысил ключевую ставку до шестнадцати процентов годовых, "
+         "сообщила пресс-служба регулятора после заседания совета директоров")
+OTHER = ("Футбольный клуб подписал контракт с новым главным тренером на три сезона, "
+         "первый матч под его руководством команда проведет в субботу")
+
+
+def test_minhash_signature():
+    tokens = tokenize(STORY)
+    signature = minhash(tokens)
+    
+    assert len(signature) == NUM_BINS
+    assert signature == minhash(tokens)
+
+
+def test_groups_near_duplicates():
+    texts = [
+        STORY,
+        OTHER,
+        STORY.replace("шестнадцати", "семнадцати"),
+        STORY.upper(),
+        "Короткий пост",
+    ]
+    
+    assert sorted(sorted(g) for g in find_duplicate_groups(texts)) == [[0, 2, 3]]
+
+
+def test_distinct_stories_are_not_grouped():
+    assert find_duplicate_groups([STORY, OTHER]) == []
+
+
+def test_short_texts_only_match_exactly():
+    assert find_duplicate_groups(["Срочно!", "срочно", "Срочная новость"]) == [[0, 1]]
+
+
+def test_posts_without_words_are_not_grouped():
+    assert find_duplicate_groups(["🔥🔥", "👍", "!!!", "...", STORY, STORY]) == [[4, 5]]
+
+
+def _message(msg_id, text, views):
+    return {'id': msg_id, 'date': datetime.now(timezone.utc), 'text': text,
+            'views': views, 'forwards': 1, 'reactions': 0}
+
+
+def test_deduplicate_news_keeps_most_viewed_copy():
+    news_data = {
+        'channels': {
+            'a': {'title': 'Канал A', 'messages': [_message(1, STORY, 100), _message(2, OTHER, 50)]},
+            'b': {'title': 'Канал B', 'messages': [_message(3, STORY + " Подробности позже.", 900)]},
+        },
+        'total_messages': 3,
+    }
+    
+    deduplicate_news(news_data)
+    
+    assert [m['id'] for m in news_data['channels']['a']['messages']] == [2]
+    kept = news_data['channels']['b']['messages'][0]
+    assert kept['id'] == 3
+    assert kept['sources'] == ['Канал A', 'Канал B']
+    assert kept['duplicates'] == 1
+    assert kept['views'] == 1000
+    assert kept['forwards'] == 2
+    assert news_data['total_messages'] == 2
+    assert news_data['duplicates_removed'] == 1
@@ -0,0 +1,164 @@
+"""Tests for outgoing message delivery."""
+from datetime import datetime, timezone
+from itertools import count
+
+import pytest
+from sqlalchemy import select
+from telegram.error import BadRequest, ChatMigrated, Forbidden, NetworkError, RetryAfter
+
+from src.bot import delivery
+from src.bot.delivery import DeliveryService, split_message
+from src.database import get_session, OutboxMessage
+
+_chats = count(1000)
+
+
+def test_short_message_is_one_chunk():
+    assert split_message("  Привет  ") == ["Привет"]
+    assert split_message("") == []
+
+
+def test_split_prefers_paragraphs():
+    text = "a" * 60 + "\n\n" + "b" * 30 + "\n" + "c" * 30
+    
+    assert split_message(text, limit=80) == ["a" * 60, "b" * 30 + "\n" + "c" * 30]
+
+
+def test_split_keeps_chunks_within_limit():
+    text = " ".join(f"слово{i}." for i in range(2000))
+    chunks = split_message(text, limit=500)
+    
+    assert all(len(chunk) <= 500 for chunk in chunks)
+    assert " ".join(chunks).split() == text.split()
+
+
+def test_split_cuts_text_without_separators():
+    assert split_message("x" * 250, limit=100) == ["x" * 100, "x" * 100, "x" * 50]
+
+
+class FakeBot:
+    """Bot whose sends to a chat fail with the scripted errors first."""
+    
+    def __init__(self, errors=None):
+        self.errors = errors or {}
+        self.sent = []
+    
+    async def send_message(self, chat_id, text, parse_mode=None):
+        errors = self.errors.get(chat_id)
+        if errors:
+            error = errors.pop(0)
+            if error is not None:
+                raise error
+        self.sent.append((chat_id, text))
+
+
+@pytest.fixture
+def service_factory(monkeypatch):
+    monkeypatch.setattr(delivery, "DELIVERY_CHAT_INTERVAL", 0.0)
+    monkeypatch.setattr(delivery, "DELIVERY_GLOBAL_RATE", 1e6)
+    return lambda bot: DeliveryService(bot)
+
+
+def _chat():
+    return str(next(_chats))
+
+
+async def _rows(chat_id):
+    async with get_session() as db:
+        return list(await db.scalars(select(OutboxMessage).where(OutboxMessage.chat_id == chat_id).order_by(OutboxMessage.id)))
+
+
+async def _deliver(service, chat_ids, text):
+    sent = await service.deliver(chat_ids, text)
+    return sent, {chat_id: await _rows(chat_id) for chat_id in chat_ids}
+
+
+TWO_CHUNKS = "первый " * 500 + "\n\n" + "второй " * 500
+
+
+def test_delivers_chunks_in_order(run, service_factory):
+    a, b = _chat(), _chat()
+    bot = FakeBot()
+    sent, rows = run(_deliver(service_factory(bot), [a, b], TWO_CHUNKS))
+    
+    assert sent == 4
+    assert [text.split()[0] for chat, text in bot.sent if chat == a] == ["первый", "второй"]
+    assert all(row.status == "sent" and row.attempts == 1 for chat_rows in rows.values() for row in chat_rows)
+
+
+def test_flood_control_is_retried_without_counting(run, service_factory):
+    chat = _chat()
+    bot = FakeBot({chat: [RetryAfter(0), RetryAfter(0)]})
+    sent, rows = run(_deliver(service_factory(bot), [chat], "текст"))
+    
+    assert sent == 1
+    assert [(row.status, row.attempts) for row in rows[chat]] == [("sent", 1)]
+
+
+def test_forbidden_fails_the_chat_queue_only(run, service_factory):
+    blocked, other = _chat(), _chat()
+    bot = FakeBot({blocked: [Forbidden("bot was blocked by the user")]})
+    sent, rows = run(_deliver(service_factory(bot), [blocked, other], TWO_CHUNKS))
+    
+    assert sent == 2
+    assert [row.status for row in rows[blocked]] == ["failed", "failed"]
+    assert [row.status for row in rows[other]] == ["sent", "sent"]
+
+
+def test_bad_request_fails_only_that_chunk(run, service_factory):
+    chat = _chat()
+    bot = FakeBot({chat: [BadRequest("can't parse entities")]})
+    sent, rows = run(_deliver(service_factory(bot), [chat], TWO_CHUNKS))
+    
+    assert sent == 1
+    assert [row.status for row in rows[chat]] == ["failed", "sent"]
+    assert rows[chat][0].last_error == "can't parse entities"
+
+
+def test_long_network_outage_is_left_to_a_later_flush(run, service_factory, monkeypatch):
+    # The first backoff is already too long to wait in place
+    monkeypatch.setattr(delivery, "RETRY_BASE_SECONDS", 100.0)
+    chat = _chat()
+    bot = FakeBot({chat: [NetworkError("connection reset")]})
+    sent, rows = run(_deliver(service_factory(bot), [chat], TWO_CHUNKS))
+    
+    assert sent == 0
+    first, second = rows[chat]
+    assert (first.status, first.attempts) == ("pending", 1)
+    assert first.next_attempt_at.replace(tzinfo=timezone.utc) > datetime.now(timezone.utc)
+    # Order is kept: the next chunk waits behind the first
+    assert (second.status, second.attempts) == ("pending", 0)
+
+
+def test_short_network_errors_are_retried_in_place(run, service_factory, monkeypatch):
+    monkeypatch.setattr(delivery, "RETRY_BASE_SECONDS", 0.001)
+    chat = _chat()
+    bot = FakeBot({chat: [NetworkError("timeout"), NetworkError("timeout")]})
+    sent, rows = run(_deliver(service_factory(bot), [chat], "текст"))
+    
+    assert sent == 1
+    assert [(row.status, row.attempts) for row in rows[chat]] == [("sent", 3)]
+
+
+def test_other_telegram_errors_back_off_then_fail(run, service_factory, monkeypatch):
+    monkeypatch.setattr(delivery, "DELIVERY_MAX_ATTEMPTS", 2)
+    chat = _chat()
+    bot = FakeBot({chat: [ChatMigrated(42), ChatMigrated(42)]})
+    service = service_factory(bot)
+    
+    async def scenario():
+        await service.deliver([chat], "текст")
+        first = (await _rows(chat))[0]
+        # Make the row due again and retry
+        async with get_session() as db:
+            row = await db.get(OutboxMessage, first.id)
+            row.next_attempt_at = datetime.now(timezone.utc)
+            await db.commit()
+        await service.flush()
+        return first, (await _rows(chat))[0]
+    
+    first, second = run(scenario())
+    assert (first.status, first.attempts) == ("pending", 1)
+    assert first.next_attempt_at.replace(tzinfo=timezone.utc) > datetime.now(timezone.utc)
+    assert (second.status, second.attempts) == ("failed", 2)
+    assert bot.sent == []
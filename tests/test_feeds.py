@@ -0,0 +1,128 @@
+"""Tests for RSS/Atom feed polling."""
+from datetime import datetime, timedelta, timezone
+from itertools import count
+
+import httpx
+from sqlalchemy import select
+
+from src.database import get_session, FeedEntry, MonitoredFeed
+from src.feeds import poller
+from src.feeds.poller import INITIAL_INTERVAL_MINUTES, _backoff, _next_interval, parse_feed
+
+RSS = b"""<?xml version="1.0"?>
+<rss version="2.0"><channel><title>Example News</title>
+<item><guid>a1</guid><title>First</title><description>&lt;p&gt;Body of the first&lt;/p&gt;</description>
+<link>https://example.com/1</link><pubDate>Mon, 02 Mar 2026 10:00:00 GMT</pubDate></item>
+<item><title>No guid</title><link>https://example.com/2</link></item>
+</channel></rss>"""
+_urls = count()
+
+
+def test_parse_feed():
+    now = datetime(2026, 3, 2, 12, 0, tzinfo=timezone.utc)
+    feed = parse_feed(RSS, now)
+    
+    assert feed['title'] == "Example News"
+    first, second = feed['entries']
+    assert first['guid'] == "a1"
+    assert first['text'] == "First\nBody of the first"
+    assert first['date'] == datetime(2026, 3, 2, 10, 0, tzinfo=timezone.utc)
+    assert second['guid'] == "https://example.com/2"
+    assert second['date'] == now
+
+
+def test_backoff_doubles_from_base_and_is_clamped():
+    assert _backoff(1) == INITIAL_INTERVAL_MINUTES
+    assert _backoff(2) == 2 * INITIAL_INTERVAL_MINUTES
+    assert _backoff(3) == 4 * INITIAL_INTERVAL_MINUTES
+    assert _backoff(100) == poller.FEED_POLL_MAX_MINUTES
+
+
+def test_interval_adapts_to_new_entries():
+    feed = MonitoredFeed(poll_interval_minutes=60)
+    
+    assert _next_interval(feed, new_entries=3) == 60 * poller.SPEEDUP
+    assert _next_interval(feed, new_entries=0) == 60 * poller.SLOWDOWN
+    assert _next_interval(MonitoredFeed(poll_interval_minutes=1000), 0) == poller.FEED_POLL_MAX_MINUTES
+
+
+def _entry(guid, age_hours, now):
+    return {'guid': guid, 'date': now - timedelta(hours=age_hours), 'title': guid, 'text': guid, 'link': ''}
+
+
+def _fake_poll(monkeypatch, make_result):
+    async def _poll(feed, now):
+        return make_result(now)
+    monkeypatch.setattr(poller, "_poll", _poll)
+
+
+async def _add_feed(**values):
+    async with get_session() as db:
+        feed = MonitoredFeed(url=f"https://example.com/feed{next(_urls)}.xml", is_active=True, **values)
+        db.add(feed)
+        await db.commit()
+        return feed
+
+
+async def _reload(feed_id):
+    async with get_session() as db:
+        feed = await db.get(MonitoredFeed, feed_id)
+        guids = set(await db.scalars(select(FeedEntry.guid).where(FeedEntry.feed_id == feed_id)))
+        return feed, guids
+
+
+def test_entries_outside_retention_are_skipped(run, monkeypatch):
+    old_age = poller.CHANNEL_POST_RETENTION_HOURS + 5
+    _fake_poll(monkeypatch, lambda now: {
+        'status': 200, 'headers': httpx.Headers(),
+        'feed': {'title': "Feed", 'entries': [_entry("old", old_age, now), _entry("new", 1, now)]},
+    })
+    
+    async def scenario():
+        feed = await _add_feed(poll_interval_minutes=60)
+        first = await poller.poll_feeds([feed])
+        feed, _ = await _reload(feed.id)
+        second = await poller.poll_feeds([feed])
+        return first, second, await _reload(feed.id)
+    
+    first, second, (feed, guids) = run(scenario())
+    assert guids == {"new"}
+    assert (first, second) == (1, 0)
+    # The second poll found nothing new within the window, so the interval stretched
+    assert feed.poll_interval_minutes == 60 * poller.SPEEDUP * poller.SLOWDOWN
+
+
+def test_failure_backs_off_without_touching_interval(run, monkeypatch):
+    _fake_poll(monkeypatch, lambda now: {'status': None, 'error': "timeout"})
+    
+    async def scenario():
+        feed = await _add_feed(poll_interval_minutes=20, error_count=2)
+        await poller.poll_feeds([feed])
+        return (await _reload(feed.id))[0]
+    
+    feed = run(scenario())
+    assert feed.error_count == 3
+    assert feed.poll_interval_minutes == 20
+    delay = feed.next_poll_at.replace(tzinfo=timezone.utc) - feed.last_polled_at.replace(tzinfo=timezone.utc)
+    assert delay == timedelta(minutes=_backoff(3))
+
+
+def test_added_feeds_are_not_due_for_the_poll_job(run, monkeypatch):
+    polled = []
+    
+    async def poll_feeds(feeds):
+        polled.extend(feed.url for feed in feeds)
+        # Meanwhile the every-minute job looks for due feeds
+        async with get_session() as db:
+            due = await db.scalars(select(MonitoredFeed.url).where(
+                MonitoredFeed.url.in_(polled),
+                (MonitoredFeed.next_poll_at == None) | (MonitoredFeed.next_poll_at <= datetime.now(timezone.utc))
+            ))
+            assert list(due) == []
+        return 0
+    monkeypatch.setattr(poller, "poll_feeds", poll_feeds)
+    
+    url = f"https://example.com/added{next(_urls)}.xml"
+    feeds = run(poller.add_feeds([url]))
+    assert polled == [url]
+    assert [feed.url for feed in feeds] == [url]
@@ -0,0 +1,101 @@
+"""Tests for versioned schema migrations."""
+import pytest
+from sqlalchemy import create_engine, inspect, select, text
+
+from src.database.models import Base
+from src.database.migrations import MIGRATIONS, run_migrations, schema_migrations
+
+# Indexes and columns that migrations add to databases created before them
+MIGRATED_INDEXES = [
+    ("news_digests", "ix_news_digests_created_at"),
+    ("news_digests", "ix_news_digests_type_created"),
+    ("monitored_channels", "ix_monitored_channels_active"),
+    ("partial_summaries", "ix_partial_summaries_bucket_start"),
+    ("channel_posts", "ix_channel_posts_channel_date"),
+    ("outbox_messages", "ix_outbox_messages_status_id"),
+    ("outbox_messages", "ix_outbox_messages_status_sent_at"),
+    ("pending_email_drafts", "ix_pending_email_drafts_user_created"),
+]
+MIGRATED_COLUMNS = [
+    ("pending_email_drafts", "created_at"),
+    ("news_digests", "content_compressed"),
+    ("channel_posts", "text_compressed"),
+    ("channel_ingest_state", "last_attempt_at"),
+    ("channel_ingest_state", "error_count"),
+    ("channel_ingest_state", "retry_after"),
+]
+
+
+def _indexes(engine, table):
+    return {index['name'] for index in inspect(engine).get_indexes(table)}
+
+
+def _columns(engine, table):
+    return {column['name'] for column in inspect(engine).get_columns(table)}
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'jarvis.db'}")
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def baseline_engine(engine):
+    """A database as create_all made it before the migrations existed."""
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        for _, name in MIGRATED_INDEXES:
+            conn.execute(text(f"DROP INDEX {name}"))
+        for table, column in MIGRATED_COLUMNS:
+            conn.execute(text(f"ALTER TABLE {table} DROP COLUMN {column}"))
+        conn.execute(text("CREATE INDEX ix_outbox_messages_status ON outbox_messages (status)"))
+    return engine
+
+
+def test_upgrades_baseline_schema(baseline_engine):
+    applied = run_migrations(baseline_engine)
+    
+    assert applied == [version for version, _, _ in MIGRATIONS]
+    for table, name in MIGRATED_INDEXES:
+        assert name in _indexes(baseline_engine, table)
+    for table, column in MIGRATED_COLUMNS:
+        assert column in _columns(baseline_engine, table)
+    assert "ix_outbox_messages_status" not in _indexes(baseline_engine, "outbox_messages")
+    
+    with baseline_engine.connect() as conn:
+        versions = list(conn.scalars(select(schema_migrations.c.version)))
+        assert conn.exec_driver_sql("PRAGMA auto_vacuum").scalar() == 2
+    assert sorted(versions) == applied
+
+
+def test_keeps_existing_rows(baseline_engine):
+    with baseline_engine.begin() as conn:
+        conn.execute(text("INSERT INTO news_digests (digest_type, content) VALUES ('brief', 'old digest')"))
+    
+    run_migrations(baseline_engine)
+    
+    with baseline_engine.connect() as conn:
+        row = conn.execute(text("SELECT content, content_compressed FROM news_digests")).one()
+    assert row == ("old digest", None)
+
+
+def test_is_idempotent(baseline_engine):
+    run_migrations(baseline_engine)
+    schema = {table: (_indexes(baseline_engine, table), _columns(baseline_engine, table))
+              for table in inspect(baseline_engine).get_table_names()}
+    
+    assert run_migrations(baseline_engine) == []
+    assert schema == {table: (_indexes(baseline_engine, table), _columns(baseline_engine, table))
+                      for table in inspect(baseline_engine).get_table_names()}
+    with baseline_engine.connect() as conn:
+        assert conn.scalar(text("SELECT COUNT(*) FROM schema_migrations")) == len(MIGRATIONS)
+
+
+def test_fresh_database_only_records_versions(engine):
+    Base.metadata.create_all(engine)
+    
+    assert run_migrations(engine) == [version for version, _, _ in MIGRATIONS]
+    for table, name in MIGRATED_INDEXES:
+        assert name in _indexes(engine, table)
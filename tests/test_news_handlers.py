@@ -0,0 +1,25 @@
+"""Tests for news command helpers."""
+from src.bot.news_handlers import _format_subscription
+from src.database import DigestSubscription
+
+
+def test_format_subscription():
+    subscription = DigestSubscription(
+        telegram_user_id="1", schedule_times="09:00,21:00", digest_type="brief",
+        channels="@a,@b", hours_back=12, is_active=True
+    )
+    text = _format_subscription(subscription)
+    
+    assert "• Время: 09:00, 21:00" in text
+    assert "• Тип: краткая" in text
+    assert "• Каналы: @a, @b" in text
+
+
+def test_format_subscription_without_times():
+    subscription = DigestSubscription(telegram_user_id="1", schedule_times=None, hours_back=12, is_active=False)
+    
+    assert "• Время: —" in _format_subscription(subscription)
+
+
+def test_format_missing_subscription():
+    assert _format_subscription(None).startswith("📭")
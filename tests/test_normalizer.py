@@ -0,0 +1,84 @@
+"""Tests for post normalization."""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from src.tools import normalizer
+from src.tools.normalizer import SIGNATURE_TTL, learn_boilerplate, normalize_news, strip_boilerplate, strip_markup
+
+NOW = datetime(2026, 3, 1, 12, 0, tzinfo=timezone.utc)
+SIGNATURE = "Новости Экономики — будьте в курсе"
+
+
+@pytest.fixture(autouse=True)
+def fresh_signatures():
+    normalizer._learned.clear()
+    yield
+    normalizer._learned.clear()
+
+
+def _news(texts):
+    return {
+        'channels': {'econ': {'title': 'Econ', 'messages': [{'id': i, 'text': t} for i, t in enumerate(texts)]}},
+        'total_messages': len(texts),
+    }
+
+
+def test_strip_markup():
+    text = "**Важно**: [ЦБ](https://cbr.ru) повысил ставку 🔥🔥🔥 https://t.me/x\n\nПодписывайтесь на наш канал\n#экономика #ставка"
+    
+    assert strip_markup(text) == "Важно: ЦБ повысил ставку 🔥"
+
+
+def test_learns_and_strips_trailing_signature():
+    texts = [f"Новость номер {i} про экономику\n{SIGNATURE}" for i in range(10)]
+    signatures = learn_boilerplate("econ", texts, now=NOW)
+    
+    assert signatures == {SIGNATURE.lower()}
+    assert strip_boilerplate(texts[3], signatures) == "Новость номер 3 про экономику"
+
+
+def test_structured_lines_with_varying_numbers_are_content():
+    texts = [f"Курс доллара 8{i},{i}5 руб\nТекст новости номер {i} про экономику" for i in range(10)]
+    news_data = normalize_news(_news(texts))
+    
+    assert [m['text'] for m in news_data['channels']['econ']['messages']] == texts
+    assert normalizer._learned['econ'] == {}
+
+
+def test_repeated_first_line_is_not_learned():
+    texts = [f"Курс валют\nДоллар {90 + i} рублей" for i in range(10)]
+    
+    assert learn_boilerplate("econ", texts, now=NOW) == set()
+
+
+def test_never_strips_post_to_empty():
+    signatures = learn_boilerplate("econ", [f"Новость {i}\n{SIGNATURE}" for i in range(5)], now=NOW)
+    
+    assert strip_boilerplate(SIGNATURE, signatures) == SIGNATURE
+    assert strip_boilerplate(f"\n{SIGNATURE}\n", signatures) == f"\n{SIGNATURE}\n"
+
+
+def test_signatures_expire_unless_seen_again():
+    learn_boilerplate("econ", [f"Новость {i}\n{SIGNATURE}" for i in range(5)], now=NOW)
+    
+    later = NOW + SIGNATURE_TTL / 2
+    assert learn_boilerplate("econ", ["Одна новость"], now=later) == {SIGNATURE.lower()}
+    assert learn_boilerplate("econ", ["Одна новость"], now=NOW + SIGNATURE_TTL + timedelta(hours=1)) == set()
+
+
+def test_learned_signatures_are_bounded(monkeypatch):
+    monkeypatch.setattr(normalizer, "MAX_LEARNED_PER_CHANNEL", 2)
+    for n in range(3):
+        learn_boilerplate("econ", [f"Новость {i}\nПодвал {n}" for i in range(5)], now=NOW + timedelta(minutes=n))
+    
+    assert set(normalizer._learned['econ']) == {"подвал 1", "подвал 2"}
+
+
+def test_normalize_news_reports_savings():
+    texts = [f"Новость номер {i} про экономику https://example.com/{i}\n{SIGNATURE}" for i in range(5)] + ["https://t.me/only_link"]
+    news_data = normalize_news(_news(texts))
+    
+    assert news_data['total_messages'] == 5
+    assert news_data['channels']['econ']['messages'][0]['text'] == "Новость номер 0 про экономику"
+    assert news_data['normalization']['tokens_saved'] > 0
@@ -0,0 +1,97 @@
+"""Tests for pending state of multi-step bot flows."""
+import itertools
+
+from src.bot.pending import PendingStore, pending_stats
+
+_kinds = itertools.count(1)
+
+
+def _store(**kwargs):
+    return PendingStore(f"test-{next(_kinds)}", **kwargs)
+
+
+def test_pop_takes_value_once(run):
+    store = _store()
+    
+    async def scenario():
+        await store.put(1, {'url': "https://example.com"})
+        return await store.pop(1), await store.pop(1)
+    
+    assert run(scenario()) == ({'url': "https://example.com"}, None)
+    assert store.stats['taken'] == 1
+
+
+def test_expired_entries_are_dropped(run):
+    store = _store(ttl_minutes=0)
+    
+    async def scenario():
+        await store.put(1, "confirm")
+        return await store.pop(1)
+    
+    assert run(scenario()) is None
+    assert len(store) == 0
+    assert store.stats['expired'] == 1
+
+
+def test_oldest_entries_are_evicted(run):
+    store = _store(max_entries=2)
+    
+    async def scenario():
+        for key in (1, 2, 3):
+            await store.put(key, f"value {key}")
+        return [await store.pop(key) for key in (1, 2, 3)]
+    
+    assert run(scenario()) == [None, "value 2", "value 3"]
+    assert store.stats['evicted'] == 1
+
+
+def test_put_replaces_value_under_key(run):
+    store = _store()
+    
+    async def scenario():
+        await store.put(1, "first")
+        await store.put(1, "second")
+        return len(store), await store.pop(1)
+    
+    assert run(scenario()) == (1, "second")
+
+
+def test_persisted_entries_survive_restart(run):
+    before = _store(persist=True)
+    after = PendingStore(before.kind, persist=True)
+    
+    async def scenario():
+        await before.put(42, {'chat_id': 42, 'step': "confirm"})
+        return await after.pop(42), await after.pop(42)
+    
+    assert run(scenario()) == ({'chat_id': 42, 'step': "confirm"}, None)
+
+
+def test_persisted_expired_entries_are_not_restored(run):
+    before = _store(persist=True, ttl_minutes=0)
+    after = PendingStore(before.kind, persist=True)
+    
+    async def scenario():
+        await before.put(42, "confirm")
+        return await after.pop(42)
+    
+    assert run(scenario()) is None
+
+
+def test_evicted_entries_are_removed_from_database(run):
+    before = _store(persist=True, max_entries=1)
+    after = PendingStore(before.kind, persist=True)
+    
+    async def scenario():
+        await before.put(1, "first")
+        await before.put(2, "second")
+        return await after.pop(1), await after.pop(2)
+    
+    assert run(scenario()) == (None, "second")
+
+
+def test_pending_stats_lists_every_store(run):
+    store = _store()
+    run(store.put(1, "value"))
+    
+    assert pending_stats()[store.kind] == {'size': 1, 'stored': 1, 'taken': 0, 'expired': 0, 'evicted': 0}
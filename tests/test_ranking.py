@@ -0,0 +1,68 @@
+"""Tests for importance ranking of posts."""
+from datetime import datetime, timedelta, timezone
+
+from src.tools.ranking import score_messages, select_messages
+
+NOW = datetime.now(timezone.utc)
+
+
+def _message(msg_id, views=100, forwards=1, reactions=2, hours_ago=1, duplicates=0):
+    return {'id': msg_id, 'date': NOW - timedelta(hours=hours_ago), 'text': f"post {msg_id}",
+            'views': views, 'forwards': forwards, 'reactions': reactions, 'duplicates': duplicates}
+
+
+def _news(**channels):
+    return {
+        'channels': {name: {'title': name.upper(), 'messages': messages} for name, messages in channels.items()},
+        'total_messages': sum(len(messages) for messages in channels.values()),
+    }
+
+
+def _ranked(news_data):
+    messages = [msg for data in news_data['channels'].values() for msg in data['messages']]
+    return [msg['id'] for msg in sorted(messages, key=lambda m: m['score'], reverse=True)]
+
+
+def test_engagement_above_channel_baseline_ranks_first():
+    news_data = _news(a=[_message(1), _message(2, views=1000, forwards=10, reactions=20), _message(3)])
+    score_messages(news_data, now=NOW)
+    
+    assert _ranked(news_data)[0] == 2
+
+
+def test_engagement_is_relative_to_channel():
+    # Twice the usual engagement of a small channel beats the usual posts of a big one
+    news_data = _news(
+        small=[_message(1, views=10, forwards=0, reactions=1), _message(2, views=10, forwards=0, reactions=1),
+               _message(3, views=20, forwards=1, reactions=2)],
+        big=[_message(4, views=10000, forwards=50, reactions=100), _message(5, views=10000, forwards=50, reactions=100)],
+    )
+    score_messages(news_data, now=NOW)
+    
+    assert _ranked(news_data)[0] == 3
+
+
+def test_newer_posts_rank_higher():
+    news_data = _news(a=[_message(1, hours_ago=20), _message(2, hours_ago=1), _message(3, hours_ago=8)])
+    score_messages(news_data, now=NOW)
+    
+    assert _ranked(news_data) == [2, 3, 1]
+
+
+def test_reposted_stories_get_boost():
+    news_data = _news(a=[_message(1), _message(2, duplicates=2)])
+    score_messages(news_data, now=NOW)
+    
+    assert _ranked(news_data) == [2, 1]
+
+
+def test_select_messages_is_fair_across_channels():
+    news_data = _news(
+        loud=[_message(i, views=1000 * i, hours_ago=0) for i in range(1, 11)],
+        quiet=[_message(100, hours_ago=0), _message(101, hours_ago=0)],
+    )
+    selected = select_messages(news_data, budget=6)
+    
+    assert sum(len(msgs) for msgs in selected.values()) == 6
+    assert {msg['id'] for msg in selected['quiet']} == {100, 101}
+    assert {msg['id'] for msg in selected['loud']} == {7, 8, 9, 10}
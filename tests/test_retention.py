@@ -0,0 +1,61 @@
+"""Tests for retention helpers."""
+import asyncio
+
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from src.database import retention
+
+
+async def _fragmented_engine(path):
+    """An incremental auto-vacuum database with many free pages."""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    async with engine.connect() as conn:
+        await conn.exec_driver_sql("PRAGMA auto_vacuum=INCREMENTAL")
+        await conn.exec_driver_sql("CREATE TABLE blobs (id INTEGER PRIMARY KEY, body BLOB)")
+        for i in range(300):
+            await conn.exec_driver_sql("INSERT INTO blobs (body) VALUES (randomblob(8000))")
+        await conn.exec_driver_sql("DELETE FROM blobs")
+        await conn.commit()
+    return engine
+
+
+async def _freelist(engine):
+    async with engine.connect() as conn:
+        return await retention._free_pages(conn)
+
+
+def test_incremental_vacuum_frees_pages(tmp_path, monkeypatch):
+    # Smaller chunks than the free list, so several calls are needed
+    monkeypatch.setattr(retention, "VACUUM_PAGES", 100)
+    
+    async def run():
+        engine = await _fragmented_engine(tmp_path / "fragmented.db")
+        before = await _freelist(engine)
+        freed = await retention._incremental_vacuum(engine)
+        after = await _freelist(engine)
+        await engine.dispose()
+        return before, freed, after
+    
+    before, freed, after = asyncio.run(run())
+    assert before > 500
+    assert after == 0
+    assert freed == before - after
+
+
+def test_incremental_vacuum_reports_nothing_without_auto_vacuum(tmp_path):
+    async def run():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'plain.db'}")
+        async with engine.connect() as conn:
+            await conn.exec_driver_sql("PRAGMA auto_vacuum=NONE")
+            await conn.exec_driver_sql("CREATE TABLE blobs (id INTEGER PRIMARY KEY, body BLOB)")
+            await conn.exec_driver_sql("INSERT INTO blobs (body) VALUES (randomblob(80000))")
+            await conn.exec_driver_sql("DELETE FROM blobs")
+            await conn.commit()
+        before = await _freelist(engine)
+        freed = await retention._incremental_vacuum(engine)
+        await engine.dispose()
+        return before, freed
+    
+    before, freed = asyncio.run(run())
+    assert before > 0
+    assert freed == 0
@@ -0,0 +1,106 @@
+"""Tests for coalescing concurrent identical calls."""
+import asyncio
+
+import pytest
+
+from src.singleflight import SingleFlight
+
+
+class Work:
+    """Counts calls and finishes (or fails) when released."""
+    
+    def __init__(self, result="digest", error=None):
+        self.result = result
+        self.error = error
+        self.calls = 0
+        self.release = asyncio.Event()
+    
+    async def __call__(self):
+        self.calls += 1
+        await self.release.wait()
+        if self.error:
+            raise self.error
+        return self.result
+
+
+def test_concurrent_callers_share_one_call():
+    async def scenario():
+        flights, work = SingleFlight(), Work()
+        callers = [asyncio.create_task(flights.do("digest", work)) for _ in range(5)]
+        await asyncio.sleep(0)
+        work.release.set()
+        return await asyncio.gather(*callers), work.calls, flights.stats()
+    
+    results, calls, stats = asyncio.run(scenario())
+    
+    assert results == ["digest"] * 5
+    assert calls == 1
+    assert stats == {'calls': 5, 'shared': 4, 'in_flight': 0}
+
+
+def test_different_keys_run_separately():
+    async def scenario():
+        flights, work = SingleFlight(), Work()
+        callers = [asyncio.create_task(flights.do(key, work)) for key in ("brief", "full")]
+        await asyncio.sleep(0)
+        work.release.set()
+        await asyncio.gather(*callers)
+        return work.calls
+    
+    assert asyncio.run(scenario()) == 2
+
+
+def test_nothing_is_cached_after_completion():
+    async def scenario():
+        flights, work = SingleFlight(), Work()
+        work.release.set()
+        await flights.do("digest", work)
+        await flights.do("digest", work)
+        return work.calls
+    
+    assert asyncio.run(scenario()) == 2
+
+
+def test_exception_reaches_every_caller():
+    async def scenario():
+        flights, work = SingleFlight(), Work(error=RuntimeError("LLM down"))
+        callers = [asyncio.create_task(flights.do("digest", work)) for _ in range(3)]
+        await asyncio.sleep(0)
+        work.release.set()
+        return await asyncio.gather(*callers, return_exceptions=True), work.calls
+    
+    results, calls = asyncio.run(scenario())
+    
+    assert calls == 1
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+def test_cancelled_caller_does_not_cancel_shared_work():
+    async def scenario():
+        flights, work = SingleFlight(), Work()
+        first = asyncio.create_task(flights.do("digest", work))
+        second = asyncio.create_task(flights.do("digest", work))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        work.release.set()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second, work.calls
+    
+    assert asyncio.run(scenario()) == ("digest", 1)
+
+
+def test_work_finishes_when_every_caller_is_cancelled():
+    async def scenario():
+        flights, work = SingleFlight(), Work(error=RuntimeError("LLM down"))
+        caller = asyncio.create_task(flights.do("digest", work))
+        await asyncio.sleep(0)
+        caller.cancel()
+        await asyncio.sleep(0)
+        work.release.set()
+        for _ in range(3):
+            await asyncio.sleep(0)
+        return flights.stats()['in_flight']
+    
+    assert asyncio.run(scenario()) == 0
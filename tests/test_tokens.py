@@ -0,0 +1,119 @@
+"""Tests for token estimation and prompt budget packing."""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from src.llm import tokens
+from src.llm.tokens import calibrate, estimate_tokens, get_calibration, prompt_budget, set_tokenizer, truncate_to_tokens
+from src.tools.news_aggregator import pack_messages, pack_topics, render_messages, render_topics
+
+NOW = datetime.now(timezone.utc)
+
+
+@pytest.fixture(autouse=True)
+def estimator(monkeypatch):
+    monkeypatch.setattr(tokens, "_tokenizer", None)
+    monkeypatch.setattr(tokens, "_calibration", 1.0)
+
+
+def _message(msg_id, text, hours_ago=1):
+    return {'id': msg_id, 'date': NOW - timedelta(hours=hours_ago), 'text': text,
+            'views': 100, 'forwards': 1, 'reactions': 2}
+
+
+def _news(**channels):
+    return {
+        'channels': {name: {'title': name.upper(), 'messages': messages} for name, messages in channels.items()},
+        'total_messages': sum(len(messages) for messages in channels.values()),
+        'time_range_hours': 24,
+    }
+
+
+def _posts(prefix, count):
+    return [_message(i, f"{prefix} {i}: " + "Новость о событиях дня и их последствиях. " * 8, hours_ago=i)
+            for i in range(1, count + 1)]
+
+
+def test_empty_text_has_no_tokens():
+    assert estimate_tokens("") == 0
+
+
+def test_cyrillic_costs_more_than_latin():
+    assert estimate_tokens("а" * 300) > estimate_tokens("a" * 300)
+    assert estimate_tokens("а" * 300) == pytest.approx(300 / tokens.CYRILLIC_CHARS_PER_TOKEN, abs=1)
+
+
+def test_plugged_in_tokenizer_wins():
+    set_tokenizer(lambda text: 42)
+    assert estimate_tokens("что угодно") == 42
+    
+    set_tokenizer(None)
+    assert estimate_tokens("что угодно") != 42
+
+
+def test_calibration_follows_reported_usage():
+    text = "Новость " * 100
+    estimated = estimate_tokens(text)
+    
+    for _ in range(30):
+        calibrate(text, 2 * estimated + tokens.TOKENS_PER_CHAT_MESSAGE)
+    
+    assert get_calibration() == pytest.approx(2.0, rel=0.05)
+    assert estimate_tokens(text) == pytest.approx(2 * estimated, rel=0.05)
+
+
+def test_calibration_ignores_short_prompts():
+    calibrate("коротко", 1000)
+    
+    assert get_calibration() == 1.0
+
+
+def test_truncate_to_tokens():
+    text = "Длинный текст новости. " * 50
+    
+    assert truncate_to_tokens(text, 10000) == text
+    cut = truncate_to_tokens(text, 20)
+    assert text.startswith(cut)
+    assert estimate_tokens(cut) <= 20
+
+
+def test_prompt_budget_subtracts_template_and_reserve():
+    full = prompt_budget(context_tokens=8000)
+    
+    assert prompt_budget(template="Шаблон " * 50, context_tokens=8000) < full
+    assert prompt_budget(reserved_tokens=500, context_tokens=8000) == full - 500
+
+
+@pytest.mark.parametrize("budget", [200, 600, 1500])
+def test_packed_messages_fit_budget(budget):
+    news_data = _news(a=_posts("A", 10), b=_posts("B", 10))
+    
+    selected = pack_messages(news_data, budget)
+    
+    assert selected
+    assert estimate_tokens(render_messages(news_data, selected)) <= budget
+
+
+def test_pack_messages_keeps_every_channel():
+    news_data = _news(a=_posts("A", 10), b=_posts("B", 10))
+    
+    selected = pack_messages(news_data, 600)
+    
+    assert set(selected) == {'a', 'b'}
+
+
+@pytest.mark.parametrize("budget", [300, 800, 2000])
+def test_packed_topics_fit_budget(budget):
+    news_data = _news(a=_posts("A", 6), b=_posts("B", 6))
+    topics = [
+        {'label': f"Тема {n}", 'channels': ['A', 'B'], 'messages': [],
+         'representatives': [('A', news_data['channels']['a']['messages'][n]),
+                             ('B', news_data['channels']['b']['messages'][n])]}
+        for n in range(6)
+    ]
+    
+    packed = pack_topics(news_data, topics, budget)
+    
+    assert packed
+    assert all(reps for _, reps in packed)
+    assert estimate_tokens(render_topics(news_data, packed, len(topics))) <= budget
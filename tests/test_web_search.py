@@ -0,0 +1,50 @@
+"""Tests for the pooled DuckDuckGo search client."""
+import asyncio
+import threading
+import time
+
+from src.tools import web_search
+from src.tools.web_search import SearchClient
+
+
+class FakeDDGS:
+    """Slow DDGS stand-in that records which thread used which session."""
+    
+    sessions = []
+    
+    def __init__(self):
+        self.owner = threading.get_ident()
+        self.sessions.append(self)
+    
+    def text(self, query, **kwargs):
+        assert threading.get_ident() == self.owner, "session shared between threads"
+        time.sleep(0.3)
+        if query == "fail":
+            raise RuntimeError("rate limited")
+        return [{'title': query, 'href': f"https://example.com/{query}", 'body': ''}]
+
+
+def test_searches_run_concurrently_with_own_sessions(run, monkeypatch):
+    FakeDDGS.sessions = []
+    monkeypatch.setattr(web_search, "DDGS", FakeDDGS)
+    client = SearchClient(concurrency=3)
+    
+    async def scenario():
+        started = time.monotonic()
+        results = await asyncio.gather(*(client.search('web', f"query {i}") for i in range(3)))
+        return results, time.monotonic() - started
+    
+    results, took = run(scenario())
+    assert [r[0]['title'] for r in results] == ["query 0", "query 1", "query 2"]
+    assert took < 0.8
+    assert len({id(s) for s in FakeDDGS.sessions}) == 3
+
+
+def test_failed_session_is_replaced(monkeypatch):
+    FakeDDGS.sessions = []
+    monkeypatch.setattr(web_search, "DDGS", FakeDDGS)
+    client = SearchClient(concurrency=1)
+    
+    assert client.fetch('web', "fail", 5, "ru-ru") == []
+    assert client.fetch('web', "ok", 5, "ru-ru")[0]['title'] == "ok"
+    assert len(FakeDDGS.sessions) == 2
@@ -0,0 +1,81 @@
+"""Tests for the webhook endpoint."""
+import asyncio
+import json
+
+from aiohttp.test_utils import TestClient, TestServer
+
+from src.bot.webhook import SECRET_HEADER, build_webhook_app
+
+SECRET = "s3cret"
+PATH = "/telegram"
+UPDATE = {
+    'update_id': 1,
+    'message': {'message_id': 7, 'date': 1700000000, 'chat': {'id': 42, 'type': "private"}, 'text': "/start"},
+}
+
+
+class FakeApp:
+    """Just what the webhook uses of telegram.ext.Application."""
+    
+    def __init__(self):
+        self.bot = None
+        self.update_queue = asyncio.Queue()
+
+
+def _post(body, headers=None):
+    """POST a body to the webhook; returns (status, queued updates)."""
+    async def scenario():
+        app = FakeApp()
+        async with TestClient(TestServer(build_webhook_app(app, SECRET, PATH))) as client:
+            response = await client.post(PATH, data=body, headers=headers or {})
+            status = response.status
+        return status, [app.update_queue.get_nowait() for _ in range(app.update_queue.qsize())]
+    
+    return asyncio.run(scenario())
+
+
+def test_valid_update_is_queued():
+    status, updates = _post(json.dumps(UPDATE), {SECRET_HEADER: SECRET})
+    
+    assert status == 200
+    assert [update.update_id for update in updates] == [1]
+    assert updates[0].message.text == "/start"
+
+
+def test_missing_secret_is_forbidden():
+    status, updates = _post(json.dumps(UPDATE))
+    
+    assert status == 403
+    assert updates == []
+
+
+def test_wrong_secret_is_forbidden():
+    status, updates = _post(json.dumps(UPDATE), {SECRET_HEADER: "guess"})
+    
+    assert status == 403
+    assert updates == []
+
+
+def test_malformed_json_is_rejected():
+    status, updates = _post("{not json", {SECRET_HEADER: SECRET})
+    
+    assert status == 400
+    assert updates == []
+
+
+def test_non_object_json_is_rejected():
+    status, updates = _post(json.dumps([1, 2, 3]), {SECRET_HEADER: SECRET})
+    
+    assert status == 400
+    assert updates == []
+
+
+def test_health_reports_queue_size():
+    async def scenario():
+        app = FakeApp()
+        await app.update_queue.put(object())
+        async with TestClient(TestServer(build_webhook_app(app, SECRET, PATH))) as client:
+            response = await client.get("/healthz")
+            return response.status, await response.json()
+    
+    assert asyncio.run(scenario()) == (200, {'ok': True, 'pending': 1})